@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+    Validate many bridge deployments in parallel
+
+    usage: farm.py JOBS_FILE [-j CONCURRENCY] [-o RESULTS_FILE]
+
+    JOBS_FILE lists one job per line, either a git URL to clone or a path to a
+    "contract_info.json" (or the directory containing one).  Each job runs
+    validate() in its own process; every concurrent slot gets its own test
+    accounts from "eth_mnemonic.txt" so transaction nonces never collide, and
+    immutable reads (ERC20 ABI, erc20s.csv, token metadata) go through a cache
+    shared by all workers.  Scores are written to a single JSON results file.
+
+    Before any worker starts, every repository is cloned and all the shared
+    accounts' transactions are sent from this process: native gas for each slot's
+    senders (from the default senders) and token top-ups (from the minter), so
+    workers never send from an account another worker uses.  Each slot is only
+    funded for its share of the runs, and the workers split the RPC rate
+    (BRIDGE_RPC_RATE) between them since they all hit the same public endpoints.
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import contextlib
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import validate as harness
+from grader.rpc_client import DEFAULT_RATE
+
+TESTS_DIR = Path(__file__).parent.absolute()
+KEYS_FILE = TESTS_DIR / "eth_mnemonic.txt"
+KEY_DIR = Path("/home/codio/workspace/ssh_keys")
+
+# Each run deposits at most 1000 of each token, and validate() tops the sender up below this
+MIN_SENDER_BALANCE = 10 ** 6
+MAX_DEPOSIT = 1000
+# Native gas per run: user_a approves and deposits two tokens on the source chain,
+# user_b unwraps two on the destination chain
+SENDER_ROLES = {'avax': 'user_a', 'bsc': 'user_b'}
+TXS_PER_RUN = {'avax': 4, 'bsc': 2}
+GAS_USED_PER_TX = 150_000
+TX_GAS_LIMIT = 10 ** 6  # sign_and_send's gas limit, which the balance must cover to send at all
+TRANSFER_GAS = 21_000
+# Slots take jobs as they free up, so one may run more than an even share
+RUN_MARGIN = 0.25
+
+_slots = None
+
+
+def slot_key_ids(slot):
+    """
+        Slot 0 uses the harness's default senders, later slots get their own pair of sender accounts
+        No slot gets the minter: only farm() mints, before any worker starts, since workers
+        sharing it would collide on its nonces
+    """
+    if slot == 0:
+        key_ids = {role: harness.DEFAULT_KEY_IDS[role] for role in ('user_a', 'user_b')}
+    else:
+        key_ids = {'user_a': 2 + 2 * slot, 'user_b': 3 + 2 * slot}
+    return {**key_ids, 'minter': None}
+
+
+def read_jobs(jobs_file):
+    jobs = []
+    with open(jobs_file, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                jobs.append(line)
+    return jobs
+
+
+def is_repository(job):
+    return job.startswith(('git@', 'https://', 'http://', 'ssh://'))
+
+
+def job_name(job):
+    if is_repository(job):
+        return job.rstrip('/').split(':')[-1].removesuffix('.git').replace('/', '__')
+    path = Path(job)
+    return (path.parent if path.name == "contract_info.json" else path).absolute().name
+
+
+def clone_repository(url, dir_path):
+    import pygit2
+
+    key_file = KEY_DIR / "id_mcit5830"
+    pub_key = KEY_DIR / "id_mcit5830.pub"
+    keypair = pygit2.Keypair("git", os.fspath(pub_key), os.fspath(key_file), "")
+    callbacks = pygit2.RemoteCallbacks(credentials=keypair)
+    pygit2.clone_repository(url, os.fspath(dir_path), callbacks=callbacks)
+
+
+def runs_per_slot(runs, concurrency):
+    """The runs each slot is funded for: an even share of 'runs' plus RUN_MARGIN, and at least one spare"""
+    return min(runs, math.ceil(runs / concurrency * (1 + RUN_MARGIN)) + 1)
+
+
+def init_worker(slots, cache, rpc_rate):
+    global _slots
+    _slots = slots
+    # Read by the rate limiter when this worker first connects to an endpoint
+    os.environ["BRIDGE_RPC_RATE"] = str(rpc_rate)
+    harness.set_read_cache(cache)
+
+
+def unique_names(jobs):
+    names, seen = [], {}
+    for job in jobs:
+        name = job_name(job)
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}-{seen[name]}")
+    return names
+
+
+def fetch_jobs(jobs, names, work_dir, concurrency):
+    """
+        Clone every repository job ('concurrency' at a time) and resolve the other jobs to
+        their directories
+        Returns ({name: code path} of the jobs that are ready, {name: error} of the others)
+    """
+    def fetch(job, name):
+        if not is_repository(job):
+            path = Path(job).absolute()
+            return path.parent if path.name == "contract_info.json" else path
+        code_path = work_dir / "repos" / name
+        if code_path.exists():
+            shutil.rmtree(code_path)
+        clone_repository(job, code_path)
+        return code_path
+
+    ready, failed = {}, {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(fetch, job, name): name for job, name in zip(jobs, names)}
+        for future in as_completed(futures):
+            try:
+                ready[futures[future]] = future.result()
+            except Exception as e:
+                failed[futures[future]] = f"Failed to fetch job: {e!r}"
+    return ready, failed
+
+
+def run_job(job, name, code_path, work_dir):
+    """
+        Runs in a worker process (one process per job, so every student's 'bridge'
+        module is imported fresh).  Returns a result dictionary, never raises.
+    """
+    log_file = work_dir / "logs" / f"{name}.log"
+    result = {'job': job, 'name': name, 'score': None, 'error': None, 'log': os.fspath(log_file)}
+    slot = _slots.get()
+    started = time.monotonic()
+    try:
+        with log_file.open('w') as log, contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+            sys.path.append(os.fspath(code_path))
+            result['slot'] = slot
+            result['score'] = harness.validate(code_path, key_ids=slot_key_ids(slot))
+    except BaseException as e:  # validate() reports some failures with sys.exit
+        result['error'] = repr(e)
+    finally:
+        _slots.put(slot)
+    result['seconds'] = round(time.monotonic() - started, 2)
+    return result
+
+
+def fund_gas(concurrency, runs):
+    """
+        Give every slot's senders enough native gas for 'runs' validations each, sent from the
+        default senders (slot 0's accounts), then fail if any sender is still short
+    """
+    short = []
+    for chain, role in SENDER_ROLES.items():
+        w3 = harness.connect_to(chain)
+        gas_price = w3.eth.gas_price
+        target = (GAS_USED_PER_TX * TXS_PER_RUN[chain] * runs + TX_GAS_LIMIT) * gas_price
+        funder = harness.get_eth_keys(KEYS_FILE, keyId=harness.DEFAULT_KEY_IDS[role])
+        senders = [harness.get_eth_keys(KEYS_FILE, keyId=slot_key_ids(slot)[role]).address
+                   for slot in range(concurrency)]
+        nonces = harness.NonceTracker()
+        pending = []
+        for sender in senders:
+            balance = w3.eth.get_balance(sender)
+            if sender == funder.address or balance >= target:
+                continue
+            print(f"Sending {target - balance} wei of gas on {chain} to {sender}")
+            tx = {'to': sender, 'value': target - balance, 'gas': TRANSFER_GAS, 'gasPrice': gas_price,
+                  'nonce': nonces.next_nonce(w3, funder.address), 'chainId': w3.eth.chain_id}
+            signed_tx = w3.eth.account.sign_transaction(tx, funder.key)
+            pending.append(('transfer', w3.eth.send_raw_transaction(signed_tx.raw_transaction)))
+        if pending:
+            harness.wait_for_receipts(w3, pending)
+        for sender in senders:
+            balance = w3.eth.get_balance(sender)
+            if balance < target:
+                short.append(f"{sender} has {balance} wei on {chain}, needs {target}")
+    if short:
+        raise RuntimeError("Sender accounts are short of gas:\n" + "\n".join(short))
+
+
+def top_up_senders(code_paths, concurrency, runs):
+    """
+        Mint every slot's sender enough of every source token for 'runs' jobs each, in one
+        pipelined batch from the minter, then fail if any top-up did not go through
+    """
+    erc20s_abi_file = TESTS_DIR / "ERC20ABI.json"
+    source_w3 = harness.connect_to('avax')
+    addresses = set()
+    for code_path in code_paths:
+        erc20s_file = code_path / "erc20s.csv"
+        if erc20s_file.is_file():
+            addresses.update(harness.read_erc20s_csv(erc20s_file).get('avax', []))
+
+    erc20_abi = harness.load_erc20_abi(erc20s_abi_file)
+    tokens = [source_w3.eth.contract(abi=erc20_abi, address=a) for a in sorted(addresses)]
+    minter = harness.get_eth_keys(KEYS_FILE, keyId=harness.DEFAULT_KEY_IDS['minter'])
+    target = MIN_SENDER_BALANCE + MAX_DEPOSIT * runs
+    nonces = harness.NonceTracker()
+    pairs = []
+    for slot in range(concurrency):
+        sender = harness.get_eth_keys(KEYS_FILE, keyId=slot_key_ids(slot)['user_a'])
+        pairs.extend((token, sender.address) for token in tokens)
+    pending = []
+    ok = harness.ensure_balances(pairs, target, minter, nonces=nonces, pending=pending)
+    if pending and harness.wait_for_receipts(source_w3, pending) < len(pending):
+        ok = False
+    if not ok:
+        raise RuntimeError("Failed to top up the sender accounts' tokens")
+
+
+def farm(jobs, concurrency, results_file, work_dir):
+    work_dir = Path(work_dir).absolute()
+    (work_dir / "logs").mkdir(parents=True, exist_ok=True)
+    (work_dir / "repos").mkdir(parents=True, exist_ok=True)
+
+    # Create any missing accounts here, in order, so workers never append to the mnemonic file
+    max_key_id = max(key_id for slot in range(concurrency) for key_id in slot_key_ids(slot).values()
+                     if key_id is not None)
+    for key_id in range(max_key_id + 1):
+        harness.get_eth_keys(KEYS_FILE, keyId=key_id)
+
+    started = time.time()
+    names = unique_names(jobs)
+    ready, failed = fetch_jobs(jobs, names, work_dir, concurrency)
+    # Workers never mint or fund, so the shared accounts' nonces are only ever used from here
+    runs = runs_per_slot(len(ready), concurrency)
+    fund_gas(concurrency, runs)
+    top_up_senders(list(ready.values()), concurrency, runs)
+    rpc_rate = float(os.environ.get("BRIDGE_RPC_RATE", DEFAULT_RATE)) / concurrency
+
+    results = [{'job': job, 'name': name, 'score': None, 'error': failed[name], 'seconds': 0}
+               for job, name in zip(jobs, names) if name in failed]
+    with multiprocessing.Manager() as manager:
+        slots = manager.Queue()
+        for slot in range(concurrency):
+            slots.put(slot)
+        cache = manager.dict()
+        with ProcessPoolExecutor(max_workers=concurrency, max_tasks_per_child=1,
+                                 initializer=init_worker, initargs=(slots, cache, rpc_rate)) as pool:
+            futures = [pool.submit(run_job, job, name, ready[name], work_dir)
+                       for job, name in zip(jobs, names) if name in ready]
+            for future in as_completed(futures):
+                result = future.result()
+                print(f"{result['name']}: score={result['score']} error={result['error']} ({result['seconds']}s)")
+                results.append(result)
+
+    scores = [r['score'] for r in results if r['score'] is not None]
+    summary = {
+        'started': started,
+        'seconds': round(time.time() - started, 2),
+        'concurrency': concurrency,
+        'jobs': len(jobs),
+        'failed': sum(1 for r in results if r['error'] is not None),
+        'mean_score': sum(scores) / len(scores) if scores else None,
+        'results': sorted(results, key=lambda r: r['name']),
+    }
+    with open(results_file, 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate many bridge deployments in parallel")
+    parser.add_argument('jobs_file', help="file listing git URLs or contract_info.json paths, one per line")
+    parser.add_argument('-j', '--concurrency', type=int, default=4)
+    parser.add_argument('-o', '--output', default="farm_results.json")
+    parser.add_argument('--work-dir', default=os.fspath(TESTS_DIR / "farm"))
+    args = parser.parse_args()
+
+    try:
+        summary = farm(read_jobs(args.jobs_file), args.concurrency, args.output, args.work_dir)
+    except RuntimeError as e:
+        print(f"Farm not started: {e}")
+        sys.exit(1)
+    print(f"Validated {summary['jobs']} deployments in {summary['seconds']}s "
+          f"({summary['failed']} failed), results in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""
+    The harness's own copies of the bridge helper modules
+
+    validate.py runs with the student's repository on sys.path, and that repository
+    ships modules with the same names (rpc_client, rpc_cassette, ...).  The grader must
+    never let student code answer its reads or see its RPC traffic, so it imports these
+    copies as grader.<module> instead.  They must match the modules at the repository
+    root except that imports between them are relative; tests/test_grader_copies.py
+    checks this.
+"""
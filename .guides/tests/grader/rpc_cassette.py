@@ -0,0 +1,194 @@
+"""
+    Record/replay of JSON-RPC traffic
+
+    In 'record' mode every request a provider makes is passed through to the live
+    endpoint and the response is written to a gzipped JSON-lines cassette (recording
+    again starts the file over).  In 'replay' mode the same requests are answered
+    from the cassette without any network access, optionally sleeping to simulate
+    the endpoint's latency.  Values a run chooses itself, such as random amounts that
+    end up in signed transactions, are kept in the cassette too (Cassette.value).
+
+    connect_to() in bridge.py wraps its provider when these are set:
+        BRIDGE_CASSETTE          path of the cassette file
+        BRIDGE_CASSETTE_MODE     'record' or 'replay' (default 'replay')
+        BRIDGE_CASSETTE_LATENCY  'recorded', a number of seconds, or a JSON object
+                                 mapping RPC method names to seconds (replay only)
+
+    cassette_scan.py records or replays one scan_blocks cycle from the command line.
+"""
+
+from web3.providers import BaseProvider
+from collections import defaultdict, deque
+from pathlib import Path
+import threading
+import gzip
+import json
+import time
+import os
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    raise TypeError(f"Cannot serialize {type(value).__name__} in RPC params")
+
+
+def request_key(name, method, params):
+    return name, method, json.dumps(params, sort_keys=True, separators=(",", ":"), default=_json_default)
+
+
+class Cassette:
+    """
+        One cassette file, shared by every provider that records to or replays from it
+    """
+
+    def __init__(self, path, mode="replay", latency=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.responses = defaultdict(deque)
+        if mode == "record":
+            # A fresh recording; appending would leave stale responses ahead of the new ones
+            self.file = gzip.open(self.path, "wt")
+        else:
+            self.file = None
+            self.load()
+
+    def load(self):
+        with gzip.open(self.path, "rt") as f:
+            for line in f:
+                name, method, params, response, elapsed = json.loads(line)
+                key = name, method, params
+                self.responses[key].append((response, elapsed))
+
+    def record(self, name, method, params, response, elapsed):
+        _, _, params = request_key(name, method, params)
+        line = json.dumps([name, method, params, response, round(elapsed, 6)], separators=(",", ":"))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def replay(self, name, method, params):
+        """
+            Responses to the same request are returned in recorded order; once only the
+            last one is left it keeps being returned (e.g. for eth_blockNumber polling)
+        """
+        response, elapsed = self._next(name, method, params)
+        delay = self.delay(method, elapsed)
+        if delay:
+            time.sleep(delay)
+        return response
+
+    def value(self, name, make):
+        """
+            A value the run picks itself rather than reads from the chain, e.g. random
+            amounts that end up in signed transactions: make() is called and its result
+            recorded, and replay returns the recorded result, so the replayed run sends
+            the same requests.  Must be JSON-serializable.
+        """
+        if self.mode == "replay":
+            return self._next(name, "value", [])[0]
+        value = make()
+        self.record(name, "value", [], value, 0)
+        return value
+
+    def _next(self, name, method, params):
+        key = request_key(name, method, params)
+        with self.lock:
+            queue = self.responses.get(key)
+            if not queue:
+                raise LookupError(f"No recorded response for {method}{key[2]} on {name}")
+            return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def delay(self, method, elapsed):
+        if self.latency is None:
+            return 0
+        if self.latency == "recorded":
+            return elapsed
+        if isinstance(self.latency, dict):
+            return self.latency.get(method, self.latency.get("default", 0))
+        return float(self.latency)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class CassetteProvider(BaseProvider):
+    """
+        Provider wrapper that records to / replays from a Cassette
+        name - (string) label for the endpoint, e.g. the chain name, so that
+        identical requests to different chains are kept apart
+        provider - the live provider (not used in replay mode)
+    """
+
+    def __init__(self, cassette, name, provider=None):
+        super().__init__()
+        self.cassette = cassette
+        self.name = name
+        self.provider = provider
+
+    def make_request(self, method, params):
+        if self.cassette.mode == "replay":
+            return self.cassette.replay(self.name, method, params)
+        started = time.perf_counter()
+        response = self.provider.make_request(method, params)
+        self.cassette.record(self.name, method, params, response, time.perf_counter() - started)
+        return response
+
+    def is_connected(self, show_traceback=False):
+        if self.cassette.mode == "replay":
+            return True
+        return self.provider.is_connected(show_traceback)
+
+    @property
+    def endpoint_uri(self):
+        # Callers key caches on this, so keep chains apart even when replaying
+        return getattr(self.provider, 'endpoint_uri', self.name)
+
+
+def get_cassette(path, mode="replay", latency=None):
+    """Return the shared Cassette for a file, opening it on first use"""
+    key = os.fspath(Path(path).absolute())
+    with _cassettes_lock:
+        if key not in _cassettes:
+            _cassettes[key] = Cassette(path, mode, latency)
+        return _cassettes[key]
+
+
+def parse_latency(value):
+    if not value:
+        return None
+    if value == "recorded":
+        return value
+    try:
+        return float(value)
+    except ValueError:
+        return json.loads(value)
+
+
+def cassette_provider(name, provider):
+    """
+        Wrap a live provider according to the BRIDGE_CASSETTE* environment variables
+        Returns the provider unchanged when no cassette is configured
+    """
+    path = os.environ.get("BRIDGE_CASSETTE")
+    if not path:
+        return provider
+    mode = os.environ.get("BRIDGE_CASSETTE_MODE", "replay")
+    latency = parse_latency(os.environ.get("BRIDGE_CASSETTE_LATENCY"))
+    return CassetteProvider(get_cassette(path, mode, latency), name, provider)
+
+
+def close_cassettes():
+    """Flush and close every cassette opened in this process"""
+    with _cassettes_lock:
+        for cassette in _cassettes.values():
+            cassette.close()
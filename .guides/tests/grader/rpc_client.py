@@ -0,0 +1,235 @@
+"""
+    Rate-limit-aware JSON-RPC client
+
+    The public Fuji and BSC testnet endpoints throttle aggressively.  Every request
+    made through a RateLimitedProvider passes through the Endpoint limiter shared
+    by all providers for that URL, which combines:
+
+        - a token bucket capping the request rate,
+        - AIMD on both the concurrency limit and the bucket's rate: each is halved
+          on a 429 and creeps back up with every fast success (the limit is also
+          trimmed when latency climbs past the target).  Halving the rate is what
+          backs off a single-threaded caller such as the scanner,
+        - priority for transaction sends, which never queue behind reads.
+
+    Idempotent reads that are throttled or hit a transient error (network errors,
+    HTTP 502/503/504) are retried with jittered exponential backoff; transaction
+    sends are never retried here.
+
+    Defaults can be overridden with:
+        BRIDGE_RPC_RATE         requests per second per endpoint
+        BRIDGE_RPC_CONCURRENCY  maximum requests in flight per endpoint
+"""
+
+from web3 import Web3
+from web3.providers import BaseProvider
+import requests
+import threading
+import random
+import time
+import os
+
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+DEFAULT_CONCURRENCY = 8
+TARGET_LATENCY = 2.0
+MAX_RETRIES = 6
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 16.0
+# Floor for the throttled rate, and the share of the configured rate regained per fast success
+MIN_RATE = 0.5
+RATE_RECOVERY = 0.01
+
+SEND_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+RATE_LIMIT_CODES = {429, -32005, -32029}
+RATE_LIMIT_MESSAGES = ("limit exceeded", "rate limit", "too many requests")
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+TRANSIENT_STATUS_CODES = {502, 503, 504}
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+class RateLimited(Exception):
+    """A throttled response, raised internally so it can be retried like an HTTP 429"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Endpoint:
+    """
+        Admission control for one RPC URL, shared by every provider (and thread) using it
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, max_concurrency=DEFAULT_CONCURRENCY,
+                 target_latency=TARGET_LATENCY):
+        self.rate = rate
+        self.max_rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.limit = float(max_concurrency)
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.waiting_sends = 0
+        self.cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def acquire(self, send=False):
+        """Block until a request may start; sends go ahead of any waiting reads"""
+        with self.cond:
+            if send:
+                self.waiting_sends += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if now < self.paused_until:
+                        wait = self.paused_until - now
+                    elif self.in_flight < int(self.limit) and (send or not self.waiting_sends):
+                        self._refill(now)
+                        if self.tokens >= 1:
+                            self.tokens -= 1
+                            self.in_flight += 1
+                            return
+                        wait = (1 - self.tokens) / self.rate
+                    self.cond.wait(wait)
+            finally:
+                if send:
+                    self.waiting_sends -= 1
+
+    def release(self, latency, throttled=False, retry_after=None):
+        """Record the outcome of a request and adjust the concurrency limit and rate (AIMD)"""
+        with self.cond:
+            now = time.monotonic()
+            self.in_flight -= 1
+            # Tokens earned so far accrue at the old rate
+            self._refill(now)
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+                self.rate = max(MIN_RATE, self.rate / 2)
+                self.tokens = min(self.tokens, 0.0)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+            elif latency > self.target_latency:
+                self.limit = max(1.0, self.limit * 0.9)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self.rate = min(self.max_rate, self.rate + RATE_RECOVERY * self.max_rate)
+            self.cond.notify_all()
+
+
+def get_endpoint(url):
+    """Return the shared Endpoint limiter for a URL, creating it on first use"""
+    with _endpoints_lock:
+        if url not in _endpoints:
+            _endpoints[url] = Endpoint(rate=float(os.environ.get("BRIDGE_RPC_RATE", DEFAULT_RATE)),
+                                       max_concurrency=int(os.environ.get("BRIDGE_RPC_CONCURRENCY",
+                                                                          DEFAULT_CONCURRENCY)))
+        return _endpoints[url]
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def check_throttled(response):
+    """Raise RateLimited if a JSON-RPC response is a rate-limit error"""
+    error = response.get("error") if isinstance(response, dict) else None
+    if not isinstance(error, dict):
+        return
+    message = str(error.get("message", "")).lower()
+    if error.get("code") in RATE_LIMIT_CODES or any(m in message for m in RATE_LIMIT_MESSAGES):
+        raise RateLimited(error.get("message"))
+
+
+def classify_error(err):
+    """
+        Returns 'throttled' for a rate-limit error, 'transient' for another error worth
+        retrying (network errors, HTTP 502/503/504), or None if it should be raised
+    """
+    if isinstance(err, RateLimited):
+        return 'throttled'
+    if isinstance(err, requests.HTTPError):
+        status = getattr(err.response, 'status_code', None)
+        if status == 429:
+            return 'throttled'
+        return 'transient' if status in TRANSIENT_STATUS_CODES else None
+    if isinstance(err, TRANSIENT_ERRORS):
+        return 'transient'
+    return None
+
+
+def backoff(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After"""
+    delay = random.uniform(0, min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt))
+    return max(delay, retry_after or 0)
+
+
+class RateLimitedProvider(BaseProvider):
+    """
+        Provider wrapper that routes every request through an Endpoint limiter
+        provider - the live provider, e.g. an HTTPProvider with its own retries disabled
+        endpoint - (Endpoint) shared limiter for the provider's URL
+    """
+
+    def __init__(self, provider, endpoint, max_retries=MAX_RETRIES):
+        super().__init__()
+        self.provider = provider
+        self.endpoint = endpoint
+        self.max_retries = max_retries
+
+    def make_request(self, method, params):
+        send = method in SEND_METHODS
+        attempt = 0
+        while True:
+            self.endpoint.acquire(send)
+            started = time.monotonic()
+            throttled, retry_after = False, None
+            try:
+                response = self.provider.make_request(method, params)
+                check_throttled(response)
+                return response
+            except (RateLimited, requests.HTTPError, *TRANSIENT_ERRORS) as err:
+                kind = classify_error(err)
+                if kind is None:
+                    raise
+                error = err
+                if kind == 'throttled':
+                    throttled = True
+                    retry_after = err.retry_after if isinstance(err, RateLimited) else _retry_after(err.response)
+            finally:
+                self.endpoint.release(time.monotonic() - started, throttled, retry_after)
+
+            if send or attempt >= self.max_retries:
+                if isinstance(error, RateLimited):
+                    return response  # Let web3 raise its usual error for the RPC response
+                raise error
+            time.sleep(backoff(attempt, retry_after))
+            attempt += 1
+
+    def is_connected(self, show_traceback=False):
+        return self.provider.is_connected(show_traceback)
+
+    @property
+    def endpoint_uri(self):
+        return self.provider.endpoint_uri
+
+
+def rate_limited_provider(url, **kwargs):
+    """
+        An HTTPProvider for 'url' behind the shared rate limiter for that URL
+        Retries are handled here, so web3's own exception retries are turned off
+    """
+    provider = Web3.HTTPProvider(url, exception_retry_configuration=None, **kwargs)
+    return RateLimitedProvider(provider, get_endpoint(url))
@@ -1,12 +1,18 @@
+import os
 import sys
 import json
 import time
 import random
+from collections import Counter
 import pandas as pd
 from web3 import Web3, constants
 from pathlib import Path
 from web3.middleware import ExtraDataToPOAMiddleware
 
+from grader.rpc_client import rate_limited_provider
+from grader.rpc_cassette import CassetteProvider, get_cassette, parse_latency
+from grader.multicall import multicall
+
 
 class bcolors:
     HEADER = '\033[95m'
@@ -27,11 +33,39 @@ def connect_to(chain):
     if chain == 'bsc':
         api_url = f"https://data-seed-prebsc-1-s1.binance.org:8545/"  # BSC testnet
     if chain in ['avax', 'bsc']:
-        w3 = Web3(Web3.HTTPProvider(api_url))
+        # The harness's own rate limiter and cassette (see grader/), never the student's modules
+        provider = rate_limited_provider(api_url)
+        cassette = grader_cassette()
+        if cassette is not None:
+            provider = CassetteProvider(cassette, chain, provider)
+        w3 = Web3(provider)
         w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
     return w3
 
 
+def grader_cassette():
+    """
+        The grader's record/replay cassette if BRIDGE_CASSETTE is set, else None
+        It is kept next to the student's cassette, since their bridge writes BRIDGE_CASSETTE itself
+    """
+    cassette = os.environ.get("BRIDGE_CASSETTE")
+    if not cassette:
+        return None
+    mode = os.environ.get("BRIDGE_CASSETTE_MODE", "replay")
+    latency = parse_latency(os.environ.get("BRIDGE_CASSETTE_LATENCY"))
+    return get_cassette(f"{cassette}.grader", mode, latency)
+
+
+def deposit_amounts(n):
+    """
+        n random deposit amounts; a cassette run records them, so that its replay signs
+        and sends exactly the transactions that were recorded
+    """
+    make = lambda: [random.randint(10, 1000) for _ in range(n)]
+    cassette = grader_cassette()
+    return make() if cassette is None else cassette.value("deposit_amounts", make)
+
+
 def get_source_contract(contract_file):
     try:
         with contract_file.open('r')  as f:
@@ -77,6 +111,93 @@ def get_destination_contract(contract_file):
 
 ########################################
 
+# Immutable reads (ERC20 ABI, erc20s.csv, token metadata) are memoized here.
+# farm.py swaps this for a multiprocessing Manager dict shared by all of its workers.
+_read_cache = {}
+
+
+def set_read_cache(cache):
+    global _read_cache
+    _read_cache = cache
+
+
+def cached_read(key, load):
+    """
+        key - hashable cache key
+        load - callable producing the value on a cache miss
+    """
+    try:
+        return _read_cache[key]
+    except KeyError:
+        value = load()
+        _read_cache[key] = value
+        return value
+
+
+def load_erc20_abi(erc20s_abi_file):
+    def load():
+        with open(erc20s_abi_file, 'r') as f:
+            return json.load(f)
+    return cached_read(('abi', str(erc20s_abi_file)), load)
+
+
+def read_erc20s_csv(erc20s_file):
+    """
+        Returns a dictionary mapping each chain in "erc20s.csv" to its unique token addresses
+    """
+    def load():
+        df = pd.read_csv(erc20s_file)
+        return {chain: list(group['address'].unique()) for chain, group in df.groupby('chain')}
+    return cached_read(('erc20s', str(erc20s_file)), load)
+
+
+def batch_read(w3, calls):
+    """
+        w3 - web3 instance all the calls go to
+        calls - (list) bound contract calls, e.g. token.functions.balanceOf(user)
+
+        Runs all the calls in one Multicall3 round trip (falling back to one eth_call
+        each where that fails).  Failed calls come back as None
+    """
+    if not calls:
+        return []
+    try:
+        return multicall(w3, calls)
+    except Exception as e:
+        print(f"Multicall3 batch failed, falling back to individual calls\n{e}")
+    results = []
+    for call in calls:
+        try:
+            results.append(call.call())
+        except Exception:
+            results.append(None)
+    return results
+
+
+def _token_metadata_key(token, name):
+    return 'token', getattr(token.w3.provider, 'endpoint_uri', ''), token.address, name
+
+
+def token_metadata(token, name):
+    """
+        token - (contract object)
+        name - (string) a constant, argument-free view function, e.g. 'symbol' or 'MINTER_ROLE'
+    """
+    return cached_read(_token_metadata_key(token, name), lambda: getattr(token.functions, name)().call())
+
+
+def token_metadata_many(tokens, name):
+    """
+        Like token_metadata for a list of tokens on one chain; cache misses are read in a single batch
+    """
+    missing = [t for t in tokens if _token_metadata_key(t, name) not in _read_cache]
+    if missing:
+        values = batch_read(missing[0].w3, [getattr(t.functions, name)() for t in missing])
+        for token, value in zip(missing, values):
+            if value is not None:
+                _read_cache[_token_metadata_key(token, name)] = value
+    return [_read_cache.get(_token_metadata_key(t, name)) for t in tokens]
+
 
 def get_erc20s(w3, chain, n, erc20s_file, erc20s_abi_file):
     """
@@ -90,8 +211,7 @@ def get_erc20s(w3, chain, n, erc20s_file, erc20s_abi_file):
 
     contracts = []
     try:
-        df = pd.read_csv(erc20s_file)
-        contracts = df.loc[df['chain'] == chain]['address'].unique()
+        contracts = read_erc20s_csv(erc20s_file).get(chain, [])
     except Exception as e:
         print(f"{bcolors.WARNING}INCOMPLETE{bcolors.ENDC}: "
               f"unable to read ERC20 contracts\nMake sure you add your "
@@ -108,8 +228,7 @@ def get_erc20s(w3, chain, n, erc20s_file, erc20s_abi_file):
 
     # Try to read the ABI from a local file
     if erc20s_abi_file.is_file():
-        with open(erc20s_abi_file, 'r') as f:
-            erc20_abi = json.load(f)
+        erc20_abi = load_erc20_abi(erc20s_abi_file)
     else:
         print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: "
               f"ERC20 ABI file does not exist\nContact your instructor")
@@ -158,8 +277,7 @@ def get_wrapped_token_object(src_token, destination_w3, destination_contract, er
         return None
 
     try:
-        with open(erc20_abi_file, 'r') as f:
-            ERC20_ABI = json.load(f)
+        ERC20_ABI = load_erc20_abi(erc20_abi_file)
         wrapped_token = destination_w3.eth.contract(abi=ERC20_ABI, address=wrapped_token_address)
     except Exception as e:
         print(
@@ -170,29 +288,62 @@ def get_wrapped_token_object(src_token, destination_w3, destination_contract, er
     return wrapped_token
 
 
-def sign_and_send(contract, function, signer, argdict, confirm=True, force_nonce=0):
+class NonceTracker:
+    """
+        Hands out consecutive nonces (and a cached gas price) per chain and account,
+        so a batch of transactions can be submitted back-to-back without waiting
+        for each one to be mined
+    """
+
+    def __init__(self):
+        self.nonces = {}
+        self.gas_prices = {}
+
+    def next_nonce(self, w3, address):
+        key = (id(w3), address)
+        if key not in self.nonces:
+            self.nonces[key] = w3.eth.get_transaction_count(address, 'pending')
+        nonce = self.nonces[key]
+        self.nonces[key] += 1
+        return nonce
+
+    def reset(self, w3, address):
+        """Forget the local nonce (e.g. after a failed send) so it is re-read from the chain"""
+        self.nonces.pop((id(w3), address), None)
+
+    def gas_price(self, w3):
+        if id(w3) not in self.gas_prices:
+            self.gas_prices[id(w3)] = w3.eth.gas_price
+        return self.gas_prices[id(w3)]
+
+
+def sign_and_send(contract, function, signer, argdict, confirm=True, nonces=None):
     """
         contract - (contract object) 
         functin - (string) the function to be called on the contract
         signer - (account object) the account that should initiate the transaction
         argdict - (dictionary) the function arguments as key-value pairs
         confirm - (boolean) whether to wait for confirmation from the chain
-        force_nonce - (int) signAndSend gets the signer's nonce from on-chain, so if you call it multiple times
-        in rapid succession, the later transactions will fail.  This allow you to specify the nonce based on the 
-        return from sign_and_send if you know you're going to call the function repeatedly
+        nonces - (NonceTracker) if given, nonces are assigned locally so that many transactions
+        can be sent in rapid succession (use confirm=False and wait_for_receipts to pipeline them)
     """
     w3 = contract.w3
-    nonce = w3.eth.get_transaction_count(signer.address)
-    if nonce <= force_nonce:
-        nonce = force_nonce + 1
+    if nonces is not None:
+        nonce = nonces.next_nonce(w3, signer.address)
+        gas_price = nonces.gas_price(w3)
+    else:
+        nonce = w3.eth.get_transaction_count(signer.address, 'pending')
+        gas_price = w3.eth.gas_price
     contract_func = getattr(contract.functions, function)
     try:
         tx = contract_func(**argdict).build_transaction(
-            {'nonce': nonce, 'gasPrice': w3.eth.gas_price, 'from': signer.address,
+            {'nonce': nonce, 'gasPrice': gas_price, 'from': signer.address,
              'gas': 10 ** 6})  # Must set gas price (https://github.com/ethereum/web3.py/issues/2307)
     except Exception as e:
         print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: in sign_and_send, failed to build "
               f"transaction (function = {function})\n{e}")
+        if nonces is not None:
+            nonces.reset(w3, signer.address)
         return None
     signed_tx = w3.eth.account.sign_transaction(tx, signer.key)
 
@@ -201,63 +352,143 @@ def sign_and_send(contract, function, signer, argdict, confirm=True, force_nonce
     except Exception as e:
         print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: in sign_and_send, failed to send "
               f"transaction (function = {function})\n{e}")
+        if nonces is not None:
+            nonces.reset(w3, signer.address)
         return None
 
     if confirm:
-        tx_receipt = w3.eth.wait_for_transaction_receipt(signed_tx.hash)
+        wait_for_receipts(w3, [(function, signed_tx.hash)])
+
+    return signed_tx.hash.hex(), nonce
+
+
+def wait_for_receipts(w3, pending, timeout=120):
+    """
+        w3 - web3 instance the transactions were sent to
+        pending - (list) (function name, transaction hash) pairs
+        timeout - (int) seconds to wait for the whole batch
+
+        Block until every transaction in the batch is mined (or the deadline passes)
+        Returns the number of successful transactions
+    """
+    deadline = time.monotonic() + timeout
+    succeeded = 0
+    for function, tx_hash in pending:
+        try:
+            tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=max(deadline - time.monotonic(), 1),
+                                                             poll_latency=0.5)
+        except Exception as e:
+            print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: Transaction for '{function}' was not mined in time\n{e}")
+            continue
         if tx_receipt.status:
-            print(f"{bcolors.OKGREEN}SUCCESS{bcolors.ENDC}: in sign_and_send, Transaction confirmed for '{function}' at block {tx_receipt.blockNumber}")
+            succeeded += 1
+            print(f"{bcolors.OKGREEN}SUCCESS{bcolors.ENDC}: Transaction confirmed for '{function}' at block {tx_receipt.blockNumber}")
         else:
-            print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: in sign_and_send, Transaction "
-                  f"failed '{function}'\n{signed_tx.hash.hex()}")
+            print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: Transaction "
+                  f"failed '{function}'\n{Web3.to_hex(tx_hash)}")
+    return succeeded
 
-    return signed_tx.hash.hex(), nonce
 
+def wait_for_events(check, expected, key, timeout=60, poll_interval=1):
+    """
+        check - callable returning the list of event dictionaries seen so far
+        expected - (list) match keys of the events we are waiting for
+        key - callable mapping an event dictionary to its match key
 
-def ensure_balance(token, user, bal, minter):
+        Poll 'check' until every expected key has shown up or the timeout passes,
+        instead of sleeping for a fixed amount of time
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        events = check()
+        if not (Counter(expected) - Counter(key(e) for e in events)) or time.monotonic() >= deadline:
+            return events
+        time.sleep(poll_interval)
+
+
+def ensure_balance(token, user, bal, minter, nonces=None, pending=None):
     """
         token - (contract object) an ERC20 token
         user - (address)
         bal - (int)
+        pending - (list) if given, the mint is sent without waiting and its
+        (function, hash) pair is appended here for a later wait_for_receipts
         Ensure the address "user" has a balance of at least bal in the ERC20 token.
         If the user's balance is below bal, new tokens are minted
     """
+    return ensure_balances([(token, user)], bal, minter, nonces, pending)
 
-    current_balance = token.functions.balanceOf(user).call()
-    if current_balance >= bal:
-        return True
 
-    try:
-        is_minter = token.functions.hasRole(token.functions.MINTER_ROLE().call(), minter.address)
-    except Exception as e:
-        print(f"Failed to call 'hasRole'")
+def ensure_balances(pairs, bal, minter, nonces=None, pending=None):
+    """
+        pairs - (list) (token contract, user address) pairs, all on the same chain
+        minter - (account object) or None if this run must not mint (a short balance is then an error)
+        Batched ensure_balance: every balanceOf is read in one round trip, and
+        MINTER_ROLE / hasRole / symbol only for the tokens that need a top-up
+    """
+    if not pairs:
+        return True
+    w3 = pairs[0][0].w3
+    balances = batch_read(w3, [token.functions.balanceOf(user) for token, user in pairs])
+    if any(b is None for b in balances):
+        print(f"Failed to call 'balanceOf'")
         print("Contact your instructor")
-        print(e)
         return False
-
-    if not is_minter:
-        print(f"{minter.address} is not allowed to mint tokens on {token.address}")
+    short = [(token, user, current) for (token, user), current in zip(pairs, balances) if current < bal]
+    if not short:
+        return True
+    if minter is None:
+        for token, user, current_balance in short:
+            print(f"{user} holds only {current_balance} of {token.address} and this run has no minter")
         print("Contact your instructor")
         return False
 
-    print("Grader low on tokens, topping up before we check student contracts")
-    print(f"Minting {bal - current_balance} {token.functions.symbol().call()} tokens to {user}")
-    sign_and_send(token, 'mint', minter, {'to': user, 'amount': bal - current_balance})
-
-
-def get_wrapped_token(token, destination_w3, destination_contract, erc20s_abi_file):
+    tokens = list({token.address: token for token, _, _ in short}.values())
+    roles = token_metadata_many(tokens, 'MINTER_ROLE')
+    symbols = token_metadata_many(tokens, 'symbol')
+    # A token whose MINTER_ROLE() failed cannot be asked hasRole(None, ...)
+    is_minter = batch_read(w3, [t.functions.hasRole(role, minter.address)
+                                for t, role in zip(tokens, roles) if role is not None])
+    if len(is_minter) < len(tokens) or any(m is None for m in is_minter):
+        print(f"Failed to call 'hasRole'")
+        print("Contact your instructor")
+        return False
+    can_mint = {t.address: m for t, m in zip(tokens, is_minter)}
+    symbol = {t.address: s for t, s in zip(tokens, symbols)}
+
+    ok = True
+    for token, user, current_balance in short:
+        if not can_mint[token.address]:
+            print(f"{minter.address} is not allowed to mint tokens on {token.address}")
+            print("Contact your instructor")
+            ok = False
+            continue
+
+        print("Grader low on tokens, topping up before we check student contracts")
+        print(f"Minting {bal - current_balance} {symbol[token.address]} tokens to {user}")
+        sent = sign_and_send(token, 'mint', minter, {'to': user, 'amount': bal - current_balance},
+                             confirm=pending is None, nonces=nonces)
+        if sent is None:
+            ok = False
+        elif pending is not None:
+            pending.append(('mint', sent[0]))
+    return ok
+
+
+def get_wrapped_token(token, destination_w3, destination_contract, erc20s_abi_file, wrapped_token_address=None):
     """
         token - (contract object) underlying token on source chain
+        wrapped_token_address - (string) wrapped_tokens(token) if it was already read, e.g. in a batch
         Returns a contract object corresponding to the wrapped version of this asset on the destination chain
     """
     try:
-        wrapped_token_address = destination_contract.functions.wrapped_tokens(token.address).call()
+        if wrapped_token_address is None:
+            wrapped_token_address = destination_contract.functions.wrapped_tokens(token.address).call()
     except Exception as e:
         print(f"Failed to get wrapped token for {token.address} on contract {destination_contract.address}\n{e}")
         return None
 
-    with open(erc20s_abi_file, 'r') as f:
-        erc20_abi = json.load(f)
+    erc20_abi = load_erc20_abi(erc20s_abi_file)
 
     try:
         wrapped_token = destination_w3.eth.contract(abi=erc20_abi, address=wrapped_token_address)
@@ -269,27 +500,41 @@ def get_wrapped_token(token, destination_w3, destination_contract, erc20s_abi_fi
     return wrapped_token
 
 
-def check_token_registration(source_contract, deposits, destination_contract, minter):
+def check_token_registration(source_contract, deposits, destination_contract, minter, wrapped=None, nonces=None):
     """
        check erc20s are registered on contracts
+       wrapped - (list) wrapped_tokens() of each deposit's token, if it was already read
+       nonces - (NonceTracker) if given, any top-up mints are pipelined and waited for together
     """
+    approved = batch_read(source_contract.w3,
+                          [source_contract.functions.approved(d['token'].address) for d in deposits])
+    if wrapped is None:
+        wrapped = batch_read(destination_contract.w3,
+                             [destination_contract.functions.wrapped_tokens(d['token'].address) for d in deposits])
+
     not_registered = []
-    for d in deposits:
+    to_fund = []
+    for d, is_approved, wrapped_token in zip(deposits, approved, wrapped):
         token = d['token']  # Contract object (not address)
         sender = d['sender']  # Account object (not address)
 
-        if not source_contract.functions.approved(token.address).call():
+        if not is_approved:
             print(f"\n{bcolors.WARNING}INCOMPLETE{bcolors.ENDC}: you need to call registerToken({token.address})\n"
                   f"Before submitting your assignment")
             not_registered.append(token.address)
         else:
-            ensure_balance(token, sender.address, 10 ** 6, minter)
+            to_fund.append((token, sender.address))
 
-        if constants.ADDRESS_ZERO == destination_contract.functions.wrapped_tokens(token.address).call():
+        if wrapped_token in (None, constants.ADDRESS_ZERO):
             print(f"\n{bcolors.WARNING}INCOMPLETE{bcolors.ENDC}:  you need to call createToken({token.address})\n"
                   f"Before submitting your assignment")
             not_registered.append(token.address)
 
+    pending_mints = []
+    ensure_balances(to_fund, 10 ** 6, minter, nonces=nonces, pending=pending_mints if nonces is not None else None)
+    if pending_mints:
+        wait_for_receipts(source_contract.w3, pending_mints)
+
     return 0 == len(not_registered)
 
 
@@ -303,47 +548,55 @@ def check_contract_addresses(source, destination):
     return True
 
 
-def make_deposits(deposits, source_contract):
+def make_deposits(deposits, source_contract, nonces):
     """
         deposits - (list of dictionaries)  
+        nonces - (NonceTracker)
         Make deposits on the source chain
+        All approve/deposit transactions are submitted back-to-back and then waited for together
     """
     print(f"SourceContract.address = {source_contract.address}")
-    nonce = 0
+    pending = []
     for d in deposits:
         token = d['token']  # Contract object (not address)
         sender = d['sender']  # Account object (not address)
         receiver = d['receiver']  # address
         amount = d['amount']  # int
 
-        try:
-            transaction_hash, nonce = sign_and_send(token,
-                                                    "approve", 
-                                                    sender,
-                                                    {'spender': source_contract.address, 'amount': amount}, 
-                                                    force_nonce=nonce)
-            print(f"Approval transaction Hash {transaction_hash}\n")
-        except Exception as e:
-            print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: Failed to approve token transfer\nContact your instructor\n{e}\n")
-
-        try:
-            transaction_hash, nonce = sign_and_send(source_contract,
-                                                    "deposit", 
-                                                    sender,
-                                                    {'_token': token.address, '_recipient': receiver, '_amount': amount},
-                                                    force_nonce=nonce)
-            print(f"Deposit transaction Hash = {transaction_hash}\n")
-        except Exception as e:
-            print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: deposit transaction failed on source chain\n{e}\n")
-
-
-def make_withdrawals(withdrawals, destination_contract):
+        sent = sign_and_send(token,
+                             "approve",
+                             sender,
+                             {'spender': source_contract.address, 'amount': amount},
+                             confirm=False, nonces=nonces)
+        if sent is None:
+            print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: Failed to approve token transfer\nContact your instructor\n")
+            continue
+        print(f"Approval transaction Hash {sent[0]}\n")
+        pending.append(("approve", sent[0]))
+
+        sent = sign_and_send(source_contract,
+                             "deposit",
+                             sender,
+                             {'_token': token.address, '_recipient': receiver, '_amount': amount},
+                             confirm=False, nonces=nonces)
+        if sent is None:
+            print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: deposit transaction failed on source chain\n")
+            continue
+        print(f"Deposit transaction Hash = {sent[0]}\n")
+        pending.append(("deposit", sent[0]))
+
+    wait_for_receipts(source_contract.w3, pending)
+
+
+def make_withdrawals(withdrawals, destination_contract, nonces):
     """
         withdrawals - (list of dictionaries)  
+        nonces - (NonceTracker)
         Make withdrawals on the destination chain
+        All unwrap transactions are submitted back-to-back and then waited for together
     """
     print(f"DestinationContract.address = {destination_contract.address}")
-    nonce = 0
+    pending = []
     for d in withdrawals:
         token = d['token']  # Contract object of wrapped token (not address)
         sender = d['sender']  # Account object (not address)
@@ -351,25 +604,33 @@ def make_withdrawals(withdrawals, destination_contract):
         amount = d['amount']  # int
 
         # No need to approve withdrawal, the bridge can withdraw without approvals to save gas
-        try:
-            transaction_hash, nonce = sign_and_send(destination_contract, 
-                                                    "unwrap", 
-                                                    sender,
-                                                    {'_wrapped_token': token.address, '_recipient': receiver, '_amount': amount},
-                                                    force_nonce=nonce)
-            print(f"Unwrap transaction Hash = {transaction_hash}")
-        except Exception as e:
-            print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: unwrap transaction failed on destination chain\n{e}\n")
+        sent = sign_and_send(destination_contract,
+                             "unwrap",
+                             sender,
+                             {'_wrapped_token': token.address, '_recipient': receiver, '_amount': amount},
+                             confirm=False, nonces=nonces)
+        if sent is None:
+            print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: unwrap transaction failed on destination chain\n")
+            continue
+        print(f"Unwrap transaction Hash = {sent[0]}")
+        pending.append(("unwrap", sent[0]))
 
+    wait_for_receipts(destination_contract.w3, pending)
 
-def check_for_wrap(destination_w3, destination_contract):
+
+def check_for_wrap(destination_w3, destination_contract, start_block=None, verbose=True):
+    """
+        start_block - (int) first block to scan, defaults to the last 10 blocks
+        Returns all Wrap events from start_block to the current head
+    """
     end_block = destination_w3.eth.get_block_number()
-    start_block = end_block - 10
-    print(f"Autograder scanning blocks {start_block} - {end_block} on destination")
-    event_filter = destination_contract.events.Wrap.create_filter(from_block=start_block, to_block=end_block,
-                                                                  argument_filters={})
-    events = event_filter.get_all_entries()
-    print(f"Autograder found {len(events)} events")
+    if start_block is None:
+        start_block = end_block - 10
+    if verbose:
+        print(f"Autograder scanning blocks {start_block} - {end_block} on destination")
+    events = destination_contract.events.Wrap.get_logs(from_block=start_block, to_block=end_block)
+    if verbose:
+        print(f"Autograder found {len(events)} events")
 
     wrap_events = []
     for evt in events:
@@ -383,20 +644,26 @@ def check_for_wrap(destination_w3, destination_contract):
             'transactionHash': evt.transactionHash.hex(),
             'address': evt.address,
         }
-        print(json.dumps(data, indent=2))
+        if verbose:
+            print(json.dumps(data, indent=2))
         wrap_events.append(data)
 
     return wrap_events
 
 
-def check_for_withdrawal(source_w3, source_contract):
+def check_for_withdrawal(source_w3, source_contract, start_block=None, verbose=True):
+    """
+        start_block - (int) first block to scan, defaults to the last 10 blocks
+        Returns all Withdrawal events from start_block to the current head
+    """
     end_block = source_w3.eth.get_block_number()
-    start_block = end_block - 10
-    print(f"Autograder scanning blocks {start_block} - {end_block} on source")
-    event_filter = source_contract.events.Withdrawal.create_filter(from_block=start_block, to_block=end_block,
-                                                                   argument_filters={})
-    events = event_filter.get_all_entries()
-    print(f"Autograder found {len(events)} Withdrawal events")
+    if start_block is None:
+        start_block = end_block - 10
+    if verbose:
+        print(f"Autograder scanning blocks {start_block} - {end_block} on source")
+    events = source_contract.events.Withdrawal.get_logs(from_block=start_block, to_block=end_block)
+    if verbose:
+        print(f"Autograder found {len(events)} Withdrawal events")
 
     withdrawal_events = []
     for evt in events:
@@ -409,12 +676,43 @@ def check_for_withdrawal(source_w3, source_contract):
             'transactionHash': evt.transactionHash.hex(),
             'address': evt.address,
         }
-        print(json.dumps(data, indent=2))
+        if verbose:
+            print(json.dumps(data, indent=2))
         withdrawal_events.append(data)
     return withdrawal_events
 
 
-def validate(code_path):
+def count_matches(expected, events, key):
+    """
+        expected - (list) match keys we are looking for
+        events - (list) event dictionaries
+        key - callable mapping an event dictionary to its match key
+
+        Hash-index the events once, then look each expected transfer up in O(1)
+        Every event can satisfy at most one expected transfer
+    """
+    index = Counter(key(e) for e in events)
+    matched = 0
+    for k in expected:
+        if index[k] > 0:
+            index[k] -= 1
+            matched += 1
+        else:
+            print(f"No matching event for (recipient, amount, token) = {k}")
+    return matched
+
+
+DEFAULT_KEY_IDS = {'user_a': 0, 'user_b': 3, 'minter': 1}
+
+
+def validate(code_path, key_ids=None):
+    """
+        code_path - (Path) the student's repository
+        key_ids - (dictionary) which lines of "eth_mnemonic.txt" to use for 'user_a', 'user_b'
+        and 'minter', so concurrent runs can be given disjoint accounts (defaults to DEFAULT_KEY_IDS);
+        a 'minter' of None means this run never mints, e.g. because the caller topped up beforehand
+    """
+    key_ids = {**DEFAULT_KEY_IDS, **(key_ids or {})}
 
     contract_file = code_path / "contract_info.json"
     erc20s_file = code_path / "erc20s.csv"
@@ -422,9 +720,10 @@ def validate(code_path):
     erc20s_abi_file = Path(__file__).parent.absolute() / "ERC20ABI.json"
     source_chain = 'avax'
     destination_chain = 'bsc'
-    user_a = get_eth_keys(keys_file, keyId=0)
-    user_b = get_eth_keys(keys_file, keyId=3)
-    minter = get_eth_keys(keys_file, keyId=1)
+    user_a = get_eth_keys(keys_file, keyId=key_ids['user_a'])
+    user_b = get_eth_keys(keys_file, keyId=key_ids['user_b'])
+    minter = get_eth_keys(keys_file, keyId=key_ids['minter']) if key_ids['minter'] is not None else None
+    nonces = NonceTracker()
 
     print(f"{bcolors.OKCYAN}STARTING GRADER SETUP{bcolors.ENDC}:")
     # Check all required student files are in their repo
@@ -472,15 +771,16 @@ def validate(code_path):
         {'token': token,
          'sender': user_a,
          'receiver': user_b.address,
-         'amount': random.randint(10, 1000)} for token in tokens]
+         'amount': amount} for token, amount in zip(tokens, deposit_amounts(len(tokens)))]
+    wrapped = batch_read(destination_w3, [destination_contract.functions.wrapped_tokens(t.address) for t in tokens])
     withdrawals = [
-        {'token': get_wrapped_token(t['token'], destination_w3, destination_contract, erc20s_abi_file),
+        {'token': get_wrapped_token(t['token'], destination_w3, destination_contract, erc20s_abi_file, w),
          'sender': user_b,
          'receiver': user_a.address,
-         'amount': t['amount']} for t in deposits]
+         'amount': t['amount']} for t, w in zip(deposits, wrapped)]
 
     # Verify that the student registered the tokens they recorded in the erc20s.csv
-    if not check_token_registration(source_contract, deposits, destination_contract, minter):
+    if not check_token_registration(source_contract, deposits, destination_contract, minter, wrapped, nonces):
         return setup_points
     else:
         print(f"{bcolors.OKGREEN}SUCCESS{bcolors.ENDC}: ERC20s are valid and registered")
@@ -492,11 +792,11 @@ def validate(code_path):
     final score calculation
     """
     print("\n----- AutoGrader sending deposits to student Source contract -----")
-    make_deposits(deposits, source_contract)
-    time.sleep(5)
+    make_deposits(deposits, source_contract, nonces)
 
     print(f"{bcolors.OKCYAN}GRADER SETUP COMPLETE{bcolors.ENDC}:\n")
     print("\n----- Calling student 'bridge.scan_blocks()' -----")
+    wrap_start = destination_w3.eth.get_block_number()
     try:
         from bridge import scan_blocks
         scan_blocks('source', contract_file)  # Run the student's code
@@ -505,30 +805,21 @@ def validate(code_path):
         return setup_points
 
     print("\n----- AutoGrader searching for Wrap events on student Destination contract -----")
-    time.sleep(5)
-    # Now we search the destination chain for Wrap events
-    wrap_events = check_for_wrap(destination_w3, destination_contract)
-    if len(wrap_events) == 0:
-        time.sleep(5)
-        wrap_events = check_for_wrap(destination_w3, destination_contract)
-    score = 0
-    for d in deposits:
-        for w in wrap_events:
-            if d['receiver'] == w['to'] and d['amount'] == w['amount'] and d['token'].address == w['underlying_token']:
-                score += 1
-                break
-            else:
-                print(f"{d['receiver']} ?= {w['to']}\n"
-                      f"{d['amount']} ?= {w['amount']}\n"
-                      f"{d['token'].address} ?= {w['underlying_token']}")
+    # Now we wait for the Wrap events to show up on the destination chain
+    expected_wraps = [(d['receiver'], d['amount'], d['token'].address) for d in deposits]
+    wrap_key = lambda w: (w['to'], w['amount'], w['underlying_token'])
+    wrap_events = wait_for_events(lambda: check_for_wrap(destination_w3, destination_contract, wrap_start, verbose=False),
+                                  expected_wraps, wrap_key)
+    print(f"Autograder found {len(wrap_events)} Wrap events since block {wrap_start}")
+    score = count_matches(expected_wraps, wrap_events, wrap_key)
 
     ############################################################
     # Now we test the reverse direction
     # We make withdrawals on the destination chain and check if the message gets passed back to the source chain
     print("\n----- AutoGrader sending Unwrap to student Destination contract -----")
-    make_withdrawals(withdrawals, destination_contract)
-    time.sleep(5)
+    make_withdrawals(withdrawals, destination_contract, nonces)
     print("\n----- Calling student 'bridge.scan_blocks()' -----")
+    withdrawal_start = source_w3.eth.get_block_number()
     try:
         from bridge import scan_blocks
         scan_blocks('destination', contract_file)  # Run the student's code
@@ -536,25 +827,16 @@ def validate(code_path):
         print(f"{bcolors.FAIL}ERROR{bcolors.ENDC}: running scan_blocks('destination')\n{e}")
         return max((100.0 * (float(score) / (2 * len(deposits)))), setup_points)
 
-    # Now we search the source chain for Withdraw events
+    # Now we wait for the Withdrawal events to show up on the source chain
     print("\n----- AutoGrader searching for Withdraw events on student Source contract -----")
-    time.sleep(5)
-    withdrawal_events = check_for_withdrawal(source_w3, source_contract)
-    if len(withdrawal_events) == 0:
-        time.sleep(5)
-        withdrawal_events = check_for_wrap(destination_w3, destination_contract)
-
-    for u in withdrawals:
-        for w in withdrawal_events:
-            if u['receiver'] == w['recipient'] and \
-                    u['amount'] == w['amount'] and \
-                    destination_contract.functions.underlying_tokens(u['token'].address).call() == w['token']:
-                score += 1
-                break
-            else:
-                print(f"{u['receiver']} ?= {w['recipient']}")
-                print(f"{u['amount']} ?= {w['amount']}")
-                print(f"{destination_contract.functions.underlying_tokens(u['token'].address).call()} ?= {w['token']}")
+    underlying = batch_read(destination_w3,
+                            [destination_contract.functions.underlying_tokens(u['token'].address) for u in withdrawals])
+    expected_withdrawals = [(u['receiver'], u['amount'], token) for u, token in zip(withdrawals, underlying)]
+    withdrawal_key = lambda w: (w['recipient'], w['amount'], w['token'])
+    withdrawal_events = wait_for_events(lambda: check_for_withdrawal(source_w3, source_contract, withdrawal_start, verbose=False),
+                                        expected_withdrawals, withdrawal_key)
+    print(f"Autograder found {len(withdrawal_events)} Withdrawal events since block {withdrawal_start}")
+    score += count_matches(expected_withdrawals, withdrawal_events, withdrawal_key)
 
     return max((100.0 * (float(score) / (2 * len(deposits)))), setup_points)
 
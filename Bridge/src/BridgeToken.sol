@@ -7,7 +7,7 @@ import "@openzeppelin/contracts/access/AccessControl.sol";
 
 contract BridgeToken is ERC20, ERC20Burnable, AccessControl {
     bytes32 public constant MINTER_ROLE = keccak256("MINTER_ROLE");
-	address public underlying;
+	address public immutable underlying;
 
     constructor( address _underlying, string memory name, string memory symbol, address admin ) ERC20(name,symbol) {
 		underlying = _underlying;
@@ -2,36 +2,63 @@
 pragma solidity ^0.8.17;
 
 import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
-import "@openzeppelin/contracts/token/ERC20/extensions/ERC20Burnable.sol";
 import "@openzeppelin/contracts/access/AccessControl.sol";
+import "./BridgeToken.sol";
 
-contract BridgeToken is ERC20, ERC20Burnable, AccessControl {
-    bytes32 public constant MINTER_ROLE = keccak256("MINTER_ROLE");
-	address public underlying;
+contract Destination is AccessControl {
+    bytes32 public constant WARDEN_ROLE = keccak256("BRIDGE_WARDEN_ROLE");
+    bytes32 public constant CREATOR_ROLE = keccak256("CREATOR_ROLE");
+	mapping( address => address) public underlying_tokens;
+	mapping( address => address) public wrapped_tokens;
+	address[] public tokens;
+	// Sequence number of the last Unwrap, so relayers can spot missed events
+	uint256 public unwrapNonce;
 
-    constructor( address _underlying, string memory name, string memory symbol, address admin ) ERC20(name,symbol) {
-		underlying = _underlying;
+	event Creation( address indexed underlying_token, address indexed wrapped_token );
+	event Wrap( address indexed underlying_token, address indexed wrapped_token, address indexed to, uint256 amount );
+	event Unwrap( address indexed underlying_token, address indexed wrapped_token, address frm, address indexed to, uint256 amount, uint256 nonce );
+
+	error TokenNotCreated( address token );
+	error TokenAlreadyCreated( address underlying_token );
+	error ZeroAmount();
+
+    constructor( address admin ) {
         _grantRole(DEFAULT_ADMIN_ROLE, admin);
-        _grantRole(MINTER_ROLE, admin);
+        _grantRole(CREATOR_ROLE, admin);
+        _grantRole(WARDEN_ROLE, admin);
     }
 
-    function mint(address to, uint256 amount) public onlyRole(MINTER_ROLE) {
-        _mint(to, amount);
-    }
+	function wrap(address _underlying_token, address _recipient, uint256 _amount ) public onlyRole(WARDEN_ROLE) {
+		address wrapped_token = wrapped_tokens[_underlying_token];
+		if( wrapped_token == address(0) ) revert TokenNotCreated(_underlying_token);
+		if( _amount == 0 ) revert ZeroAmount();
 
-    function clawBack(address account, uint256 amount) public onlyRole(MINTER_ROLE) {
-        _burn(account, amount);
-    }
+		BridgeToken(wrapped_token).mint(_recipient, _amount);
 
-    function burnFrom(address account, uint256 amount) public override {
-		/*
-		   Override OpenZeppelin's burnFrom function to allow the MINTER_ROLE to burn without an allowance
-		*/
-		if( ! hasRole(MINTER_ROLE,msg.sender) ) {
-			_spendAllowance(account, _msgSender(), amount);
-		}
-        _burn(account, amount);
-    }
-}
+		emit Wrap(_underlying_token, wrapped_token, _recipient, _amount);
+	}
 
+	function unwrap(address _wrapped_token, address _recipient, uint256 _amount ) public {
+		address underlying_token = underlying_tokens[_wrapped_token];
+		if( underlying_token == address(0) ) revert TokenNotCreated(_wrapped_token);
+		if( _amount == 0 ) revert ZeroAmount();
 
+		// Destination holds MINTER_ROLE on its tokens, so no allowance is needed to burn
+		BridgeToken(_wrapped_token).burnFrom(msg.sender, _amount);
+
+		emit Unwrap(underlying_token, _wrapped_token, msg.sender, _recipient, _amount, ++unwrapNonce);
+	}
+
+	function createToken(address _underlying_token, string memory name, string memory symbol ) public onlyRole(CREATOR_ROLE) returns(address) {
+		if( wrapped_tokens[_underlying_token] != address(0) ) revert TokenAlreadyCreated(_underlying_token);
+
+		BridgeToken wrapped_token = new BridgeToken(_underlying_token, name, symbol, address(this));
+		underlying_tokens[address(wrapped_token)] = _underlying_token;
+		wrapped_tokens[_underlying_token] = address(wrapped_token);
+		tokens.push(_underlying_token);
+
+		emit Creation(_underlying_token, address(wrapped_token));
+		return address(wrapped_token);
+	}
+
+}
@@ -2,18 +2,30 @@
 pragma solidity ^0.8.17;
 
 import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+import "@openzeppelin/contracts/token/ERC20/utils/SafeERC20.sol";
+import "@openzeppelin/contracts/token/ERC20/extensions/draft-IERC20Permit.sol";
 import "@openzeppelin/contracts/access/AccessControl.sol";
 
 contract Source is AccessControl {
+	using SafeERC20 for IERC20;
+
     bytes32 public constant ADMIN_ROLE = keccak256("ADMIN_ROLE");
     bytes32 public constant WARDEN_ROLE = keccak256("BRIDGE_WARDEN_ROLE");
 	mapping( address => bool) public approved;
 	address[] public tokens;
+	// Sequence number of the last Deposit, so relayers can spot missed events
+	uint256 public depositNonce;
 
-	event Deposit( address indexed token, address indexed recipient, uint256 amount );
+	event Deposit( address indexed token, address indexed recipient, uint256 amount, uint256 nonce );
 	event Withdrawal( address indexed token, address indexed recipient, uint256 amount );
 	event Registration( address indexed token );
 
+	error TokenNotRegistered( address token );
+	error TokenAlreadyRegistered( address token );
+	error ZeroAmount();
+	error PermitFailed( address token );
+	error LengthMismatch();
+
     constructor( address admin ) {
         _grantRole(DEFAULT_ADMIN_ROLE, admin);
         _grantRole(ADMIN_ROLE, admin);
@@ -22,36 +34,84 @@ contract Source is AccessControl {
     }
 
 	function deposit(address _token, address _recipient, uint256 _amount ) public {
-		//YOUR CODE HERE
-		require(approved[_token], "Token not registered");
-    require(_amount > 0, "Amount must be greater than 0");
+		_deposit(_token, _recipient, _amount);
+	}
+
+	/*
+	   Deposit in a single transaction for EIP-2612 tokens: the depositor signs a permit for
+	   this contract off-chain instead of sending a separate approve()
+	*/
+	function depositWithPermit(address _token, address _recipient, uint256 _amount, uint256 _deadline, uint8 v, bytes32 r, bytes32 s ) public {
+		// Never call out to a token that is not registered
+		if( !approved[_token] ) revert TokenNotRegistered(_token);
+		// Anyone can submit a signed permit first (e.g. from the mempool), so a failed permit is
+		// only an error if it has not already left us the allowance we need
+		try IERC20Permit(_token).permit(msg.sender, address(this), _amount, _deadline, v, r, s) {
+		} catch {
+			if( IERC20(_token).allowance(msg.sender, address(this)) < _amount ) revert PermitFailed(_token);
+		}
+		_deposit(_token, _recipient, _amount);
+	}
+
+	/*
+	   Deposit to many recipients at once: a single transferFrom of the total, and one
+	   Deposit event (with its own nonce) per recipient
+	*/
+	function depositMany(address _token, address[] calldata _recipients, uint256[] calldata _amounts ) public {
+		if( !approved[_token] ) revert TokenNotRegistered(_token);
+		uint256 n = _recipients.length;
+		if( n != _amounts.length ) revert LengthMismatch();
+
+		uint256 total;
+		for( uint256 i; i < n; ) {
+			if( _amounts[i] == 0 ) revert ZeroAmount();
+			total += _amounts[i];
+			unchecked { ++i; }
+		}
+		if( total == 0 ) revert ZeroAmount();
+
+		IERC20(_token).safeTransferFrom(msg.sender, address(this), total);
+
+		// Count in memory and store the nonce once for the whole batch
+		uint256 nonce = depositNonce;
+		for( uint256 i; i < n; ) {
+			unchecked { ++nonce; }
+			emit Deposit(_token, _recipients[i], _amounts[i], nonce);
+			unchecked { ++i; }
+		}
+		depositNonce = nonce;
+	}
+
+	function _deposit(address _token, address _recipient, uint256 _amount ) internal {
+		if( !approved[_token] ) revert TokenNotRegistered(_token);
+		if( _amount == 0 ) revert ZeroAmount();
 
-    bool success = IERC20(_token).transferFrom(msg.sender, address(this), _amount);
-    require(success, "Transfer failed");
+		// SafeERC20 also accepts tokens that return nothing from transferFrom (e.g. USDT)
+		IERC20(_token).safeTransferFrom(msg.sender, address(this), _amount);
 
-    emit Deposit(_token, _recipient, _amount);
+		emit Deposit(_token, _recipient, _amount, ++depositNonce);
 	}
 
 	function withdraw(address _token, address _recipient, uint256 _amount ) onlyRole(WARDEN_ROLE) public {
 		//YOUR CODE HERE
 
-		require(_amount > 0, "Amount must be greater than 0");
+		if( _amount == 0 ) revert ZeroAmount();
 
-    bool success = IERC20(_token).transfer(_recipient, _amount);
-    require(success, "Transfer failed");
+		IERC20(_token).safeTransfer(_recipient, _amount);
 
-    emit Withdrawal(_token, _recipient, _amount);
+		emit Withdrawal(_token, _recipient, _amount);
 	}
 
 	function registerToken(address _token) onlyRole(ADMIN_ROLE) public {
 		//YOUR CODE HERE
 
-		require(!approved[_token], "Token already registered");
+		if( approved[_token] ) revert TokenAlreadyRegistered(_token);
 
-    approved[_token] = true;
-    tokens.push(_token);
+		approved[_token] = true;
+		// tokens(i) is part of the contract's public interface; off-chain tools use Registration logs
+		tokens.push(_token);
 
-    emit Registration(_token);
+		emit Registration(_token);
 	}
 
 
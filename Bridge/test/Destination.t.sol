@@ -23,7 +23,7 @@ contract DestinationTest is Test {
 
 	event Creation( address indexed underlying_token, address indexed wrapped_token );
 	event Wrap( address indexed underlying_token, address indexed wrapped_token, address indexed to, uint256 amount );
-	event Unwrap( address indexed underlying_token, address indexed wrapped_token, address frm, address indexed to, uint256 amount );
+	event Unwrap( address indexed underlying_token, address indexed wrapped_token, address frm, address indexed to, uint256 amount, uint256 nonce );
 
     function setUp() public {
 		destination = new Destination(admin);
@@ -83,7 +83,7 @@ contract DestinationTest is Test {
 		assertEq( ERC20(wtoken).balanceOf(d_recipient), previous_balance + amount );
 
 		vm.expectEmit(true,true,true,true);
-		emit Unwrap(address(underlying_token),wtoken,d_recipient,s_recipient,amount);
+		emit Unwrap(address(underlying_token),wtoken,d_recipient,s_recipient,amount,1);
 		vm.prank(d_recipient);
 		destination.unwrap(wtoken,s_recipient, amount);
     }
@@ -127,10 +127,28 @@ contract DestinationTest is Test {
 
 		vm.prank(user);
 		vm.expectEmit(true,true,true,true);
-		emit Unwrap( address(underlying_token), wtoken, user, user, amount );
+		emit Unwrap( address(underlying_token), wtoken, user, user, amount, 1 );
 		destination.unwrap(wtoken, user, amount);
 
 		assertEq( ERC20(wtoken).balanceOf(user), prev_balance - amount );
-	}		
+	}
+
+	function testSequentialUnwrapNonces(address user, address recipient, uint8 count) public {
+		vm.assume( user != address(0) );
+		vm.assume( recipient != address(0) );
+		vm.assume( count > 0 );
+		address wtoken = testCreation();
+
+		vm.prank(admin);
+		destination.wrap(address(underlying_token), user, count);
+
+		for( uint256 i = 1; i <= count; i++ ) {
+			vm.expectEmit(true,true,true,true);
+			emit Unwrap( address(underlying_token), wtoken, user, recipient, 1, i );
+			vm.prank(user);
+			destination.unwrap(wtoken, recipient, 1);
+		}
+		assertEq( count, destination.unwrapNonce() );
+	}
 
 }
@@ -0,0 +1,187 @@
+// SPDX-License-Identifier: UNLICENSED
+pragma solidity ^0.8.17;
+
+import "forge-std/Test.sol";
+import "../src/Source.sol";
+import "../src/BridgeToken.sol";
+import "./gas/LegacySource.sol";
+import "./gas/LegacyBridgeToken.sol";
+import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+
+contract GasToken is ERC20 {
+	constructor(uint256 supply) ERC20("Triceratops","TRI") {
+		_mint(msg.sender, supply );
+	}
+}
+
+/*
+   Gas benchmarks for every bridge entry point, run with `forge snapshot --match-contract GasTest`
+
+   All state is prepared in setUp(), so each test's gas is the call it benchmarks plus a
+   fixed prank overhead.  Every testGas<Name> has a testGas<Name>Legacy twin calling the
+   pre-optimization contracts in test/gas/ in the same state; gas_report.py prints the
+   per-function delta between the two from .gas-snapshot.
+
+   No .gas-snapshot has been committed yet: these benchmarks have not been run, so the
+   savings claimed for the optimized contracts are unverified until they are.
+*/
+contract GasTest is Test {
+	Source source;
+	LegacySource legacy_source;
+	BridgeToken wrapped;
+	LegacyBridgeToken legacy_wrapped;
+
+	GasToken token;
+	GasToken new_token;
+
+	address admin = vm.addr(uint256(keccak256(abi.encodePacked("admin"))));
+	address depositor = vm.addr(uint256(keccak256(abi.encodePacked("depositor"))));
+	address recipient = vm.addr(uint256(keccak256(abi.encodePacked("recipient"))));
+	uint256 amount = 1000 ether;
+
+    function setUp() public {
+		source = new Source(admin);
+		legacy_source = new LegacySource(admin);
+		token = new GasToken(1 << 128);
+		new_token = new GasToken(1 << 128);
+
+		vm.startPrank(admin);
+		source.registerToken(address(token));
+		legacy_source.registerToken(address(token));
+		vm.stopPrank();
+
+		// The depositor already holds tokens and has approved both bridges, and each bridge has
+		// taken a previous deposit, so deposit/withdraw touch non-zero balances and Source's
+		// depositNonce is already non-zero, as it is in production (no 0 -> 1 SSTORE that
+		// LegacySource, which has no nonce, would never pay)
+		token.transfer(depositor, 4 * amount);
+		vm.startPrank(depositor);
+		token.approve(address(source), type(uint256).max / 2);
+		token.approve(address(legacy_source), type(uint256).max / 2);
+		source.deposit(address(token), depositor, amount);
+		legacy_source.deposit(address(token), depositor, amount);
+		vm.stopPrank();
+
+		wrapped = new BridgeToken(address(token), "wTriceratops", "wTRI", admin);
+		legacy_wrapped = new LegacyBridgeToken(address(token), "wTriceratops", "wTRI", admin);
+		vm.startPrank(admin);
+		wrapped.mint(depositor, amount);
+		legacy_wrapped.mint(depositor, amount);
+		vm.stopPrank();
+		vm.startPrank(depositor);
+		wrapped.approve(recipient, amount);
+		legacy_wrapped.approve(recipient, amount);
+		vm.stopPrank();
+    }
+
+	/* Source */
+
+	function testGasRegisterToken() public {
+		vm.prank(admin);
+		source.registerToken(address(new_token));
+	}
+
+	function testGasRegisterTokenLegacy() public {
+		vm.prank(admin);
+		legacy_source.registerToken(address(new_token));
+	}
+
+	function testGasDeposit() public {
+		vm.prank(depositor);
+		source.deposit(address(token), recipient, amount);
+	}
+
+	function testGasDepositLegacy() public {
+		vm.prank(depositor);
+		legacy_source.deposit(address(token), recipient, amount);
+	}
+
+	// One depositMany to ten recipients against ten separate deposits.  In production each of
+	// those deposits is also its own transaction, adding 21000 intrinsic gas apiece on top.
+	function testGasDepositMany10() public {
+		address[] memory recipients = new address[](10);
+		uint256[] memory amounts = new uint256[](10);
+		for( uint256 i = 0; i < 10; i++ ) {
+			recipients[i] = address(uint160(uint256(uint160(recipient)) + i));
+			amounts[i] = amount / 10;
+		}
+		vm.prank(depositor);
+		source.depositMany(address(token), recipients, amounts);
+	}
+
+	function testGasDepositMany10Legacy() public {
+		vm.startPrank(depositor);
+		for( uint256 i = 0; i < 10; i++ ) {
+			legacy_source.deposit(address(token), address(uint160(uint256(uint160(recipient)) + i)), amount / 10);
+		}
+		vm.stopPrank();
+	}
+
+	function testGasWithdraw() public {
+		vm.prank(admin);
+		source.withdraw(address(token), recipient, amount / 2);
+	}
+
+	function testGasWithdrawLegacy() public {
+		vm.prank(admin);
+		legacy_source.withdraw(address(token), recipient, amount / 2);
+	}
+
+	/* BridgeToken */
+
+	function testGasDeployToken() public {
+		new BridgeToken(address(token), "wTriceratops", "wTRI", admin);
+	}
+
+	function testGasDeployTokenLegacy() public {
+		new LegacyBridgeToken(address(token), "wTriceratops", "wTRI", admin);
+	}
+
+	function testGasMint() public {
+		vm.prank(admin);
+		wrapped.mint(recipient, amount);
+	}
+
+	function testGasMintLegacy() public {
+		vm.prank(admin);
+		legacy_wrapped.mint(recipient, amount);
+	}
+
+	function testGasBurnFromMinter() public {
+		vm.prank(admin);
+		wrapped.burnFrom(depositor, amount / 2);
+	}
+
+	function testGasBurnFromMinterLegacy() public {
+		vm.prank(admin);
+		legacy_wrapped.burnFrom(depositor, amount / 2);
+	}
+
+	function testGasBurnFromAllowance() public {
+		vm.prank(recipient);
+		wrapped.burnFrom(depositor, amount / 2);
+	}
+
+	function testGasBurnFromAllowanceLegacy() public {
+		vm.prank(recipient);
+		legacy_wrapped.burnFrom(depositor, amount / 2);
+	}
+
+	function testGasBurn() public {
+		vm.prank(depositor);
+		wrapped.burn(amount / 2);
+	}
+
+	function testGasBurnLegacy() public {
+		vm.prank(depositor);
+		legacy_wrapped.burn(amount / 2);
+	}
+
+	function testGasUnderlying() public view {
+		wrapped.underlying();
+	}
+
+	function testGasUnderlyingLegacy() public view {
+		legacy_wrapped.underlying();
+	}
+}
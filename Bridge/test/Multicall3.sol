@@ -0,0 +1,31 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.17;
+
+/*
+   Stand-in for Multicall3 (only aggregate3) on local chains, where the canonical
+   deployment at 0xcA11bde05977b3631167028862bE2a173976CA11 does not exist.
+   multicall.py places its runtime code at the canonical address with anvil_setCode.
+*/
+contract Multicall3 {
+	struct Call3 {
+		address target;
+		bool allowFailure;
+		bytes callData;
+	}
+
+	struct Result {
+		bool success;
+		bytes returnData;
+	}
+
+	function aggregate3(Call3[] calldata calls) public payable returns (Result[] memory returnData) {
+		uint256 length = calls.length;
+		returnData = new Result[](length);
+		for( uint256 i = 0; i < length; i++ ) {
+			Call3 calldata call = calls[i];
+			Result memory result = returnData[i];
+			(result.success, result.returnData) = call.target.call(call.callData);
+			require( call.allowFailure || result.success, "Multicall3: call failed" );
+		}
+	}
+}
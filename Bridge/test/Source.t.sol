@@ -4,6 +4,7 @@ pragma solidity ^0.8.17;
 import "forge-std/Test.sol";
 import "../src/Source.sol";
 import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+import "@openzeppelin/contracts/token/ERC20/extensions/draft-ERC20Permit.sol";
 
 contract MToken is ERC20 {
 	constructor(string memory name, string memory symbol,uint256 supply) ERC20(name,symbol) {
@@ -11,6 +12,37 @@ contract MToken is ERC20 {
 	}
 }
 
+contract PToken is ERC20Permit {
+	constructor(string memory name, string memory symbol,uint256 supply) ERC20(name,symbol) ERC20Permit(name) {
+		_mint(msg.sender, supply );
+	}
+}
+
+// Like USDT: transfer, transferFrom and approve return nothing instead of a bool
+contract NoReturnToken {
+	mapping( address => uint256 ) public balanceOf;
+	mapping( address => mapping( address => uint256 ) ) public allowance;
+
+	constructor(uint256 supply) {
+		balanceOf[msg.sender] = supply;
+	}
+
+	function transfer(address to, uint256 amount) external {
+		balanceOf[msg.sender] -= amount;
+		balanceOf[to] += amount;
+	}
+
+	function transferFrom(address from, address to, uint256 amount) external {
+		allowance[from][msg.sender] -= amount;
+		balanceOf[from] -= amount;
+		balanceOf[to] += amount;
+	}
+
+	function approve(address spender, uint256 amount) external {
+		allowance[msg.sender][spender] = amount;
+	}
+}
+
 contract SourceTest is Test {
     Source public source;
 
@@ -18,8 +50,12 @@ contract SourceTest is Test {
 	address admin = vm.addr(admin_sk);
 	uint256 token_owner_sk = uint256(keccak256(abi.encodePacked("token owner")));
 	address token_owner = vm.addr(token_owner_sk);
+	uint256 permit_depositor_sk = uint256(keccak256(abi.encodePacked("permit depositor")));
+	address permit_depositor = vm.addr(permit_depositor_sk);
+
+	bytes32 constant PERMIT_TYPEHASH = keccak256("Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)");
 
-	event Deposit( address indexed token, address indexed recipient, uint256 amount );
+	event Deposit( address indexed token, address indexed recipient, uint256 amount, uint256 nonce );
 	event Withdrawal( address indexed token, address indexed recipient, uint256 amount );
 	event Registration( address indexed token );
 
@@ -81,7 +117,7 @@ contract SourceTest is Test {
 		uint256 previous_balance = token.balanceOf(depositor);
 		uint256 previous_source_balance = token.balanceOf(address(source));
 		vm.expectEmit(true,true,false,true);
-		emit Deposit( address(token), recipient, amount );
+		emit Deposit( address(token), recipient, amount, 1 );
 		vm.prank(depositor);
 		source.deposit( address(token), recipient, amount );
 
@@ -159,4 +195,253 @@ contract SourceTest is Test {
 
     }
 
+	function testSequentialDepositNonces(address recipient, uint8 count) public {
+		vm.assume( recipient != address(0) );
+		vm.assume( count > 0 );
+
+		address token_address = testApprovedRegistration(1000);
+		MToken token = MToken(token_address);
+		vm.prank(token_owner);
+		token.approve( address(source), count );
+
+		for( uint256 i = 1; i <= count; i++ ) {
+			vm.expectEmit(true,true,false,true);
+			emit Deposit( token_address, recipient, 1, i );
+			vm.prank(token_owner);
+			source.deposit( token_address, recipient, 1 );
+		}
+		assertEq( count, source.depositNonce() );
+	}
+
+	function testRevertedDepositKeepsNonce(address recipient) public {
+		vm.assume( recipient != address(0) );
+
+		address token_address = testApprovedRegistration(1000);
+		vm.prank(token_owner);
+		vm.expectRevert();
+		source.deposit( token_address, recipient, 1 );  // No allowance
+
+		assertEq( 0, source.depositNonce() );
+	}
+
+	function testNoReturnValueToken() public {
+		vm.prank(token_owner);
+		NoReturnToken token = new NoReturnToken(1000);
+		vm.prank(admin);
+		source.registerToken(address(token));
+
+		vm.startPrank(token_owner);
+		token.approve(address(source), 1000);
+		source.deposit(address(token), admin, 1000);
+		vm.stopPrank();
+		assertEq( 1000, token.balanceOf(address(source)) );
+
+		vm.prank(admin);
+		source.withdraw(address(token), token_owner, 400);
+		assertEq( 400, token.balanceOf(token_owner) );
+	}
+
+	function testDepositMany(uint8 count, uint64 base_amount) public {
+		vm.assume( count > 0 );
+		vm.assume( base_amount > 0 );
+
+		address token_address = testApprovedRegistration(uint256(count) * (uint256(base_amount) + 255));
+		MToken token = MToken(token_address);
+
+		address[] memory recipients = new address[](count);
+		uint256[] memory amounts = new uint256[](count);
+		uint256 total;
+		for( uint256 i = 0; i < count; i++ ) {
+			recipients[i] = vm.addr(i + 1);
+			amounts[i] = uint256(base_amount) + i;
+			total += amounts[i];
+		}
+
+		// A single deposit first, so the batch has to continue its nonce sequence
+		vm.startPrank(token_owner);
+		token.approve( address(source), total + 1 );
+		source.deposit( token_address, token_owner, 1 );
+		uint256 previous_balance = token.balanceOf(token_owner);
+
+		for( uint256 i = 0; i < count; i++ ) {
+			vm.expectEmit(true,true,false,true);
+			emit Deposit( token_address, recipients[i], amounts[i], i + 2 );
+		}
+		source.depositMany( token_address, recipients, amounts );
+		vm.stopPrank();
+
+		assertEq( total, previous_balance - token.balanceOf(token_owner) );
+		assertEq( total + 1, token.balanceOf(address(source)) );
+		assertEq( uint256(count) + 1, source.depositNonce() );
+	}
+
+	function testDepositManyLengthMismatch() public {
+		address token_address = testApprovedRegistration(1000);
+		address[] memory recipients = new address[](2);
+		uint256[] memory amounts = new uint256[](3);
+
+		vm.prank(token_owner);
+		vm.expectRevert(Source.LengthMismatch.selector);
+		source.depositMany( token_address, recipients, amounts );
+	}
+
+	function testDepositManyZeroAmount() public {
+		address token_address = testApprovedRegistration(1000);
+		vm.prank(token_owner);
+		MToken(token_address).approve( address(source), 1000 );
+		address[] memory recipients = new address[](2);
+		uint256[] memory amounts = new uint256[](2);
+		recipients[0] = admin;
+		recipients[1] = token_owner;
+		amounts[0] = 10;
+
+		vm.prank(token_owner);
+		vm.expectRevert(Source.ZeroAmount.selector);
+		source.depositMany( token_address, recipients, amounts );
+
+		vm.prank(token_owner);
+		vm.expectRevert(Source.ZeroAmount.selector);
+		source.depositMany( token_address, new address[](0), new uint256[](0) );
+	}
+
+	function testUnapprovedDepositMany(address recipient) public {
+		vm.prank(token_owner);
+		ERC20 token = new MToken('Triceratops','TRI', 1000 );
+		vm.prank(token_owner);
+		token.approve( address(source), 1000 );
+		address[] memory recipients = new address[](1);
+		uint256[] memory amounts = new uint256[](1);
+		recipients[0] = recipient;
+		amounts[0] = 10;
+
+		vm.prank(token_owner);
+		vm.expectRevert(abi.encodeWithSelector(Source.TokenNotRegistered.selector, address(token)));
+		source.depositMany( address(token), recipients, amounts );
+	}
+
+	function registerPermitToken( uint256 amount ) internal returns( PToken ) {
+		vm.prank(token_owner);
+		PToken token = new PToken('Stegosaurus','STE', 5*amount );
+		vm.prank(admin);
+		source.registerToken(address(token));
+		vm.prank(token_owner);
+		token.transfer( permit_depositor, 2*amount );
+		return token;
+	}
+
+	function signPermit( PToken token, uint256 owner_sk, address spender, uint256 amount, uint256 deadline ) internal view returns( uint8 v, bytes32 r, bytes32 s ) {
+		address owner = vm.addr(owner_sk);
+		bytes32 digest = keccak256(abi.encodePacked(
+			"\x19\x01",
+			token.DOMAIN_SEPARATOR(),
+			keccak256(abi.encode(PERMIT_TYPEHASH, owner, spender, amount, token.nonces(owner), deadline))
+		));
+		return vm.sign(owner_sk, digest);
+	}
+
+	function testPermitDeposit(address recipient, uint256 amount) public {
+		vm.assume( recipient != address(0) );
+		vm.assume( amount < 1<<250 );
+		vm.assume( amount > 0 );
+
+		PToken token = registerPermitToken(amount);
+		uint256 deadline = block.timestamp + 1 hours;
+		(uint8 v, bytes32 r, bytes32 s) = signPermit(token, permit_depositor_sk, address(source), amount, deadline);
+
+		uint256 previous_balance = token.balanceOf(permit_depositor);
+		vm.expectEmit(true,true,false,true);
+		emit Deposit( address(token), recipient, amount, 1 );
+		vm.prank(permit_depositor);
+		source.depositWithPermit( address(token), recipient, amount, deadline, v, r, s );
+
+		assertEq( amount, previous_balance - token.balanceOf(permit_depositor) );
+		assertEq( amount, token.balanceOf(address(source)) );
+		assertEq( 0, token.allowance(permit_depositor, address(source)) );
+		assertEq( 1, token.nonces(permit_depositor) );
+	}
+
+	function testPermitDepositFrontRun(address front_runner, address recipient, uint256 amount) public {
+		vm.assume( recipient != address(0) );
+		vm.assume( amount < 1<<250 );
+		vm.assume( amount > 0 );
+
+		PToken token = registerPermitToken(amount);
+		uint256 deadline = block.timestamp + 1 hours;
+		(uint8 v, bytes32 r, bytes32 s) = signPermit(token, permit_depositor_sk, address(source), amount, deadline);
+
+		// Someone replays the signed permit directly on the token first
+		vm.prank(front_runner);
+		token.permit( permit_depositor, address(source), amount, deadline, v, r, s );
+
+		vm.expectEmit(true,true,false,true);
+		emit Deposit( address(token), recipient, amount, 1 );
+		vm.prank(permit_depositor);
+		source.depositWithPermit( address(token), recipient, amount, deadline, v, r, s );
+
+		assertEq( amount, token.balanceOf(address(source)) );
+	}
+
+	function testExpiredPermitDeposit(address recipient, uint256 amount) public {
+		vm.assume( recipient != address(0) );
+		vm.assume( amount < 1<<250 );
+		vm.assume( amount > 0 );
+
+		PToken token = registerPermitToken(amount);
+		uint256 deadline = block.timestamp + 1 hours;
+		(uint8 v, bytes32 r, bytes32 s) = signPermit(token, permit_depositor_sk, address(source), amount, deadline);
+
+		vm.warp( deadline + 1 );
+		vm.expectRevert(abi.encodeWithSelector(Source.PermitFailed.selector, address(token)));
+		vm.prank(permit_depositor);
+		source.depositWithPermit( address(token), recipient, amount, deadline, v, r, s );
+	}
+
+	function testForgedPermitDeposit(address recipient, uint256 amount) public {
+		vm.assume( recipient != address(0) );
+		vm.assume( amount < 1<<250 );
+		vm.assume( amount > 0 );
+
+		PToken token = registerPermitToken(amount);
+		uint256 deadline = block.timestamp + 1 hours;
+		// Signed by someone other than the depositor whose tokens would move
+		(uint8 v, bytes32 r, bytes32 s) = signPermit(token, token_owner_sk, address(source), amount, deadline);
+
+		vm.expectRevert(abi.encodeWithSelector(Source.PermitFailed.selector, address(token)));
+		vm.prank(permit_depositor);
+		source.depositWithPermit( address(token), recipient, amount, deadline, v, r, s );
+	}
+
+	function testUnregisteredPermitDeposit(address recipient, uint256 amount) public {
+		vm.assume( recipient != address(0) );
+		vm.assume( amount < 1<<250 );
+		vm.assume( amount > 0 );
+
+		vm.prank(token_owner);
+		PToken token = new PToken('Stegosaurus','STE', 5*amount );
+		vm.prank(token_owner);
+		token.transfer( permit_depositor, 2*amount );
+		uint256 deadline = block.timestamp + 1 hours;
+		(uint8 v, bytes32 r, bytes32 s) = signPermit(token, permit_depositor_sk, address(source), amount, deadline);
+
+		vm.expectRevert(abi.encodeWithSelector(Source.TokenNotRegistered.selector, address(token)));
+		vm.prank(permit_depositor);
+		source.depositWithPermit( address(token), recipient, amount, deadline, v, r, s );
+	}
+
+	function testUnregisteredTokenIsNeverCalled(address recipient, uint256 amount) public {
+		vm.assume( recipient != address(0) );
+		vm.assume( amount < 1<<250 );
+		vm.assume( amount > 0 );
+
+		vm.prank(token_owner);
+		PToken token = new PToken('Stegosaurus','STE', 5*amount );
+		uint256 deadline = block.timestamp + 1 hours;
+		// A bad signature: had permit() been called, its failure would surface as PermitFailed
+		(uint8 v, bytes32 r, bytes32 s) = signPermit(token, token_owner_sk, address(source), amount, deadline);
+
+		vm.expectRevert(abi.encodeWithSelector(Source.TokenNotRegistered.selector, address(token)));
+		vm.prank(permit_depositor);
+		source.depositWithPermit( address(token), recipient, amount, deadline, v, r, s );
+	}
+
 }
@@ -1,22 +1,37 @@
-from web3 import Web3
+from web3 import Web3, constants
+from web3.middleware import ExtraDataToPOAMiddleware
+from web3.exceptions import TransactionNotFound
 from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple, Optional
+import argparse
 import json
+import time
+import os
+
+from token_registry import TokenRegistry, LOG_PAGE_SIZE
+from sequence_tracker import SequenceTracker, DEAD_LETTER_AFTER
+from rpc_cassette import cassette_provider
+from rpc_client import rate_limited_provider
+import profiling
 
 def connect_to(chain):
     """Connect to the appropriate blockchain network"""
     if chain == 'source':
         # Avalanche Testnet (Fuji)
-        api_url = "https://api.avax-test.network/ext/bc/C/rpc"
+        api_url = os.environ.get("BRIDGE_SOURCE_RPC", "https://api.avax-test.network/ext/bc/C/rpc")
     elif chain == 'destination':
         # BSC Testnet
-        api_url = "https://data-seed-prebsc-1-s1.binance.org:8545/"
+        api_url = os.environ.get("BRIDGE_DESTINATION_RPC", "https://data-seed-prebsc-1-s1.binance.org:8545/")
     else:
         raise ValueError("Invalid chain name")
     
-    w3 = Web3(Web3.HTTPProvider(api_url))
-    
+    # Requests share a per-endpoint rate limiter (see rpc_client.py), and BRIDGE_CASSETTE
+    # can route them through a record/replay cassette (see rpc_cassette.py)
+    w3 = Web3(cassette_provider(chain, rate_limited_provider(api_url)))
+    # BSC is a PoA chain whose block headers carry more extraData than web3 accepts
+    w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
 
-    
     return w3
 
 def get_contract_info(chain, contract_info_path="contract_info.json"):
@@ -38,67 +53,286 @@ def get_warden_key(contract_info_path="contract_info.json"):
         print(f"Error retrieving warden key: {err}")
         return None
 
+def get_bridge_contract(chain, contract_info_path="contract_info.json"):
+    """Return the bridge contract object on the given chain, or None if it is not configured."""
+    contract_data = get_contract_info(chain, contract_info_path)
+    if not contract_data:
+        return None
+    w3 = connect_to(chain)
+    return w3.eth.contract(
+        address=Web3.to_checksum_address(contract_data["address"]),
+        abi=contract_data["abi"]
+    )
+
+def sync_token_registry(contract_info_path="contract_info.json"):
+    """
+    Bring the local token registry (kept next to contract_info.json) up to date on both chains.
+    Returns None if either side could not be synced, so callers fall back to on-chain checks.
+    """
+    registry = TokenRegistry(Path(contract_info_path).with_name("token_registry.json"))
+    for chain in ("source", "destination"):
+        contract = get_bridge_contract(chain, contract_info_path)
+        if contract is None:
+            return None
+        try:
+            # 'deploy_block' saves looking the deployment up, which pruned endpoints cannot do
+            registry.sync(chain, contract, from_block=get_contract_info(chain, contract_info_path).get("deploy_block"))
+        except Exception as err:
+            print(f"Error syncing token registry on {chain} chain: {err}")
+            return None
+    registry.save()
+    return registry
+
+# Bridge events relayed or reconciled on each chain
+CHAIN_EVENTS = {
+    "source": ("Deposit", "Withdrawal"),
+    "destination": ("Wrap", "Unwrap"),
+}
+# Events the warden relays from each chain; they carry a per-bridge sequence number ('nonce')
+SEQUENCED_EVENTS = {
+    "source": "Deposit",
+    "destination": "Unwrap",
+}
+
+class BridgeEvent(NamedTuple):
+    """Compact record of a Deposit, Withdrawal, Wrap or Unwrap event."""
+    event: str
+    token: str       # underlying token for Wrap/Unwrap
+    recipient: str
+    amount: int
+    block: int
+    tx_hash: str
+    log_index: int
+    sequence: Optional[int] = None  # Deposit/Unwrap nonce, None for other events or older contracts
+
+def to_bridge_event(event):
+    """Convert a decoded web3 event into a BridgeEvent."""
+    args = event["args"]
+    if event["event"] in ("Deposit", "Withdrawal"):
+        token, recipient = args["token"], args["recipient"]
+    else:
+        token, recipient = args["underlying_token"], args["to"]
+    return BridgeEvent(
+        event["event"], token, recipient, args["amount"],
+        event["blockNumber"], Web3.to_hex(event["transactionHash"]), event["logIndex"],
+        args.get("nonce")
+    )
+
+def iter_events(chain, from_block, to_block, contract_info_path="contract_info.json",
+                names=None, contract=None, page_size=LOG_PAGE_SIZE):
+    """
+    Lazily yield BridgeEvents emitted by the bridge contract on a chain, in block order.
+    Logs are fetched one page of blocks at a time (a single eth_getLogs for all the
+    requested event types), so memory stays flat however long the range is.
+    names - event names to include, defaults to both of the chain's bridge events
+    contract - bridge contract object to use instead of loading it from contract_info_path
+    """
+    if contract is None:
+        contract = get_bridge_contract(chain, contract_info_path)
+        if contract is None:
+            return
+    decoders = {}
+    for name in names or CHAIN_EVENTS[chain]:
+        event = getattr(contract.events, name)
+        decoders[event.topic] = event
+
+    start = from_block
+    while start <= to_block:
+        page_end = min(start + page_size - 1, to_block)
+        logs = contract.w3.eth.get_logs({
+            "address": contract.address,
+            "fromBlock": start,
+            "toBlock": page_end,
+            "topics": [list(decoders)],
+        })
+        for log in logs:
+            yield to_bridge_event(decoders[Web3.to_hex(log["topics"][0])].process_log(log))
+        start = page_end + 1
+
+# Furthest a single scan reaches back to fill a sequence gap; an older hole is closed a page per scan
+MAX_GAP_BLOCKS = LOG_PAGE_SIZE
+
+def waiting_on_registry(chain, token, registry):
+    """
+    True if an event on 'chain' for 'token' cannot be relayed yet because the token has no
+    counterpart on the other chain (no wrapped token for a Deposit, not registered for an Unwrap).
+    """
+    if registry is None:
+        return False
+    if chain == "source":
+        return registry.wrapped_tokens(token) == constants.ADDRESS_ZERO
+    return not registry.approved(token)
+
+def new_relay_events(chain, contract, tracker, from_block, to_block, registry=None):
+    """
+    Return the not yet relayed Deposit (source) or Unwrap (destination) events, in
+    sequence order.  Besides the scanned window, this fetches the block range of any
+    hole in the sequence numbers seen so far (at most MAX_GAP_BLOCKS of it per call), so
+    a missed event is picked up without widening the scan, and the blocks of deferred
+    events whose token 'registry' now knows.  A nonce the scanned blocks should hold but
+    do not is reported to the tracker, which dead-letters it if it stays missing.
+    Contracts whose events have no nonce fall back to returning the whole window.
+    """
+    name = SEQUENCED_EVENTS[chain]
+    address = contract.address
+    window = list(iter_events(chain, from_block, to_block, names=(name,), contract=contract))
+    if any(event.sequence is None for event in window):
+        return window
+    if window:
+        # A fresh sequence starts at the lowest nonce seen, whether or not it gets relayed
+        lowest = min(window, key=lambda e: e.sequence)
+        tracker.start(chain, address, lowest.sequence, lowest.block)
+
+    new = {e.sequence: e for e in window if tracker.is_new(chain, address, e.sequence)}
+    first = new[min(new)] if new else None
+    gap = tracker.gap(chain, address, first and (first.sequence, first.block))
+    covered_to = to_block
+    if gap is not None and gap[0] < from_block:
+        gap_from = gap[0]
+        gap_to = min(gap[1], from_block - 1, gap_from + MAX_GAP_BLOCKS - 1)
+        if gap_to < from_block - 1:
+            covered_to = gap_to
+        print(f"[{datetime.utcnow()}] Sequence gap on {chain}, fetching blocks {gap_from} to {gap_to}")
+        for event in iter_events(chain, gap_from, gap_to, names=(name,), contract=contract):
+            if event.sequence is not None and tracker.is_new(chain, address, event.sequence):
+                new.setdefault(event.sequence, event)
+
+    for nonce in tracker.missing(chain, address, {n: e.block for n, e in new.items()}, covered_to):
+        if tracker.not_found(chain, address, nonce):
+            print(f"[{datetime.utcnow()}] {name} nonce {nonce} on {chain} not found for "
+                  f"{DEAD_LETTER_AFTER}s, dead-lettered")
+
+    if registry is not None:
+        ready = {n: block for n, (block, token) in tracker.deferred(chain, address).items()
+                 if not waiting_on_registry(chain, token, registry)}
+        for block in sorted(set(ready.values())):
+            for event in iter_events(chain, block, block, names=(name,), contract=contract):
+                if event.sequence in ready:
+                    new.setdefault(event.sequence, event)
+    return [new[n] for n in sorted(new)]
+
+def relay_outcome(chain, relay):
+    """
+    chain - the chain the relayed event was emitted on ('source' relays to destination)
+    relay - the transaction a handler sent for it: {'tx_hash', 'raw', 'sender', 'nonce'}
+    Returns True if it was mined and succeeded, False if it reverted or can never be
+    mined (another transaction used its account nonce), or None if it is still pending,
+    in which case it is broadcast again in case the node dropped it.
+    """
+    w3 = connect_to("destination" if chain == "source" else "source")
+
+    def receipt():
+        try:
+            return w3.eth.get_transaction_receipt(relay["tx_hash"])
+        except TransactionNotFound:
+            return None
+
+    mined = receipt()
+    if mined is None and w3.eth.get_transaction_count(relay["sender"], "latest") > relay["nonce"]:
+        # Its account nonce is used up; look again in case it was mined in the meantime
+        mined = receipt()
+        if mined is None:
+            return False
+    if mined is not None:
+        return mined["status"] == 1
+    try:
+        # The same signed transaction, so at most one of the broadcasts can ever be mined
+        w3.eth.send_raw_transaction(relay["raw"])
+    except Exception as err:
+        print(f"Rebroadcasting {relay['tx_hash']}: {err}")
+    return None
+
 def scan_blocks(chain, contract_info_path="contract_info.json"):
     """Scan recent blocks for relevant events on the specified chain."""
     if chain not in ("source", "destination"):
         print(f"Invalid chain specified: {chain}")
         return 0
 
-    try:
-        w3 = connect_to(chain)
-        contract_data = get_contract_info(chain, contract_info_path)
-        if not contract_data:
-            return 0
-
-        contract = w3.eth.contract(
-            address=Web3.to_checksum_address(contract_data["address"]),
-            abi=contract_data["abi"]
-        )
-
-        latest_block = w3.eth.block_number
-        from_block = max(0, latest_block - 50)
-
-        print(f"[{datetime.utcnow()}] Scanning blocks {from_block} to {latest_block} on {chain}")
-
-        if chain == "source":
-            events = contract.events.Deposit.create_filter(
-                from_block=from_block, to_block=latest_block
-            ).get_all_entries()
-
+    # Stage timers are no-ops unless profiling is on (see profiling.py)
+    with profiling.cycle(f"scan_{chain}"):
+        try:
+            with profiling.stage("head"):
+                contract = get_bridge_contract(chain, contract_info_path)
+                if contract is None:
+                    return 0
+                latest_block = contract.w3.eth.block_number
+            from_block = max(0, latest_block - 50)
+
+            print(f"[{datetime.utcnow()}] Scanning blocks {from_block} to {latest_block} on {chain}")
+            with profiling.stage("registry_sync"):
+                registry = sync_token_registry(contract_info_path)
+            tracker = SequenceTracker(Path(contract_info_path).with_name("sequence_state.json"))
+            handler = handle_deposit_event if chain == "source" else handle_unwrap_event
+
+            with profiling.stage("fetch_events"):
+                events = new_relay_events(chain, contract, tracker, from_block, latest_block, registry)
+                tracker.save()
             for event in events:
-                print(f"[{datetime.utcnow()}] Detected Deposit event: {event}")
-                handle_deposit_event(event, contract_info_path)
-
-        elif chain == "destination":
-            events = contract.events.Unwrap.create_filter(
-                from_block=from_block, to_block=latest_block
-            ).get_all_entries()
-
-            print(f"[{datetime.utcnow()}] Detected {len(events)} Unwrap events")
-            for event in events:
-                print(f"[{datetime.utcnow()}] Unwrap event: {event}")
-                handle_unwrap_event(event, contract_info_path)
-
-    except Exception as err:
-        print(f"Error scanning blocks on {chain} chain: {err}")
-        return 0
+                print(f"[{datetime.utcnow()}] Detected {event.event} event: {event}")
+                if event.sequence is not None and waiting_on_registry(chain, event.token, registry):
+                    # Relayed by a later scan once the token's counterpart exists
+                    print(f"Token {event.token} has no counterpart yet, deferring nonce {event.sequence}.")
+                    tracker.defer(chain, contract.address, event.sequence, event.block, event.token)
+                    tracker.save()
+                    continue
+                if event.sequence is None:
+                    with profiling.stage("relay"):
+                        handler(event, contract_info_path, registry)
+                    continue
+                if tracker.backing_off(chain, contract.address, event.sequence):
+                    continue
+
+                def on_sent(relay, nonce=event.sequence):
+                    # Saved before the transaction is broadcast, so a crash cannot lose it
+                    tracker.record_sent(chain, contract.address, nonce, relay)
+                    tracker.save()
+
+                with profiling.stage("relay"):
+                    relay = tracker.sent(chain, contract.address, event.sequence)
+                    if relay is not None:
+                        # Sent by an earlier scan that never saw the receipt: never send it twice
+                        relayed = relay_outcome(chain, relay)
+                    else:
+                        relayed = handler(event, contract_info_path, registry, on_sent)
+                # A failed relay stays out of the sequence, so it shows up as a gap and is
+                # retried with backoff, until DEAD_LETTER_AFTER dead-letters it
+                if relayed is None:
+                    print(f"Relay of {event.event} nonce {event.sequence} is still pending.")
+                elif relayed:
+                    tracker.add(chain, contract.address, event.sequence, event.block)
+                elif tracker.fail(chain, contract.address, event.sequence, event.block):
+                    print(f"Giving up on {event.event} nonce {event.sequence} after "
+                          f"{DEAD_LETTER_AFTER}s of failures, dead-lettered.")
+                tracker.save()
+
+        except Exception as err:
+            print(f"Error scanning blocks on {chain} chain: {err}")
+            return 0
 
     return 1
 
-def handle_deposit_event(event, contract_info_path="contract_info.json"):
-    """Handle a Deposit event by calling wrap() on the destination chain."""
+def handle_deposit_event(event, contract_info_path="contract_info.json", registry=None, on_sent=None):
+    """
+    Handle a Deposit event by calling wrap() on the destination chain.
+    on_sent - called with the signed transaction (see relay_outcome) just before it is broadcast
+    Returns True if the deposit was wrapped, False if it was not, or None if the wrap was
+    sent but its receipt was not seen.
+    """
     print(f"[{datetime.utcnow()}] Handling Deposit event -> wrap() on destination")
 
-    args = event["args"]
-    token = Web3.to_checksum_address(args["token"])
-    recipient = Web3.to_checksum_address(args["recipient"])
-    amount = args["amount"]
+    token = Web3.to_checksum_address(event.token)
+    recipient = Web3.to_checksum_address(event.recipient)
+    amount = event.amount
+
+    if waiting_on_registry("source", token, registry):
+        print(f"No wrapped token created for {token} on destination, skipping wrap.")
+        return False
 
     dest_w3 = connect_to("destination")
     contract_data = get_contract_info("destination", contract_info_path)
     if not contract_data:
         print("Missing destination contract info.")
-        return
+        return False
 
     contract = dest_w3.eth.contract(
         address=Web3.to_checksum_address(contract_data["address"]),
@@ -108,47 +342,70 @@ def handle_deposit_event(event, contract_info_path="contract_info.json"):
     key = get_warden_key(contract_info_path)
     if not key:
         print("Warden key not available.")
-        return
+        return False
     if not key.startswith("0x"):
         key = "0x" + key
 
     account = dest_w3.eth.account.from_key(key)
 
+    sent = False
     try:
-        gas = contract.functions.wrap(token, recipient, amount).estimate_gas({
-            "from": account.address
-        })
-
-        tx = contract.functions.wrap(token, recipient, amount).build_transaction({
-            "from": account.address,
-            "nonce": dest_w3.eth.get_transaction_count(account.address, "pending"),
-            "gas": gas + 10000,
-            "gasPrice": dest_w3.eth.gas_price
-        })
-
-        signed_tx = dest_w3.eth.account.sign_transaction(tx, key)
-        tx_hash = dest_w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = dest_w3.eth.wait_for_transaction_receipt(tx_hash)
+        with profiling.stage("wrap.estimate_gas"):
+            gas = contract.functions.wrap(token, recipient, amount).estimate_gas({
+                "from": account.address
+            })
+
+        with profiling.stage("wrap.build"):
+            tx = contract.functions.wrap(token, recipient, amount).build_transaction({
+                "from": account.address,
+                "nonce": dest_w3.eth.get_transaction_count(account.address, "pending"),
+                "gas": gas + 10000,
+                "gasPrice": dest_w3.eth.gas_price
+            })
+
+        with profiling.stage("wrap.send"):
+            signed_tx = dest_w3.eth.account.sign_transaction(tx, key)
+            if on_sent is not None:
+                on_sent({"tx_hash": signed_tx.hash.to_0x_hex(), "raw": signed_tx.raw_transaction.to_0x_hex(),
+                         "sender": account.address, "nonce": tx["nonce"]})
+            sent = True
+            tx_hash = dest_w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        with profiling.stage("wrap.receipt"):
+            receipt = dest_w3.eth.wait_for_transaction_receipt(tx_hash)
 
         print(f"[{datetime.utcnow()}] Wrap confirmed: {receipt['transactionHash'].hex()}")
+        return receipt["status"] == 1
 
     except Exception as err:
+        if sent:
+            # It may still be mined; the caller checks on it instead of sending another
+            print(f"Wrap sent but not confirmed: {err}")
+            return None
         print(f"Error wrapping tokens: {err}")
-
-def handle_unwrap_event(event, contract_info_path="contract_info.json"):
-    """Handle an Unwrap event by calling withdraw() on the source chain."""
+        return False
+
+def handle_unwrap_event(event, contract_info_path="contract_info.json", registry=None, on_sent=None):
+    """
+    Handle an Unwrap event by calling withdraw() on the source chain.
+    on_sent - called with the signed transaction (see relay_outcome) just before it is broadcast
+    Returns True if the unwrap was withdrawn, False if it was not, or None if the withdraw
+    was sent but its receipt was not seen.
+    """
     print(f"[{datetime.utcnow()}] Handling Unwrap event -> withdraw() on source")
 
-    args = event["args"]
-    token = Web3.to_checksum_address(args["underlying_token"])
-    recipient = Web3.to_checksum_address(args["to"])
-    amount = args["amount"]
+    token = Web3.to_checksum_address(event.token)
+    recipient = Web3.to_checksum_address(event.recipient)
+    amount = event.amount
+
+    if waiting_on_registry("destination", token, registry):
+        print(f"Token {token} is not registered on source, skipping withdraw.")
+        return False
 
     source_w3 = connect_to("source")
     contract_data = get_contract_info("source", contract_info_path)
     if not contract_data:
         print("Missing source contract info.")
-        return
+        return False
 
     contract = source_w3.eth.contract(
         address=Web3.to_checksum_address(contract_data["address"]),
@@ -158,34 +415,72 @@ def handle_unwrap_event(event, contract_info_path="contract_info.json"):
     key = get_warden_key(contract_info_path)
     if not key:
         print("Warden key not available.")
-        return
+        return False
     if not key.startswith("0x"):
         key = "0x" + key
 
     account = source_w3.eth.account.from_key(key)
 
+    sent = False
     try:
-        gas = contract.functions.withdraw(token, recipient, amount).estimate_gas({
-            "from": account.address
-        })
-
-        tx = contract.functions.withdraw(token, recipient, amount).build_transaction({
-            "from": account.address,
-            "nonce": source_w3.eth.get_transaction_count(account.address, "pending"),
-            "gas": gas + 10000,
-            "gasPrice": source_w3.eth.gas_price
-        })
-
-        signed_tx = source_w3.eth.account.sign_transaction(tx, key)
-        tx_hash = source_w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = source_w3.eth.wait_for_transaction_receipt(tx_hash)
+        with profiling.stage("withdraw.estimate_gas"):
+            gas = contract.functions.withdraw(token, recipient, amount).estimate_gas({
+                "from": account.address
+            })
+
+        with profiling.stage("withdraw.build"):
+            tx = contract.functions.withdraw(token, recipient, amount).build_transaction({
+                "from": account.address,
+                "nonce": source_w3.eth.get_transaction_count(account.address, "pending"),
+                "gas": gas + 10000,
+                "gasPrice": source_w3.eth.gas_price
+            })
+
+        with profiling.stage("withdraw.send"):
+            signed_tx = source_w3.eth.account.sign_transaction(tx, key)
+            if on_sent is not None:
+                on_sent({"tx_hash": signed_tx.hash.to_0x_hex(), "raw": signed_tx.raw_transaction.to_0x_hex(),
+                         "sender": account.address, "nonce": tx["nonce"]})
+            sent = True
+            tx_hash = source_w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        with profiling.stage("withdraw.receipt"):
+            receipt = source_w3.eth.wait_for_transaction_receipt(tx_hash)
 
         print(f"[{datetime.utcnow()}] Withdraw confirmed: {receipt['transactionHash'].hex()}")
+        return receipt["status"] == 1
 
     except Exception as err:
+        if sent:
+            # It may still be mined; the caller checks on it instead of sending another
+            print(f"Withdraw sent but not confirmed: {err}")
+            return None
         print(f"Error withdrawing tokens: {err}")
+        return False
+
+def run_daemon(contract_info_path="contract_info.json", interval=5.0):
+    """Scan both chains every 'interval' seconds until interrupted."""
+    while True:
+        started = time.monotonic()
+        scan_blocks("source", contract_info_path)
+        scan_blocks("destination", contract_info_path)
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
 
 if __name__ == "__main__":
+    # BRIDGE_SOURCE_RPC / BRIDGE_DESTINATION_RPC point the scanner at other endpoints, e.g. local anvil nodes
+    parser = argparse.ArgumentParser(description="Relay bridge events between the source and destination chains")
+    parser.add_argument("--contract-info", default="contract_info.json")
+    parser.add_argument("--daemon", action="store_true", help="keep scanning instead of running a single pass")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between scans in daemon mode")
+    args = parser.parse_args()
+
     print(f"[{datetime.utcnow()}] Starting bridge scanner...")
-    scan_blocks("source")
-    scan_blocks("destination")
\ No newline at end of file
+    # SIGUSR1 toggles profiling without a restart, e.g. kill -USR1 <pid>
+    profiling.install_signal_handler()
+    try:
+        if args.daemon:
+            run_daemon(args.contract_info, args.interval)
+        else:
+            scan_blocks("source", args.contract_info)
+            scan_blocks("destination", args.contract_info)
+    except KeyboardInterrupt:
+        pass
\ No newline at end of file
@@ -0,0 +1,145 @@
+"""
+    Client-side helpers for sending transfers into the bridge
+
+    deposit_with_permit() deposits an EIP-2612 token in a single transaction: the
+    depositor signs a permit off-chain (sign_permit) and Source.depositWithPermit
+    spends it, instead of sending approve() and deposit() and waiting for both.
+
+    deposit_many() pays out to many recipients with Source.depositMany, one
+    transaction per DEPOSIT_MANY_BATCH recipients instead of one per recipient.
+"""
+
+from web3 import Web3
+from eth_account import Account
+import time
+
+from bridge import get_bridge_contract
+
+PERMIT_VALIDITY = 3600  # seconds
+# Recipients per depositMany call; each one costs roughly one Deposit log plus calldata
+DEPOSIT_MANY_BATCH = 200
+
+# Just the EIP-2612 and ERC20 metadata functions sign_permit needs
+ERC20_PERMIT_ABI = [
+    {"name": "name", "type": "function", "stateMutability": "view",
+     "inputs": [], "outputs": [{"name": "", "type": "string"}]},
+    {"name": "nonces", "type": "function", "stateMutability": "view",
+     "inputs": [{"name": "owner", "type": "address"}], "outputs": [{"name": "", "type": "uint256"}]},
+    {"name": "allowance", "type": "function", "stateMutability": "view",
+     "inputs": [{"name": "owner", "type": "address"}, {"name": "spender", "type": "address"}],
+     "outputs": [{"name": "", "type": "uint256"}]},
+    {"name": "approve", "type": "function", "stateMutability": "nonpayable",
+     "inputs": [{"name": "spender", "type": "address"}, {"name": "amount", "type": "uint256"}],
+     "outputs": [{"name": "", "type": "bool"}]},
+]
+
+PERMIT_TYPES = {
+    "Permit": [
+        {"name": "owner", "type": "address"},
+        {"name": "spender", "type": "address"},
+        {"name": "value", "type": "uint256"},
+        {"name": "nonce", "type": "uint256"},
+        {"name": "deadline", "type": "uint256"},
+    ],
+}
+
+
+def sign_permit(w3, token_address, private_key, spender, amount, deadline=None, version="1"):
+    """
+        w3 - web3 instance connected to the token's chain
+        token_address - (address) an EIP-2612 token
+        private_key - key of the token holder granting the allowance
+        spender - (address) who may spend it, e.g. the Source contract
+        amount - (int) allowance in the token's base units
+        deadline - (int) unix time the permit expires, defaults to PERMIT_VALIDITY from now
+        version - EIP-712 domain version of the token (OpenZeppelin's ERC20Permit uses "1")
+
+        Returns (deadline, v, r, s) ready to pass to depositWithPermit
+    """
+    owner = Account.from_key(private_key).address
+    token = w3.eth.contract(address=Web3.to_checksum_address(token_address), abi=ERC20_PERMIT_ABI)
+    if deadline is None:
+        deadline = int(time.time()) + PERMIT_VALIDITY
+
+    domain = {
+        "name": token.functions.name().call(),
+        "version": version,
+        "chainId": w3.eth.chain_id,
+        "verifyingContract": token.address,
+    }
+    message = {
+        "owner": owner,
+        "spender": Web3.to_checksum_address(spender),
+        "value": amount,
+        "nonce": token.functions.nonces(owner).call(),
+        "deadline": deadline,
+    }
+    signed = Account.sign_typed_data(private_key, domain, PERMIT_TYPES, message)
+    return deadline, signed.v, Web3.to_bytes(signed.r).rjust(32, b'\0'), Web3.to_bytes(signed.s).rjust(32, b'\0')
+
+
+def send_transaction(w3, function, private_key):
+    """Sign and send a bound contract call from the key's account and wait for its receipt"""
+    account = w3.eth.account.from_key(private_key)
+    gas = function.estimate_gas({"from": account.address})
+    tx = function.build_transaction({
+        "from": account.address,
+        "nonce": w3.eth.get_transaction_count(account.address, "pending"),
+        "gas": gas + 10000,
+        "gasPrice": w3.eth.gas_price
+    })
+    signed_tx = w3.eth.account.sign_transaction(tx, private_key)
+    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+    return w3.eth.wait_for_transaction_receipt(tx_hash)
+
+
+def deposit_with_permit(token_address, recipient, amount, private_key, deadline=None,
+                        contract_info_path="contract_info.json", source_contract=None):
+    """
+        Deposit 'amount' of an EIP-2612 token to 'recipient' on the destination chain in
+        one transaction, signed and sent by the holder of private_key
+        source_contract - (contract object) Source with depositWithPermit in its ABI,
+        defaults to the one in contract_info.json
+
+        Returns the transaction receipt
+    """
+    contract = source_contract or get_bridge_contract("source", contract_info_path)
+    if contract is None:
+        raise ValueError("Missing source contract info")
+    token_address = Web3.to_checksum_address(token_address)
+    deadline, v, r, s = sign_permit(contract.w3, token_address, private_key, contract.address, amount, deadline)
+    function = contract.functions.depositWithPermit(token_address, Web3.to_checksum_address(recipient),
+                                                    amount, deadline, v, r, s)
+    return send_transaction(contract.w3, function, private_key)
+
+
+def deposit_many(token_address, recipients, amounts, private_key, contract_info_path="contract_info.json",
+                 source_contract=None, batch_size=DEPOSIT_MANY_BATCH):
+    """
+        Deposit amounts[i] of a token to recipients[i] on the destination chain, from the
+        holder of private_key, with as few depositMany transactions as batch_size allows
+        Approves Source for the total first if the current allowance is too small.
+        source_contract - (contract object) Source with depositMany in its ABI,
+        defaults to the one in contract_info.json
+
+        Returns the transaction receipts, approval first if one was needed
+    """
+    if len(recipients) != len(amounts):
+        raise ValueError("recipients and amounts must have the same length")
+    contract = source_contract or get_bridge_contract("source", contract_info_path)
+    if contract is None:
+        raise ValueError("Missing source contract info")
+    w3 = contract.w3
+    owner = Account.from_key(private_key).address
+    token = w3.eth.contract(address=Web3.to_checksum_address(token_address), abi=ERC20_PERMIT_ABI)
+    recipients = [Web3.to_checksum_address(r) for r in recipients]
+
+    receipts = []
+    total = sum(amounts)
+    if token.functions.allowance(owner, contract.address).call() < total:
+        receipts.append(send_transaction(w3, token.functions.approve(contract.address, total), private_key))
+    for start in range(0, len(recipients), batch_size):
+        function = contract.functions.depositMany(token.address, recipients[start:start + batch_size],
+                                                  amounts[start:start + batch_size])
+        receipts.append(send_transaction(w3, function, private_key))
+    return receipts
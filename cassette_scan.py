@@ -0,0 +1,72 @@
+"""
+    Record or replay one bridge scan cycle through an RPC cassette (see rpc_cassette.py)
+
+    usage: python cassette_scan.py record|replay CASSETTE [--chain source] [--latency recorded]
+"""
+
+from pathlib import Path
+import argparse
+import tempfile
+import shutil
+import time
+import os
+
+from bridge import scan_blocks
+from rpc_cassette import close_cassettes
+
+# State bridge.py keeps next to contract_info.json, which a scan both reads and updates
+STATE_FILES = ("token_registry.json", "sequence_state.json")
+
+
+def snapshot_state(contract_info_path, state_dir):
+    """Copy the bridge state files that sit next to contract_info_path into state_dir"""
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    for name in STATE_FILES:
+        source = Path(contract_info_path).with_name(name)
+        if source.is_file():
+            shutil.copyfile(source, state_dir / name)
+        else:
+            (state_dir / name).unlink(missing_ok=True)
+
+
+def main():
+    """
+        Runs the scan against a scratch copy of contract_info.json.  Recording saves the
+        bridge's state files as they were beforehand to <cassette>.state, and replay starts
+        from that copy, so both runs take the same code path and neither touches the live state.
+    """
+    parser = argparse.ArgumentParser(description="Record or replay one bridge scan cycle and time it")
+    parser.add_argument("mode", choices=("record", "replay"))
+    parser.add_argument("cassette", help="cassette file (gzipped JSON lines)")
+    parser.add_argument("--contract-info", default="contract_info.json")
+    parser.add_argument("--chain", action="append", choices=("source", "destination"),
+                        help="chain(s) to scan, defaults to both")
+    parser.add_argument("--latency", help="'recorded', seconds, or a JSON object of per-method seconds")
+    args = parser.parse_args()
+
+    os.environ["BRIDGE_CASSETTE"] = args.cassette
+    os.environ["BRIDGE_CASSETTE_MODE"] = args.mode
+    if args.latency:
+        os.environ["BRIDGE_CASSETTE_LATENCY"] = args.latency
+
+    state_dir = Path(f"{args.cassette}.state")
+    if args.mode == "record":
+        snapshot_state(args.contract_info, state_dir)
+    elif not state_dir.is_dir():
+        parser.error(f"{state_dir} is missing, so the starting state of the recording is unknown")
+
+    with tempfile.TemporaryDirectory(prefix="cassette_") as scratch:
+        contract_info = Path(scratch) / "contract_info.json"
+        shutil.copyfile(args.contract_info, contract_info)
+        shutil.copytree(state_dir, scratch, dirs_exist_ok=True)
+        for chain in args.chain or ["source", "destination"]:
+            started = time.perf_counter()
+            scan_blocks(chain, contract_info)
+            print(f"scan_blocks('{chain}') took {time.perf_counter() - started:.3f}s ({args.mode})")
+
+    close_cassettes()
+
+
+if __name__ == "__main__":
+    main()
@@ -60,29 +60,31 @@ def deploy(web3, abi, bytecode):
     signed = account.sign_transaction(txn)
     tx_hash = web3.eth.send_raw_transaction(signed.rawTransaction)
     receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
-    return receipt.contractAddress
+    return receipt.contractAddress, receipt.blockNumber
 
 print("🛠️ Compiling and deploying Source.sol...")
 src_abi, src_bytecode = compile_contract(SOURCE_PATH, "Source")
 w3_avax = Web3(Web3.HTTPProvider(AVAX_RPC))
-src_address = deploy(w3_avax, src_abi, src_bytecode)
+src_address, src_block = deploy(w3_avax, src_abi, src_bytecode)
 print(f"✅ Source.sol deployed to Avalanche: {src_address}")
 
 print("\n🛠️ Compiling and deploying Destination.sol...")
 dest_abi, dest_bytecode = compile_contract(DEST_PATH, "Destination")
 w3_bnb = Web3(Web3.HTTPProvider(BNB_RPC))
-dest_address = deploy(w3_bnb, dest_abi, dest_bytecode)
+dest_address, dest_block = deploy(w3_bnb, dest_abi, dest_bytecode)
 print(f"✅ Destination.sol deployed to BNB: {dest_address}")
 
 print("\n💾 Writing to contract_info.json...")
 contract_info = {
     "source": {
         "address": src_address,
-        "abi": src_abi
+        "abi": src_abi,
+        "deploy_block": src_block
     },
     "destination": {
         "address": dest_address,
-        "abi": dest_abi
+        "abi": dest_abi,
+        "deploy_block": dest_block
     }
 }
 
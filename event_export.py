@@ -0,0 +1,262 @@
+"""
+    Columnar export of bridge event history
+
+    Decoded Deposit/Withdrawal/Wrap/Unwrap events are appended to NumPy .npz files,
+    one per chain and PARTITION_BLOCKS-aligned block range:
+
+        <out_dir>/<chain>/<first block>-<last block>.npz
+        <out_dir>/manifest.json      last exported block per chain
+
+    An export that stops part way through a range is merged into the same file by
+    the next one, so incremental runs do not leave a trail of small files.
+
+    Each file holds one array per column.  Addresses are dictionary-encoded (a
+    small 'addresses' array plus uint32 indices), amounts are kept both exactly
+    (32 big-endian bytes) and as float64 for fast aggregation, and every event
+    carries its block timestamp so delays can be computed across chains.  The
+    'sequence' column holds Deposit/Unwrap nonces (-1 where an event has none).
+    load() stitches partitions back together and the query helpers below run
+    vectorized over the result.
+
+    usage: python event_export.py OUT_DIR [--chain source] [--from-block N]
+"""
+
+from web3 import Web3
+from pathlib import Path
+import numpy as np
+import argparse
+import json
+
+from bridge import CHAIN_EVENTS, get_bridge_contract, iter_events
+
+EVENT_CODES = {'Deposit': 0, 'Withdrawal': 1, 'Wrap': 2, 'Unwrap': 3}
+PARTITION_BLOCKS = 10_000
+
+
+def _read_manifest(out_dir):
+    path = Path(out_dir) / "manifest.json"
+    if not path.is_file():
+        return {}
+    with path.open('r') as f:
+        return json.load(f)
+
+
+def _write_manifest(out_dir, manifest):
+    path = Path(out_dir) / "manifest.json"
+    tmp_path = path.with_suffix('.tmp')
+    with tmp_path.open('w') as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(path)
+
+
+def _partition_path(out_dir, chain, block):
+    first = block // PARTITION_BLOCKS * PARTITION_BLOCKS
+    return Path(out_dir) / chain / f"{first:010d}-{first + PARTITION_BLOCKS - 1:010d}.npz"
+
+
+def _read_partition(path):
+    with np.load(path) as data:
+        part = {name: data[name] for name in data.files}
+    if 'sequence' not in part:  # Exported before events carried a nonce
+        part['sequence'] = np.full(len(part['block']), -1, dtype=np.int64)
+    return part
+
+
+def _write_partition(path, columns):
+    tmp_path = path.with_name(path.name + '.tmp')
+    with tmp_path.open('wb') as f:
+        np.savez_compressed(f, **columns)
+    tmp_path.replace(path)
+
+
+def _concat(parts):
+    """Concatenate partitions, re-encoding their addresses against one shared dictionary"""
+    addresses, inverse = np.unique(np.concatenate([p['addresses'] for p in parts]), return_inverse=True)
+    offset = 0
+    for p in parts:
+        remap = inverse[offset:offset + len(p['addresses'])].astype(np.uint32)
+        offset += len(p['addresses'])
+        p['token'], p['recipient'] = remap[p['token']], remap[p['recipient']]
+
+    table = {c: np.concatenate([p[c] for p in parts]) for c in parts[0] if c != 'addresses'}
+    table['addresses'] = addresses
+    return table
+
+
+def _to_columns(events, timestamps):
+    """Turn a list of BridgeEvents into the column arrays of one partition"""
+    addresses, index = [], {}
+
+    def encode(address):
+        if address not in index:
+            index[address] = len(addresses)
+            addresses.append(address)
+        return index[address]
+
+    n = len(events)
+    return {
+        'event': np.fromiter((EVENT_CODES[e.event] for e in events), dtype=np.uint8, count=n),
+        'token': np.fromiter((encode(e.token) for e in events), dtype=np.uint32, count=n),
+        'recipient': np.fromiter((encode(e.recipient) for e in events), dtype=np.uint32, count=n),
+        'amount': np.fromiter((float(e.amount) for e in events), dtype=np.float64, count=n),
+        'amount_raw': np.frombuffer(b''.join(e.amount.to_bytes(32, 'big') for e in events),
+                                    dtype=np.uint8).reshape(n, 32),
+        'block': np.fromiter((e.block for e in events), dtype=np.uint64, count=n),
+        'timestamp': np.fromiter((timestamps[e.block] for e in events), dtype=np.uint64, count=n),
+        'log_index': np.fromiter((e.log_index for e in events), dtype=np.uint32, count=n),
+        'sequence': np.fromiter((-1 if e.sequence is None else e.sequence for e in events),
+                                dtype=np.int64, count=n),
+        'tx_hash': np.frombuffer(b''.join(Web3.to_bytes(hexstr=e.tx_hash) for e in events),
+                                 dtype=np.uint8).reshape(n, 32),
+        'addresses': np.array(addresses, dtype='U42'),
+    }
+
+
+def export_events(chain, out_dir, to_block=None, from_block=None, contract_info_path="contract_info.json"):
+    """
+        Append every bridge event on 'chain' since the last export (or from_block, the
+        first time) up to to_block (default: the chain head)
+        Returns the number of events written
+    """
+    out_dir = Path(out_dir)
+    (out_dir / chain).mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(out_dir)
+    contract = get_bridge_contract(chain, contract_info_path)
+    if contract is None:
+        return 0
+    w3 = contract.w3
+    if to_block is None:
+        to_block = w3.eth.block_number
+    start = manifest[chain] + 1 if chain in manifest else (from_block or 0)
+
+    written = 0
+    while start <= to_block:
+        # Never cross a partition boundary, so each page lands in exactly one file
+        end = min((start // PARTITION_BLOCKS + 1) * PARTITION_BLOCKS - 1, to_block)
+        events = list(iter_events(chain, start, end, contract=contract))
+        if events:
+            timestamps = {b: w3.eth.get_block(b)['timestamp'] for b in {e.block for e in events}}
+            columns = _to_columns(events, timestamps)
+            path = _partition_path(out_dir, chain, start)
+            if path.is_file():
+                # An earlier export filled the start of this range; append to it
+                columns = _concat([_read_partition(path), columns])
+            _write_partition(path, columns)
+            written += len(events)
+        manifest[chain] = end
+        _write_manifest(out_dir, manifest)
+        start = end + 1
+    return written
+
+
+def load(out_dir, chain, from_block=None, to_block=None):
+    """
+        Concatenate the exported partitions of a chain that overlap [from_block, to_block]
+        Returns a dictionary of columns; 'token' and 'recipient' index into a single
+        'addresses' array shared by the whole result
+    """
+    parts = []
+    for path in sorted((Path(out_dir) / chain).glob("*.npz")):
+        first, last = (int(b) for b in path.stem.split('-'))
+        if (from_block is not None and last < from_block) or (to_block is not None and first > to_block):
+            continue
+        parts.append(_read_partition(path))
+
+    if not parts:
+        return _to_columns([], {})
+
+    table = _concat(parts)
+    if from_block is not None or to_block is not None:
+        mask = np.ones(len(table['block']), dtype=bool)
+        if from_block is not None:
+            mask &= table['block'] >= from_block
+        if to_block is not None:
+            mask &= table['block'] <= to_block
+        table = {c: (v if c == 'addresses' else v[mask]) for c, v in table.items()}
+    return table
+
+
+def totals_by_token_and_hour(table, event='Wrap'):
+    """
+        Total amount per (token, hour) for one event type
+        Returns (token addresses, hour start timestamps, totals) as parallel arrays
+    """
+    mask = table['event'] == EVENT_CODES[event]
+    token = table['token'][mask].astype(np.int64)
+    hour = (table['timestamp'][mask] // 3600).astype(np.int64)
+    if len(hour) == 0:
+        return table['addresses'][:0], hour, np.empty(0)
+    first_hour, span = hour.min(), hour.max() - hour.min() + 1
+    keys, inverse = np.unique(token * span + (hour - first_hour), return_inverse=True)
+    totals = np.bincount(inverse, weights=table['amount'][mask], minlength=len(keys))
+    return table['addresses'][keys // span], (first_hour + keys % span) * 3600, totals
+
+
+def _transfer_keys(table, mask, address_ids):
+    """Per-row (token, recipient, exact amount) keys as fixed-width bytes, comparable across tables"""
+    token = address_ids[table['token'][mask]].astype('>u4').view(np.uint8).reshape(-1, 4)
+    recipient = address_ids[table['recipient'][mask]].astype('>u4').view(np.uint8).reshape(-1, 4)
+    packed = np.ascontiguousarray(np.hstack([token, recipient, table['amount_raw'][mask]]))
+    return packed.view('V40').ravel()
+
+
+def _occurrence(keys, timestamps):
+    """Rank of each row among rows with the same key, in time order"""
+    order = np.lexsort((timestamps, keys))
+    sorted_keys = keys[order]
+    new_group = np.ones(len(keys), dtype=bool)
+    new_group[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    starts = np.maximum.accumulate(np.where(new_group, np.arange(len(keys)), 0))
+    rank = np.empty(len(keys), dtype=np.int64)
+    rank[order] = np.arange(len(keys)) - starts
+    return rank
+
+
+def relay_delays(request_table, relay_table, request='Deposit', relay='Wrap'):
+    """
+        Seconds from each request (e.g. Deposit on source) to its relay (e.g. Wrap on
+        destination), pairing the k-th request with the k-th relay of the same
+        (token, recipient, amount).  Unmatched requests are left out.
+    """
+    req_mask = request_table['event'] == EVENT_CODES[request]
+    rel_mask = relay_table['event'] == EVENT_CODES[relay]
+    # Translate both address dictionaries into one so keys compare across chains
+    _, address_ids = np.unique(np.concatenate([request_table['addresses'], relay_table['addresses']]),
+                               return_inverse=True)
+    split = len(request_table['addresses'])
+    req_keys = _transfer_keys(request_table, req_mask, address_ids[:split])
+    rel_keys = _transfer_keys(relay_table, rel_mask, address_ids[split:])
+    if len(req_keys) == 0 or len(rel_keys) == 0:
+        return np.empty(0)
+
+    # One integer id per distinct transfer key across both tables
+    _, key_ids = np.unique(np.concatenate([req_keys, rel_keys]), return_inverse=True)
+    key_ids = key_ids.ravel()
+    req_ids, rel_ids = key_ids[:len(req_keys)], key_ids[len(req_keys):]
+    req_time = request_table['timestamp'][req_mask].astype(np.int64)
+    rel_time = relay_table['timestamp'][rel_mask].astype(np.int64)
+
+    width = max(len(req_ids), len(rel_ids))
+    req_pair = req_ids * width + _occurrence(req_ids, req_time)
+    rel_pair = rel_ids * width + _occurrence(rel_ids, rel_time)
+    _, req_at, rel_at = np.intersect1d(req_pair, rel_pair, assume_unique=True, return_indices=True)
+    return (rel_time[rel_at] - req_time[req_at]).astype(np.float64)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export bridge events to columnar files")
+    parser.add_argument('out_dir')
+    parser.add_argument('--chain', action='append', choices=tuple(CHAIN_EVENTS),
+                        help="chain(s) to export, defaults to both")
+    parser.add_argument('--from-block', type=int, help="first block for a chain with no previous export")
+    parser.add_argument('--contract-info', default="contract_info.json")
+    args = parser.parse_args()
+
+    for chain in args.chain or CHAIN_EVENTS:
+        written = export_events(chain, args.out_dir, from_block=args.from_block,
+                                contract_info_path=args.contract_info)
+        print(f"Exported {written} {chain} events to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
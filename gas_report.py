@@ -0,0 +1,83 @@
+"""
+    Per-function gas deltas from a forge snapshot
+
+    Run the benchmarks in Bridge/ first:
+        forge snapshot --match-contract GasTest
+
+    Each testGas<Name> in Bridge/test/Gas.t.sol is compared with its testGas<Name>Legacy
+    twin (the pre-optimization contracts).  With --baseline, every test is instead
+    compared with the same test in an older snapshot file, e.g. one from another branch.
+
+    usage: python gas_report.py [--snapshot Bridge/.gas-snapshot] [--baseline OLD_SNAPSHOT] [--json]
+"""
+
+from pathlib import Path
+import argparse
+import json
+import re
+
+SNAPSHOT = Path(__file__).parent / "Bridge" / ".gas-snapshot"
+# e.g. "GasTest:testGasDeposit() (gas: 61234)"; fuzz tests report "(runs: 256, μ: 1234, ~: 1200)"
+SNAPSHOT_LINE = re.compile(r"^(?P<contract>\w+):(?P<test>\w+)\(.*?\) \((?:gas: (?P<gas>\d+)|.*?μ: (?P<mean>\d+).*)\)$")
+
+
+def read_snapshot(path):
+    """Returns {'Contract:test': gas}"""
+    gas = {}
+    with open(path, 'r') as f:
+        for line in f:
+            match = SNAPSHOT_LINE.match(line.strip())
+            if match:
+                gas[f"{match['contract']}:{match['test']}"] = int(match['gas'] or match['mean'])
+    return gas
+
+
+def legacy_pairs(snapshot):
+    """Rows of (function, legacy gas, optimized gas) from the testGas<Name>[Legacy] twins"""
+    rows = []
+    for name, gas in snapshot.items():
+        contract, test = name.split(':')
+        if not test.startswith('testGas') or test.endswith('Legacy'):
+            continue
+        legacy = snapshot.get(f"{name}Legacy")
+        if legacy is not None:
+            rows.append((test.removeprefix('testGas'), legacy, gas))
+    return rows
+
+
+def baseline_pairs(snapshot, baseline):
+    """Rows of (test, baseline gas, current gas) for tests present in both snapshots"""
+    return [(name, baseline[name], gas) for name, gas in snapshot.items() if name in baseline]
+
+
+def delta_rows(pairs):
+    return [{'function': name, 'before': before, 'after': after, 'delta': after - before,
+             'percent': round(100 * (after - before) / before, 2) if before else None}
+            for name, before, after in pairs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-function gas deltas from a forge snapshot")
+    parser.add_argument('--snapshot', default=SNAPSHOT)
+    parser.add_argument('--baseline', help="older snapshot to compare against instead of the Legacy twins")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args()
+
+    snapshot = read_snapshot(args.snapshot)
+    if args.baseline:
+        rows = delta_rows(baseline_pairs(snapshot, read_snapshot(args.baseline)))
+    else:
+        rows = delta_rows(legacy_pairs(snapshot))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    width = max([len(r['function']) for r in rows] + [len('function')])
+    print(f"{'function':<{width}} {'before':>10} {'after':>10} {'delta':>10} {'%':>8}")
+    for r in rows:
+        percent = '' if r['percent'] is None else f"{r['percent']:+.2f}"
+        print(f"{r['function']:<{width}} {r['before']:>10} {r['after']:>10} {r['delta']:>+10} {percent:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+    Batched contract reads through Multicall3
+
+    Multicall packs many view calls into a single aggregate3 eth_call, so checking
+    N tokens costs one round trip per chain instead of one per getter:
+
+        batch = Multicall(w3)
+        balances = [batch.add(token.functions.balanceOf(user)) for token in tokens]
+        symbols = [batch.add(token.functions.symbol()) for token in tokens]
+        results = batch.execute()
+        results[balances[0]], results[symbols[0]]
+
+    Fuji and BSC testnet already have Multicall3 at its canonical address; on a
+    local anvil chain ensure_multicall3() installs the test stand-in from
+    Bridge/test/Multicall3.sol (relay_harness.py does this for its chains).
+"""
+
+from web3 import Web3
+from eth_abi import decode
+from eth_utils.abi import get_abi_output_types
+from pathlib import Path
+import json
+
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+MULTICALL3_ARTIFACT = Path(__file__).parent / "Bridge" / "out" / "Multicall3.sol" / "Multicall3.json"
+MULTICALL3_ABI = [{
+    "name": "aggregate3",
+    "type": "function",
+    "stateMutability": "payable",
+    "inputs": [{
+        "name": "calls",
+        "type": "tuple[]",
+        "components": [
+            {"name": "target", "type": "address"},
+            {"name": "allowFailure", "type": "bool"},
+            {"name": "callData", "type": "bytes"},
+        ],
+    }],
+    "outputs": [{
+        "name": "returnData",
+        "type": "tuple[]",
+        "components": [
+            {"name": "success", "type": "bool"},
+            {"name": "returnData", "type": "bytes"},
+        ],
+    }],
+}]
+
+# Keep each aggregate3 well under the eth_call gas cap of public endpoints
+MAX_CALLS_PER_BATCH = 500
+
+
+def _normalize(abi_type, value):
+    """Checksum decoded addresses, as web3 does for regular contract calls"""
+    if abi_type == 'address':
+        return Web3.to_checksum_address(value)
+    if abi_type == 'address[]':
+        return [Web3.to_checksum_address(v) for v in value]
+    return value
+
+
+class Multicall:
+    """
+        Collects bound contract calls (e.g. token.functions.balanceOf(user)) and
+        runs them all with as few aggregate3 calls as possible
+    """
+
+    def __init__(self, w3, address=MULTICALL3_ADDRESS):
+        self.w3 = w3
+        self.contract = w3.eth.contract(address=Web3.to_checksum_address(address), abi=MULTICALL3_ABI)
+        self.calls = []
+
+    def __len__(self):
+        return len(self.calls)
+
+    def add(self, call, allow_failure=True):
+        """
+            call - a contract function with its arguments bound
+            Returns the index of this call's result in execute()'s list
+        """
+        self.calls.append((call, allow_failure))
+        return len(self.calls) - 1
+
+    def execute(self, block_identifier='latest'):
+        """
+            Returns one decoded result per added call, in order.  A call that
+            reverted (with allow_failure) comes back as None.  Single return values
+            are unwrapped; multiple return values come back as a tuple.
+        """
+        results = []
+        for start in range(0, len(self.calls), MAX_CALLS_PER_BATCH):
+            chunk = self.calls[start:start + MAX_CALLS_PER_BATCH]
+            packed = [(call.address, allow_failure, call._encode_transaction_data())
+                      for call, allow_failure in chunk]
+            returned = self.contract.functions.aggregate3(packed).call(block_identifier=block_identifier)
+            for (call, _), (success, data) in zip(chunk, returned):
+                results.append(self._decode(call, data) if success else None)
+        self.calls = []
+        return results
+
+    @staticmethod
+    def _decode(call, data):
+        output_types = get_abi_output_types(call.abi)
+        try:
+            values = decode(output_types, data)
+        except Exception:
+            return None  # e.g. an EOA or a non-conforming contract returning nothing
+        values = tuple(_normalize(t, v) for t, v in zip(output_types, values))
+        return values[0] if len(values) == 1 else values
+
+
+def multicall(w3, calls, block_identifier='latest'):
+    """Run a list of bound contract calls in one batch and return their decoded results"""
+    batch = Multicall(w3)
+    for call in calls:
+        batch.add(call)
+    return batch.execute(block_identifier)
+
+
+def ensure_multicall3(w3, artifact_path=MULTICALL3_ARTIFACT):
+    """
+        Make sure Multicall3 exists at its canonical address on this chain
+        On a local dev chain (anvil/hardhat) the stand-in contract's runtime code is
+        installed there directly; this needs 'forge build' to have been run in Bridge/.
+    """
+    if len(w3.eth.get_code(MULTICALL3_ADDRESS)) > 0:
+        return MULTICALL3_ADDRESS
+
+    try:
+        with open(artifact_path, 'r') as f:
+            runtime_code = json.load(f)['deployedBytecode']['object']
+    except (OSError, KeyError, json.JSONDecodeError) as err:
+        raise RuntimeError(f"Multicall3 is not deployed and its artifact could not be read "
+                           f"(run 'forge build' in Bridge/): {err}")
+
+    for method in ("anvil_setCode", "hardhat_setCode"):
+        response = w3.provider.make_request(method, [MULTICALL3_ADDRESS, runtime_code])
+        if 'error' not in response:
+            return MULTICALL3_ADDRESS
+    raise RuntimeError("Multicall3 is not deployed and this chain does not support setting code")
@@ -0,0 +1,173 @@
+"""
+    On-demand profiling of bridge scan cycles
+
+    Wrap a scan cycle in cycle() and the steps inside it in stage():
+
+        with profiling.cycle("scan_source"):
+            with profiling.stage("fetch_events"):
+                ...
+
+    While profiling is off both return a shared no-op context manager, so the
+    cost is one global flag check per call.  While it is on, every cycle prints
+    its per-stage wall time, and with BRIDGE_PROFILE=cprofile the slowest
+    cycles are also captured with cProfile.  Only the BRIDGE_PROFILE_KEEP
+    slowest captures are kept in BRIDGE_PROFILE_DIR (a .prof file for
+    pstats/snakeviz plus a .json of stage timings each); faster ones are
+    deleted as slower ones arrive.
+
+        BRIDGE_PROFILE       unset/'0' off, '1' stage timers, 'cprofile' timers and captures
+        BRIDGE_PROFILE_DIR   where captures go (default 'profiles')
+        BRIDGE_PROFILE_KEEP  how many of the slowest captures to keep (default 5)
+
+    In a running daemon, SIGUSR1 toggles profiling on and off without a restart
+    (turning it on this way uses the 'cprofile' mode).
+"""
+
+from datetime import datetime
+from pathlib import Path
+import cProfile
+import signal
+import heapq
+import time
+import json
+import os
+
+_mode = os.environ.get("BRIDGE_PROFILE", "0").lower()
+_enabled = _mode not in ("", "0", "off")
+_capture = _mode == "cprofile"
+_directory = Path(os.environ.get("BRIDGE_PROFILE_DIR", "profiles"))
+_keep = int(os.environ.get("BRIDGE_PROFILE_KEEP", 5))
+
+_current = None  # the Cycle being timed, if any
+_slowest = None  # min-heap of (seconds, capture file stem) for the kept captures
+
+
+class _Disabled:
+    """Shared do-nothing context manager returned while profiling is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_DISABLED = _Disabled()
+
+
+class _Stage:
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        cycle = _current
+        if cycle is not None:
+            elapsed = time.perf_counter() - self.started
+            cycle.stages[self.name] = cycle.stages.get(self.name, 0.0) + elapsed
+        return False
+
+
+class Cycle:
+    """Stage timings (and optionally a cProfile capture) of one scan cycle"""
+
+    def __init__(self, name):
+        self.name = name
+        self.stages = {}
+        self.profile = cProfile.Profile() if _capture else None
+
+    def __enter__(self):
+        global _current
+        self.parent, _current = _current, self
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        if self.profile is not None:
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        global _current
+        if self.profile is not None:
+            self.profile.disable()
+        self.seconds = time.perf_counter() - self.started
+        _current = self.parent
+        stages = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.stages.items())
+        print(f"[{self.started_at}] profile {self.name}: {self.seconds * 1000:.1f}ms {stages}")
+        if self.profile is not None:
+            _keep_if_slow(self)
+        return False
+
+
+def _load_kept():
+    """Pick up captures kept by earlier runs, so the directory stays bounded across restarts"""
+    kept = []
+    for path in _directory.glob("*.json"):
+        try:
+            with path.open('r') as f:
+                kept.append((json.load(f)['seconds'], path.stem))
+        except (OSError, ValueError, KeyError):
+            continue
+    heapq.heapify(kept)
+    return kept
+
+
+def _keep_if_slow(cycle):
+    """Save the cycle's capture if it is among the _keep slowest, dropping the fastest kept one"""
+    global _slowest
+    if _slowest is None:
+        _slowest = _load_kept()
+    if len(_slowest) >= _keep and cycle.seconds <= _slowest[0][0]:
+        return
+    _directory.mkdir(parents=True, exist_ok=True)
+    stem = f"{cycle.started_at:%Y%m%dT%H%M%S%f}-{cycle.name}-{cycle.seconds * 1000:.0f}ms"
+    cycle.profile.dump_stats(_directory / f"{stem}.prof")
+    with open(_directory / f"{stem}.json", 'w') as f:
+        json.dump({'name': cycle.name, 'started_at': cycle.started_at.isoformat(), 'seconds': cycle.seconds,
+                   'stages': cycle.stages}, f, indent=2)
+    heapq.heappush(_slowest, (cycle.seconds, stem))
+    while len(_slowest) > _keep:
+        _, evicted = heapq.heappop(_slowest)
+        for suffix in (".prof", ".json"):
+            (_directory / f"{evicted}{suffix}").unlink(missing_ok=True)
+
+
+def cycle(name):
+    """Time one scan cycle; a no-op while profiling is off"""
+    if not _enabled:
+        return _DISABLED
+    return Cycle(name)
+
+
+def stage(name):
+    """Time one step of the current cycle; a no-op while profiling is off"""
+    if not _enabled:
+        return _DISABLED
+    return _Stage(name)
+
+
+def enable(capture=True):
+    global _enabled, _capture
+    _enabled, _capture = True, capture
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def toggle(signum=None, frame=None):
+    if _enabled:
+        disable()
+    else:
+        enable(capture=True)
+    print(f"[{datetime.utcnow()}] Profiling {'enabled' if _enabled else 'disabled'}")
+
+
+def install_signal_handler(signum=getattr(signal, "SIGUSR1", None)):
+    """Let SIGUSR1 toggle profiling in a long-running process (no-op where there is no SIGUSR1)"""
+    if signum is not None:
+        signal.signal(signum, toggle)
@@ -0,0 +1,266 @@
+"""
+    Incremental cross-chain reconciliation
+
+    Every Deposit on Source should be answered by exactly one Wrap on Destination,
+    and every Unwrap on Destination by exactly one Withdrawal on Source.  The
+    Reconciler follows the four event streams block by block and keeps only the
+    transfers that are still unmatched, indexed by (token, recipient, amount), so
+    each new event is matched or queued in constant time no matter how much
+    history has already been seen.  Its state is persisted to disk between runs.
+
+    usage: python reconcile.py [--follow SECONDS]
+"""
+
+from collections import OrderedDict, deque
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+import argparse
+import json
+import time
+
+from bridge import CHAIN_EVENTS, get_bridge_contract, iter_events
+from token_registry import LOG_PAGE_SIZE
+
+# direction -> (request event, relay event)
+DIRECTIONS = {
+    'wrap': ('Deposit', 'Wrap'),
+    'withdraw': ('Unwrap', 'Withdrawal'),
+}
+EVENT_CHAIN = {name: chain for chain, names in CHAIN_EVENTS.items() for name in names}
+
+
+class Ledger:
+    """
+        Unmatched events of one kind (e.g. Deposits still waiting for their Wrap)
+        Events sharing a key are queued FIFO; 'order' keeps every unmatched event in
+        arrival order so the oldest one is always at the front.  An event already
+        in the ledger (same id) is not queued again.
+    """
+
+    def __init__(self):
+        self.by_key = {}
+        self.order = OrderedDict()
+
+    def __len__(self):
+        return len(self.order)
+
+    def __contains__(self, record_id):
+        return record_id in self.order
+
+    def push(self, key, record):
+        if record['id'] in self.order:
+            return
+        self.by_key.setdefault(key, deque()).append(record['id'])
+        self.order[record['id']] = record
+
+    def pop(self, key):
+        """Remove and return the oldest unmatched record with this key, or None"""
+        queue = self.by_key.get(key)
+        if not queue:
+            return None
+        record = self.order.pop(queue.popleft())
+        if not queue:
+            del self.by_key[key]
+        return record
+
+    def records(self):
+        return list(self.order.values())
+
+    @classmethod
+    def from_records(cls, records):
+        ledger = cls()
+        for record in records:
+            ledger.push(tuple(record['key']), record)
+        return ledger
+
+
+class Reconciler:
+
+    def __init__(self, path="reconcile_state.json"):
+        self.path = Path(path)
+        self.last_block = {'source': None, 'destination': None}
+        self.addresses = {'source': None, 'destination': None}
+        self.matched = {direction: 0 for direction in DIRECTIONS}
+        # Requests still waiting for a relay, and relays seen without a request
+        self.pending = {direction: Ledger() for direction in DIRECTIONS}
+        self.unclaimed = {direction: Ledger() for direction in DIRECTIONS}
+        self.load()
+
+    def load(self):
+        if not self.path.is_file():
+            return
+        try:
+            with self.path.open('r') as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError) as err:
+            print(f"Ignoring unreadable reconciliation state {self.path}: {err}")
+            return
+        self.last_block.update(saved['last_block'])
+        self.addresses.update(saved['addresses'])
+        self.matched.update(saved['matched'])
+        for direction in DIRECTIONS:
+            self.pending[direction] = Ledger.from_records(saved['pending'][direction])
+            self.unclaimed[direction] = Ledger.from_records(saved['unclaimed'][direction])
+
+    def save(self):
+        state = {
+            'last_block': self.last_block,
+            'addresses': self.addresses,
+            'matched': self.matched,
+            'pending': {d: ledger.records() for d, ledger in self.pending.items()},
+            'unclaimed': {d: ledger.records() for d, ledger in self.unclaimed.items()},
+        }
+        tmp_path = self.path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump(state, f)
+        tmp_path.replace(self.path)
+
+    def add(self, event, timestamp=None):
+        """
+            Reconcile one BridgeEvent in O(1)
+            timestamp - (int) timestamp of the event's block, if known (otherwise report()
+            looks it up, only for the events still outstanding by then)
+            Returns the record it was matched with, or None if it is now outstanding
+            (or was already outstanding)
+        """
+        name = event.event
+        key = (event.token, event.recipient, event.amount)
+        record = {
+            'id': f"{event.tx_hash}:{event.log_index}",
+            'event': name,
+            'key': list(key),
+            'block': event.block,
+            'sequence': event.sequence,
+            'timestamp': timestamp,
+        }
+        for direction, (request, relay) in DIRECTIONS.items():
+            if name in (request, relay) and (record['id'] in self.pending[direction]
+                                             or record['id'] in self.unclaimed[direction]):
+                return None
+            if name == request:
+                match = self.unclaimed[direction].pop(key)
+                if match is None:
+                    self.pending[direction].push(key, record)
+                break
+            if name == relay:
+                match = self.pending[direction].pop(key)
+                if match is None:
+                    self.unclaimed[direction].push(key, record)
+                break
+        else:
+            return None
+        if match is not None:
+            self.matched[direction] += 1
+        return match
+
+    def sync(self, chain, contract, to_block=None, from_block=None):
+        """
+            chain - (string) 'source' or 'destination'
+            contract - (contract object) the bridge contract on that chain
+            to_block - (int) last block to include, defaults to the chain head
+            from_block - (int) where to start the very first time, defaults to to_block
+
+            Feed every bridge event since the previous sync into the reconciler, one
+            page of blocks at a time.  A page is fetched in full before any of it is
+            applied and last_block advances after each one, so a failure part way
+            leaves nothing half-applied and the retry resumes at the failed page.
+        """
+        if to_block is None:
+            to_block = contract.w3.eth.block_number
+        if self.addresses[chain] != contract.address:
+            self.addresses[chain] = contract.address
+            self.last_block[chain] = (to_block if from_block is None else from_block) - 1
+
+        start = self.last_block[chain] + 1
+        while start <= to_block:
+            page_end = min(start + LOG_PAGE_SIZE - 1, to_block)
+            events = list(iter_events(chain, start, page_end, contract=contract))
+            for event in events:
+                self.add(event)
+            self.last_block[chain] = page_end
+            start = page_end + 1
+
+    def report(self, heads=None, block_timestamp=None):
+        """
+            heads - (dictionary) current block number per chain, used for ages in blocks
+            block_timestamp - callable (chain, block) -> timestamp, used for ages in seconds
+            Returns the unmatched and over-relayed transfers, oldest first, with their ages
+
+            Only the outstanding records need a timestamp, so they are looked up here
+            rather than for every event synced; each is looked up once and kept.
+        """
+        heads = heads or {}
+        now = time.time()
+
+        def with_age(records):
+            rows = []
+            for record in records:
+                chain = EVENT_CHAIN[record['event']]
+                head = heads.get(chain)
+                if record.get('timestamp') is None and block_timestamp is not None:
+                    record['timestamp'] = block_timestamp(chain, record['block'])
+                timestamp = record.get('timestamp')
+                rows.append({**record,
+                             'age_blocks': None if head is None else head - record['block'],
+                             'age_seconds': None if timestamp is None else round(now - timestamp, 1)})
+            return rows
+
+        return {
+            'matched': dict(self.matched),
+            'unmatched_deposits': with_age(self.pending['wrap'].records()),
+            'over_relayed_wraps': with_age(self.unclaimed['wrap'].records()),
+            'unmatched_unwraps': with_age(self.pending['withdraw'].records()),
+            'over_relayed_withdrawals': with_age(self.unclaimed['withdraw'].records()),
+        }
+
+    def summary(self):
+        """Counts only, in O(1)"""
+        return {
+            'matched': dict(self.matched),
+            'unmatched_deposits': len(self.pending['wrap']),
+            'over_relayed_wraps': len(self.unclaimed['wrap']),
+            'unmatched_unwraps': len(self.pending['withdraw']),
+            'over_relayed_withdrawals': len(self.unclaimed['withdraw']),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile bridge transfers across both chains")
+    parser.add_argument('--contract-info', default="contract_info.json")
+    parser.add_argument('--from-block', type=int, nargs=2, metavar=('SOURCE', 'DESTINATION'),
+                        help="first blocks to reconcile on a fresh state (default: the current heads)")
+    parser.add_argument('--follow', type=float, metavar='SECONDS', help="keep reconciling at this interval")
+    parser.add_argument('--report', help="write the full report to this JSON file")
+    args = parser.parse_args()
+
+    reconciler = Reconciler(Path(args.contract_info).with_name("reconcile_state.json"))
+    contracts = {chain: get_bridge_contract(chain, args.contract_info) for chain in CHAIN_EVENTS}
+    from_blocks = dict(zip(CHAIN_EVENTS, args.from_block)) if args.from_block else {}
+    block_timestamp = lru_cache(maxsize=4096)(
+        lambda chain, block: contracts[chain].w3.eth.get_block(block)['timestamp'])
+    while True:
+        try:
+            heads = {}
+            for chain, contract in contracts.items():
+                heads[chain] = contract.w3.eth.block_number
+                try:
+                    reconciler.sync(chain, contract, heads[chain], from_blocks.get(chain))
+                finally:
+                    # Keep the pages that did sync, so a retry resumes after them
+                    reconciler.save()
+            print(f"[{datetime.utcnow()}] {reconciler.summary()}")
+            if args.report:
+                with open(args.report, 'w') as f:
+                    json.dump(reconciler.report(heads, block_timestamp), f, indent=2)
+        except Exception as err:
+            if not args.follow:
+                raise
+            print(f"[{datetime.utcnow()}] Reconciliation failed, retrying in {args.follow}s: {err}")
+        if not args.follow:
+            break
+        time.sleep(args.follow)
+
+
+if __name__ == "__main__":
+    main()
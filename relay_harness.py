@@ -0,0 +1,298 @@
+"""
+    End-to-end relay latency and throughput on two local anvil chains
+
+    Starts a source and a destination anvil node with different block times,
+    deploys Source, Destination and test ERC20s from the forge artifacts, runs
+    bridge.py in daemon mode against them, and drives deposit and unwrap load:
+
+        steady       'rate' transfers per second for 'duration' seconds, one token
+        burst        'transfers' transfers submitted all at once
+        many-tokens  like steady, spread round-robin over 'tokens' distinct tokens
+
+    Every transfer has a unique (token, recipient, amount), so each Deposit is
+    matched to its Wrap and each Unwrap to its Withdrawal.  Latency is measured from
+    submitting the request to first seeing the relay (polled every POLL_INTERVAL
+    seconds).  The JSON report has latency percentiles per direction and the
+    sustained number of relayed transfers per second.
+
+    Needs anvil on the PATH and 'forge build' run in Bridge/ (the test token is the
+    MToken helper compiled from Bridge/test).
+
+    usage: python relay_harness.py [--profile steady|burst|many-tokens] [-o report.json]
+"""
+
+from web3 import Web3
+from eth_account import Account
+from pathlib import Path
+import numpy as np
+import subprocess
+import contextlib
+import tempfile
+import argparse
+import socket
+import random
+import json
+import time
+import sys
+import os
+
+from bridge import iter_events
+from multicall import ensure_multicall3, multicall
+
+ROOT = Path(__file__).parent.absolute()
+ARTIFACTS = ROOT / "Bridge" / "out"
+ANVIL_MNEMONIC = "test test test test test test test test test test test junk"
+POLL_INTERVAL = 0.25
+NUM_USERS = 8
+TOKEN_SUPPLY = 10 ** 30
+PERCENTILES = (50, 90, 95, 99)
+
+Account.enable_unaudited_hdwallet_features()
+
+
+def load_artifact(source_file, contract_name):
+    path = ARTIFACTS / source_file / f"{contract_name}.json"
+    try:
+        with path.open('r') as f:
+            artifact = json.load(f)
+    except OSError as err:
+        raise RuntimeError(f"Missing forge artifact {path} (run 'forge build' in Bridge/): {err}")
+    return artifact['abi'], artifact['bytecode']['object']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_anvil(block_time, chain_id, log_file):
+    """Start an anvil node and return (process, rpc url) once it answers"""
+    port = free_port()
+    process = subprocess.Popen(["anvil", "--port", str(port), "--block-time", str(block_time),
+                                "--chain-id", str(chain_id), "--mnemonic", ANVIL_MNEMONIC],
+                               stdout=log_file, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    w3 = Web3(Web3.HTTPProvider(url))
+    deadline = time.monotonic() + 30
+    while not w3.is_connected():
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError(f"anvil failed to start on port {port}")
+        time.sleep(0.1)
+    return process, url
+
+
+def transact(w3, function, sender):
+    """Send from an unlocked anvil account and wait for it to be mined"""
+    tx_hash = function.transact({'from': sender})
+    receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+    if receipt['status'] != 1:
+        raise RuntimeError(f"Setup transaction {tx_hash.hex()} reverted")
+    return receipt
+
+
+def deploy(w3, abi, bytecode, sender, *args):
+    receipt = transact(w3, w3.eth.contract(abi=abi, bytecode=bytecode).constructor(*args), sender)
+    return w3.eth.contract(address=receipt['contractAddress'], abi=abi)
+
+
+def deploy_bridge(source_w3, destination_w3, num_tokens, users, work_dir):
+    """
+        Deploy the bridge and 'num_tokens' registered tokens, fund every user on both
+        sides, and write a contract_info.json for bridge.py into work_dir
+        Returns (source contract, destination contract, [(token, wrapped token)])
+    """
+    admin = Account.from_mnemonic(ANVIL_MNEMONIC, account_path="m/44'/60'/0'/0/0")
+    # The wrapped token addresses are read in one Multicall3 batch, which a fresh anvil chain lacks
+    ensure_multicall3(destination_w3)
+    # Lower bounds for the deployment blocks, so bridge.py's token registry need not look them up
+    start_blocks = {"source": source_w3.eth.block_number, "destination": destination_w3.eth.block_number}
+    source = deploy(source_w3, *load_artifact("Source.sol", "Source"), admin.address, admin.address)
+    destination = deploy(destination_w3, *load_artifact("Destination.sol", "Destination"), admin.address, admin.address)
+    token_abi, token_bytecode = load_artifact("Source.t.sol", "MToken")
+    wrapped_abi, _ = load_artifact("BridgeToken.sol", "BridgeToken")
+
+    tokens = []
+    for i in range(num_tokens):
+        token = deploy(source_w3, token_abi, token_bytecode, admin.address, f"Bench{i}", f"B{i}", TOKEN_SUPPLY)
+        transact(source_w3, source.functions.registerToken(token.address), admin.address)
+        transact(destination_w3, destination.functions.createToken(token.address, f"wBench{i}", f"wB{i}"),
+                 admin.address)
+        tokens.append(token)
+    wrapped_addresses = multicall(destination_w3, [destination.functions.wrapped_tokens(t.address) for t in tokens])
+
+    pairs = []
+    for token, wrapped_address in zip(tokens, wrapped_addresses):
+        wrapped = destination_w3.eth.contract(address=wrapped_address, abi=wrapped_abi)
+        share = TOKEN_SUPPLY // (2 * len(users) + 2)
+        # Source holds the underlying that unwraps withdraw; users hold both sides to send load
+        transact(source_w3, token.functions.transfer(source.address, share), admin.address)
+        for user in users:
+            transact(source_w3, token.functions.transfer(user, share), admin.address)
+            transact(source_w3, token.functions.approve(source.address, share), user)
+            transact(destination_w3, destination.functions.wrap(token.address, user, share), admin.address)
+        pairs.append((token, wrapped))
+
+    contract_info = {
+        "warden_key": admin.key.hex(),
+        "source": {"address": source.address, "abi": source.abi, "deploy_block": start_blocks["source"]},
+        "destination": {"address": destination.address, "abi": destination.abi,
+                        "deploy_block": start_blocks["destination"]},
+    }
+    with open(work_dir / "contract_info.json", 'w') as f:
+        json.dump(contract_info, f, indent=2)
+    return source, destination, pairs
+
+
+def schedule(profile, rate, duration, transfers, num_tokens, unwrap_ratio, seed=0):
+    """
+        Returns the load as a list of (offset in seconds, 'deposit' or 'unwrap', token index)
+    """
+    rng = random.Random(seed)
+    if profile == 'burst':
+        offsets = [0.0] * transfers
+    else:
+        offsets = [i / rate for i in range(int(rate * duration))]
+    plan = []
+    for i, offset in enumerate(offsets):
+        kind = 'unwrap' if rng.random() < unwrap_ratio else 'deposit'
+        token_index = i % num_tokens if profile == 'many-tokens' else 0
+        plan.append((offset, kind, token_index))
+    return plan
+
+
+def submit_load(plan, source, destination, pairs, users):
+    """
+        Send every planned request (without waiting for it to be mined)
+        Returns {(direction, token, recipient, amount): submit time}
+    """
+    submitted = {}
+    started = time.monotonic()
+    for i, (offset, kind, token_index) in enumerate(plan):
+        delay = offset - (time.monotonic() - started)
+        if delay > 0:
+            time.sleep(delay)
+        token, wrapped = pairs[token_index]
+        user = users[i % len(users)]
+        amount = 10 ** 6 + i  # Unique per transfer, so each relay has exactly one request
+        if kind == 'deposit':
+            function = source.functions.deposit(token.address, user, amount)
+        else:
+            function = destination.functions.unwrap(wrapped.address, user, amount)
+        submitted_at = time.time()
+        function.transact({'from': user, 'gas': 300_000})
+        submitted[('wrap' if kind == 'deposit' else 'withdraw', token.address, user, amount)] = submitted_at
+    return submitted
+
+
+def watch_relays(source, destination, submitted, from_blocks, timeout):
+    """
+        Poll both chains for Wrap and Withdrawal events until every submitted transfer
+        has been relayed or 'timeout' seconds pass without progress
+        Returns {transfer key: time the relay was first seen}
+    """
+    relayed = {}
+    next_block = dict(from_blocks)
+    watched = {'destination': (destination, ('Wrap',), 'wrap'), 'source': (source, ('Withdrawal',), 'withdraw')}
+    last_progress = time.monotonic()
+    while len(relayed) < len(submitted) and time.monotonic() - last_progress < timeout:
+        for chain, (contract, names, direction) in watched.items():
+            head = contract.w3.eth.block_number
+            for event in iter_events(chain, next_block[chain], head, names=names, contract=contract):
+                key = (direction, event.token, event.recipient, event.amount)
+                if key in submitted and key not in relayed:
+                    relayed[key] = time.time()
+                    last_progress = time.monotonic()
+            next_block[chain] = head + 1
+        time.sleep(POLL_INTERVAL)
+    return relayed
+
+
+def build_report(config, submitted, relayed):
+    report = {'config': config, 'submitted': len(submitted), 'relayed': len(relayed),
+              'missing': len(submitted) - len(relayed), 'directions': {}}
+    for direction in ('wrap', 'withdraw'):
+        keys = [k for k in submitted if k[0] == direction]
+        latencies = np.array([relayed[k] - submitted[k] for k in keys if k in relayed])
+        stats = {'submitted': len(keys), 'relayed': len(latencies)}
+        if len(latencies):
+            stats.update({f"p{p}": round(float(np.percentile(latencies, p)), 3) for p in PERCENTILES})
+            stats.update({'mean': round(float(latencies.mean()), 3), 'max': round(float(latencies.max()), 3)})
+        report['directions'][direction] = stats
+    if relayed:
+        # Sustained throughput: relayed transfers over the span from the first request to the last relay
+        span = max(relayed.values()) - min(submitted.values())
+        report['span_seconds'] = round(span, 3)
+        report['transfers_per_second'] = round(len(relayed) / span, 3) if span > 0 else None
+    return report
+
+
+def run(args):
+    work_dir = Path(tempfile.mkdtemp(prefix="relay_harness_"))
+    processes = []
+    with contextlib.ExitStack() as stack:
+        anvil_log = stack.enter_context(open(work_dir / "anvil.log", 'w'))
+        bridge_log = stack.enter_context(open(work_dir / "bridge.log", 'w'))
+        try:
+            source_node, source_url = start_anvil(args.source_block_time, 31337, anvil_log)
+            processes.append(source_node)
+            destination_node, destination_url = start_anvil(args.destination_block_time, 31338, anvil_log)
+            processes.append(destination_node)
+            source_w3, destination_w3 = Web3(Web3.HTTPProvider(source_url)), Web3(Web3.HTTPProvider(destination_url))
+
+            num_tokens = args.tokens if args.profile == 'many-tokens' else 1
+            users = source_w3.eth.accounts[1:1 + NUM_USERS]
+            print(f"Deploying bridge and {num_tokens} token(s) (work dir {work_dir})")
+            source, destination, pairs = deploy_bridge(source_w3, destination_w3, num_tokens, users, work_dir)
+
+            env = dict(os.environ, BRIDGE_SOURCE_RPC=source_url, BRIDGE_DESTINATION_RPC=destination_url,
+                       PYTHONUNBUFFERED="1")
+            env.pop("BRIDGE_CASSETTE", None)
+            processes.append(subprocess.Popen(
+                [sys.executable, os.fspath(ROOT / "bridge.py"), "--daemon", "--interval", str(args.interval),
+                 "--contract-info", os.fspath(work_dir / "contract_info.json")],
+                cwd=ROOT, env=env, stdout=bridge_log, stderr=subprocess.STDOUT))
+
+            plan = schedule(args.profile, args.rate, args.duration, args.transfers, num_tokens, args.unwrap_ratio)
+            from_blocks = {'source': source_w3.eth.block_number, 'destination': destination_w3.eth.block_number}
+            print(f"Submitting {len(plan)} transfers ({args.profile})")
+            submitted = submit_load(plan, source, destination, pairs, users)
+            relayed = watch_relays(source, destination, submitted, from_blocks, args.timeout)
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+            for process in processes:
+                with contextlib.suppress(subprocess.TimeoutExpired):
+                    process.wait(timeout=10)
+
+    config = {k: v for k, v in vars(args).items() if k != 'output'}
+    report = build_report(config, submitted, relayed)
+    report['work_dir'] = os.fspath(work_dir)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bridge relay latency and throughput on local anvil chains")
+    parser.add_argument('--profile', choices=('steady', 'burst', 'many-tokens'), default='steady')
+    parser.add_argument('--rate', type=float, default=2.0, help="transfers per second (steady, many-tokens)")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds of load (steady, many-tokens)")
+    parser.add_argument('--transfers', type=int, default=50, help="number of transfers (burst)")
+    parser.add_argument('--tokens', type=int, default=10, help="distinct tokens (many-tokens)")
+    parser.add_argument('--unwrap-ratio', type=float, default=0.5, help="fraction of transfers that are unwraps")
+    parser.add_argument('--source-block-time', type=int, default=2)
+    parser.add_argument('--destination-block-time', type=int, default=3)
+    parser.add_argument('--interval', type=float, default=1.0, help="bridge.py scan interval")
+    parser.add_argument('--timeout', type=float, default=120.0, help="give up after this long without a new relay")
+    parser.add_argument('-o', '--output', default="relay_report.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps({k: report.get(k) for k in ('relayed', 'missing', 'transfers_per_second', 'directions')}, indent=2))
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+from pathlib import Path
+import json
+import time
+
+# A failed relay is retried after RELAY_RETRY_DELAY seconds, doubling after each
+# further failure up to MAX_RELAY_RETRY_DELAY
+RELAY_RETRY_DELAY = 10
+MAX_RELAY_RETRY_DELAY = 600
+# A nonce still failing (or still not found by scans that should have found it) this
+# many seconds after it first failed is dead-lettered and the sequence moves on without it
+DEAD_LETTER_AFTER = 24 * 3600
+
+
+class SequenceTracker:
+    """
+        Tracks which sequence numbers (the 'nonce' of Source.Deposit and
+        Destination.Unwrap) have already been settled on each chain
+
+        The sequence starts at the lowest nonce of the first scanned window.
+        Every nonce up to 'contiguous' is settled; 'pending' holds the few settled
+        beyond it, keyed by nonce with the block they were in.  An event is new iff
+        its nonce is above contiguous and not pending, and any hole between them is
+        a gap whose block range is known exactly, so a missed event can be fetched
+        without rescanning.
+
+        A nonce is settled when it is relayed, when it has kept failing for
+        DEAD_LETTER_AFTER seconds ('dead_letter', kept for inspection), or when it is
+        deferred because its token has no counterpart on the other chain yet
+        ('deferred', with its block and token, so it can be relayed once the token
+        is registered).  Failing nonces back off exponentially ('attempts'), and the
+        relay transaction sent for a nonce is kept until its outcome is known
+        ('sent'), so a relay whose receipt was not seen is checked, not sent again.
+        Persisted to disk between runs.
+    """
+
+    def __init__(self, path="sequence_state.json"):
+        self.path = Path(path)
+        self.state = {}
+        self.clock = time.time
+        self.load()
+
+    def load(self):
+        if not self.path.is_file():
+            return
+        try:
+            with self.path.open('r') as f:
+                self.state = json.load(f)
+        except (OSError, json.JSONDecodeError) as err:
+            print(f"Ignoring unreadable sequence state {self.path}: {err}")
+            return
+        for side in self.state.values():
+            for field in ('pending', 'attempts', 'dead_letter', 'deferred', 'sent'):
+                side[field] = {int(n): value for n, value in side.get(field, {}).items()}
+
+    def save(self):
+        tmp_path = self.path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump(self.state, f, indent=2)
+        tmp_path.replace(self.path)
+
+    def side(self, chain, address):
+        """State for one chain, reset when the bridge contract there changes"""
+        side = self.state.get(chain)
+        if side is None or side['address'] != address:
+            side = self.state[chain] = {'address': address, 'contiguous': None, 'contiguous_block': None,
+                                        'pending': {}, 'attempts': {}, 'dead_letter': {}, 'deferred': {},
+                                        'sent': {}}
+        return side
+
+    def start(self, chain, address, nonce, block):
+        """Begin the sequence at 'nonce' (in 'block') unless it has already begun"""
+        side = self.side(chain, address)
+        if side['contiguous'] is None:
+            side['contiguous'], side['contiguous_block'] = nonce - 1, block
+            self._advance(side)
+
+    def is_new(self, chain, address, nonce):
+        side = self.side(chain, address)
+        if nonce in side['pending']:
+            return False
+        return side['contiguous'] is None or nonce > side['contiguous']
+
+    def add(self, chain, address, nonce, block):
+        """Record a relayed nonce and advance the contiguous prefix as far as it goes"""
+        side = self.side(chain, address)
+        side['attempts'].pop(nonce, None)
+        side['deferred'].pop(nonce, None)
+        side['dead_letter'].pop(nonce, None)
+        side['sent'].pop(nonce, None)
+        self._settle(side, nonce, block)
+
+    def fail(self, chain, address, nonce, block):
+        """
+            Record a failed relay of 'nonce', which is then not retried for a while (see backing_off)
+            Returns True if it has been failing for DEAD_LETTER_AFTER and is now dead-lettered
+        """
+        side = self.side(chain, address)
+        side['sent'].pop(nonce, None)
+        if self._give_up(side, nonce, block):
+            return True
+        attempt = side['attempts'][nonce]
+        attempt['failures'] += 1
+        delay = min(RELAY_RETRY_DELAY * 2 ** (attempt['failures'] - 1), MAX_RELAY_RETRY_DELAY)
+        attempt['retry_at'] = self.clock() + delay
+        return False
+
+    def not_found(self, chain, address, nonce):
+        """
+            Record that a scan should have found 'nonce' but did not
+            Returns True if it has been missing for DEAD_LETTER_AFTER and is now dead-lettered
+        """
+        return self._give_up(self.side(chain, address), nonce, None)
+
+    def backing_off(self, chain, address, nonce):
+        """True if 'nonce' failed recently and should not be retried yet"""
+        attempt = self.side(chain, address)['attempts'].get(nonce)
+        return attempt is not None and attempt['retry_at'] > self.clock()
+
+    def record_sent(self, chain, address, nonce, relay):
+        """Remember the relay transaction sent for 'nonce' (a dictionary, see bridge.relay_outcome)"""
+        self.side(chain, address)['sent'][nonce] = relay
+
+    def sent(self, chain, address, nonce):
+        """The relay transaction sent for 'nonce' whose outcome is not known yet, or None"""
+        return self.side(chain, address)['sent'].get(nonce)
+
+    def defer(self, chain, address, nonce, block, token):
+        """Settle a nonce that cannot be relayed until 'token' is registered on the other chain"""
+        side = self.side(chain, address)
+        side['deferred'][nonce] = [block, token]
+        self._settle(side, nonce, block)
+
+    def deferred(self, chain, address):
+        """{nonce: (block, token)} of every deferred nonce"""
+        return {n: tuple(entry) for n, entry in self.side(chain, address)['deferred'].items()}
+
+    def dead_letters(self, chain, address):
+        """{nonce: block} of every dead-lettered nonce (block None if it was never found)"""
+        return dict(self.side(chain, address)['dead_letter'])
+
+    def gap(self, chain, address, first_new=None):
+        """
+            first_new - (nonce, block) of the earliest event found by the current scan, if any
+            Returns (from_block, to_block) covering every nonce still missing between the
+            contiguous prefix and the newest one known, or None if there is no hole
+        """
+        side = self.side(chain, address)
+        if side['contiguous'] is None:
+            return None
+        ahead = dict(side['pending'])
+        if first_new is not None:
+            ahead.setdefault(*first_new)
+        blocks = [block for block in ahead.values() if block is not None]
+        if not blocks or max(ahead) - side['contiguous'] == len(ahead):
+            return None
+        return side['contiguous_block'], max(blocks)
+
+    def missing(self, chain, address, found, to_block):
+        """
+            found - {nonce: block} of the events a scan returned
+            to_block - last block the scan covered without interruption from the contiguous prefix on
+            Returns the nonces that scan must have covered but did not find: every hole below
+            a nonce known to be at or before to_block
+        """
+        side = self.side(chain, address)
+        if side['contiguous'] is None:
+            return []
+        known = {**found, **side['pending']}
+        covered = [n for n, block in known.items() if block is not None and block <= to_block]
+        if not covered:
+            return []
+        return [n for n in range(side['contiguous'] + 1, max(covered)) if n not in known]
+
+    def _give_up(self, side, nonce, block):
+        """Start the failure clock of 'nonce', or dead-letter it once that has run out"""
+        now = self.clock()
+        attempt = side['attempts'].setdefault(nonce, {'since': now, 'failures': 0, 'retry_at': now})
+        if now - attempt['since'] < DEAD_LETTER_AFTER:
+            return False
+        del side['attempts'][nonce]
+        side['deferred'].pop(nonce, None)
+        side['sent'].pop(nonce, None)
+        side['dead_letter'][nonce] = block
+        self._settle(side, nonce, block)
+        return True
+
+    def _settle(self, side, nonce, block):
+        if side['contiguous'] is not None and nonce <= side['contiguous']:
+            return
+        side['pending'][nonce] = block
+        self._advance(side)
+
+    def _advance(self, side):
+        if side['contiguous'] is None:
+            return
+        while side['contiguous'] + 1 in side['pending']:
+            side['contiguous'] += 1
+            block = side['pending'].pop(side['contiguous'])
+            if block is not None:
+                side['contiguous_block'] = block
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+
+import event_export
+from bridge import BridgeEvent
+
+TOKENS = ["0x00000000000000000000000000000000000000A1", "0x00000000000000000000000000000000000000A2"]
+USER = "0x00000000000000000000000000000000000000C1"
+
+
+def event(block, token=TOKENS[0], amount=100):
+    return BridgeEvent("Wrap", token, USER, amount, block, "0x" + f"{block:064x}", 0, None)
+
+
+class FakeChain:
+    def __init__(self):
+        self.events = []
+        self.w3 = SimpleNamespace(eth=SimpleNamespace(block_number=0,
+                                                      get_block=lambda b: {'timestamp': 1_700_000_000 + b}))
+
+    def iter_events(self, chain, from_block, to_block, contract=None, **kwargs):
+        return iter([e for e in self.events if from_block <= e.block <= to_block])
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    fake = FakeChain()
+    monkeypatch.setattr(event_export, "iter_events", fake.iter_events)
+    monkeypatch.setattr(event_export, "get_bridge_contract", lambda chain, path: fake)
+    return fake
+
+
+def test_incremental_exports_merge_into_one_partition(tmp_path, chain):
+    chain.events = [event(5), event(20, token=TOKENS[1])]
+    assert event_export.export_events("destination", tmp_path, to_block=10, from_block=0) == 1
+    assert event_export.export_events("destination", tmp_path, to_block=30) == 1
+
+    [path] = (tmp_path / "destination").glob("*.npz")
+    assert path.name == f"{0:010d}-{event_export.PARTITION_BLOCKS - 1:010d}.npz"
+    table = event_export.load(tmp_path, "destination")
+    assert table['block'].tolist() == [5, 20]
+    assert [table['addresses'][i] for i in table['token']] == TOKENS
+    assert table['timestamp'].tolist() == [1_700_000_005, 1_700_000_020]
+
+
+def test_export_splits_at_partition_boundaries(tmp_path, chain):
+    size = event_export.PARTITION_BLOCKS
+    chain.events = [event(size - 1), event(size)]
+    event_export.export_events("destination", tmp_path, to_block=size + 5, from_block=size - 10)
+
+    assert len(list((tmp_path / "destination").glob("*.npz"))) == 2
+    assert event_export.load(tmp_path, "destination", from_block=size)['block'].tolist() == [size]
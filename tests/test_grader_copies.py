@@ -0,0 +1,27 @@
+from pathlib import Path
+import re
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+GRADER = ROOT / ".guides" / "tests" / "grader"
+COPIES = sorted(p.name for p in GRADER.glob("*.py") if p.name != "__init__.py")
+
+
+def test_grader_has_copies():
+    assert COPIES == ["multicall.py", "rpc_cassette.py", "rpc_client.py"]
+
+
+@pytest.mark.parametrize("name", COPIES)
+def test_grader_copy_matches_root_module(name):
+    # Imports between the copies are relative ('from .multicall import ...')
+    copy = re.sub(r"^from \.(\w+) import", r"from \1 import", (GRADER / name).read_text(), flags=re.M)
+    assert copy == (ROOT / name).read_text(), f"grader/{name} is out of step with {name}; copy it again"
+
+
+@pytest.mark.parametrize("name", COPIES)
+def test_grader_copy_never_imports_student_modules(name):
+    source = (GRADER / name).read_text()
+    student_modules = {p.stem for p in ROOT.glob("*.py")}
+    imported = set(re.findall(r"^(?:from|import) (\w+)", source, flags=re.M))
+    assert not imported & student_modules
@@ -0,0 +1,123 @@
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+from web3 import Web3
+from web3.providers import BaseProvider
+
+import multicall
+from multicall import MULTICALL3_ADDRESS, Multicall
+
+TOKEN = "0x00000000000000000000000000000000000000a1"
+MISSING = "0x00000000000000000000000000000000000000a2"
+USER = "0x00000000000000000000000000000000000000c1"
+
+TOKEN_ABI = [
+    {"name": "balanceOf", "type": "function", "stateMutability": "view",
+     "inputs": [{"name": "owner", "type": "address"}], "outputs": [{"name": "", "type": "uint256"}]},
+    {"name": "symbol", "type": "function", "stateMutability": "view",
+     "inputs": [], "outputs": [{"name": "", "type": "string"}]},
+    {"name": "pair", "type": "function", "stateMutability": "view",
+     "inputs": [], "outputs": [{"name": "", "type": "address"}, {"name": "", "type": "uint256"}]},
+    {"name": "decimals", "type": "function", "stateMutability": "view",
+     "inputs": [], "outputs": [{"name": "", "type": "uint8"}]},
+]
+AGGREGATE3 = function_signature_to_4byte_selector("aggregate3((address,bool,bytes)[])")
+BALANCE_OF = function_signature_to_4byte_selector("balanceOf(address)")
+SYMBOL = function_signature_to_4byte_selector("symbol()")
+PAIR = function_signature_to_4byte_selector("pair()")
+
+
+class FakeMulticall3(BaseProvider):
+    """Answers eth_call to the canonical address like aggregate3 would, against a fake token"""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def token_call(self, target, data):
+        if target.lower() != TOKEN:
+            return True, b""  # An EOA: the call succeeds with no return data
+        if data[:4] == BALANCE_OF:
+            (owner,) = decode(["address"], data[4:])
+            return True, encode(["uint256"], [int(owner, 16)])
+        if data[:4] == SYMBOL:
+            return True, encode(["string"], ["TKN"])
+        if data[:4] == PAIR:
+            return True, encode(["address", "uint256"], [USER, 7])
+        return False, b""
+
+    def make_request(self, method, params):
+        if method == "eth_chainId":
+            return {"jsonrpc": "2.0", "id": 1, "result": "0x1"}
+        assert method == "eth_call"
+        tx = params[0]
+        assert tx["to"].lower() == MULTICALL3_ADDRESS.lower()
+        data = bytes.fromhex(tx["data"][2:])
+        assert data[:4] == AGGREGATE3
+        (calls,) = decode(["(address,bool,bytes)[]"], data[4:])
+        self.batches.append(calls)
+        results = []
+        for target, allow_failure, call_data in calls:
+            success, returned = self.token_call(target, call_data)
+            if not success and not allow_failure:
+                return {"jsonrpc": "2.0", "id": 1, "error": {"code": 3, "message": "Multicall3: call failed"}}
+            results.append((success, returned))
+        return {"jsonrpc": "2.0", "id": 1, "result": "0x" + encode(["(bool,bytes)[]"], [results]).hex()}
+
+    def is_connected(self, show_traceback=False):
+        return True
+
+
+def token_contracts():
+    provider = FakeMulticall3()
+    w3 = Web3(provider)
+    token = w3.eth.contract(address=Web3.to_checksum_address(TOKEN), abi=TOKEN_ABI)
+    missing = w3.eth.contract(address=Web3.to_checksum_address(MISSING), abi=TOKEN_ABI)
+    return provider, w3, token, missing
+
+
+def test_aggregate3_encodes_each_call():
+    provider, w3, token, _ = token_contracts()
+    batch = Multicall(w3)
+    batch.add(token.functions.balanceOf(Web3.to_checksum_address(USER)))
+    batch.add(token.functions.symbol(), allow_failure=False)
+    batch.execute()
+
+    [calls] = provider.batches
+    assert [(target.lower(), allow_failure) for target, allow_failure, _ in calls] == [(TOKEN, True), (TOKEN, False)]
+    assert calls[0][2] == BALANCE_OF + encode(["address"], [USER])
+    assert calls[1][2] == SYMBOL
+
+
+def test_results_are_decoded_in_order():
+    _, w3, token, _ = token_contracts()
+    batch = Multicall(w3)
+    symbol = batch.add(token.functions.symbol())
+    balance = batch.add(token.functions.balanceOf(Web3.to_checksum_address(USER)))
+    pair = batch.add(token.functions.pair())
+    results = batch.execute()
+
+    assert results[symbol] == "TKN"
+    assert results[balance] == int(USER, 16)
+    assert results[pair] == (Web3.to_checksum_address(USER), 7)  # Addresses come back checksummed
+    assert len(batch) == 0
+
+
+def test_reverted_or_undecodable_calls_come_back_as_none():
+    _, w3, token, missing = token_contracts()
+    results = multicall.multicall(w3, [
+        token.functions.balanceOf(Web3.to_checksum_address(USER)),
+        missing.functions.symbol(),  # No code there, so nothing to decode
+    ])
+    assert results == [int(USER, 16), None]
+
+    # The fake token reverts on any function it does not implement
+    assert multicall.multicall(w3, [token.functions.decimals(), token.functions.symbol()]) == [None, "TKN"]
+
+
+def test_large_batches_are_split(monkeypatch):
+    monkeypatch.setattr(multicall, "MAX_CALLS_PER_BATCH", 2)
+    provider, w3, token, _ = token_contracts()
+    results = multicall.multicall(w3, [token.functions.symbol()] * 5)
+
+    assert results == ["TKN"] * 5
+    assert [len(calls) for calls in provider.batches] == [2, 2, 1]
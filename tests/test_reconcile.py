@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+import time
+
+import pytest
+
+import reconcile
+from bridge import BridgeEvent
+from reconcile import Ledger, Reconciler
+
+TOKEN = "0x00000000000000000000000000000000000000A1"
+USER = "0x00000000000000000000000000000000000000C1"
+
+
+def event(name, block, tx=1, log_index=0, amount=100):
+    return BridgeEvent(name, TOKEN, USER, amount, block, "0x" + f"{tx:064x}", log_index)
+
+
+def record(record_id, key=("k",)):
+    return {'id': record_id, 'key': list(key)}
+
+
+@pytest.fixture
+def reconciler(tmp_path):
+    return Reconciler(tmp_path / "reconcile_state.json")
+
+
+class FakeChain:
+    """Bridge contract stand-in: block timestamps are 12s apart and get_logs can be made to fail"""
+
+    def __init__(self, address="0x00000000000000000000000000000000000000B1"):
+        self.address = address
+        self.events = []
+        self.fail_from = None
+        self.blocks_read = []
+        self.w3 = SimpleNamespace(eth=SimpleNamespace(block_number=0, get_block=self.get_block))
+
+    def get_block(self, number):
+        self.blocks_read.append(number)
+        return {'timestamp': 1_700_000_000 + 12 * number}
+
+    def iter_events(self, chain, from_block, to_block, contract=None, **kwargs):
+        if self.fail_from is not None and to_block >= self.fail_from:
+            raise ConnectionError("RPC unavailable")
+        return iter([e for e in self.events if from_block <= e.block <= to_block])
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    fake = FakeChain()
+    monkeypatch.setattr(reconcile, "iter_events", fake.iter_events)
+    return fake
+
+
+def test_ledger_is_fifo_per_key():
+    ledger = Ledger()
+    ledger.push(("a",), record("1", ("a",)))
+    ledger.push(("b",), record("2", ("b",)))
+    ledger.push(("a",), record("3", ("a",)))
+    assert ledger.pop(("a",))['id'] == "1"
+    assert ledger.pop(("a",))['id'] == "3"
+    assert ledger.pop(("a",)) is None
+    assert [r['id'] for r in ledger.records()] == ["2"]
+
+
+def test_ledger_ignores_duplicate_ids():
+    ledger = Ledger()
+    ledger.push(("a",), record("1", ("a",)))
+    ledger.push(("a",), record("1", ("a",)))
+    assert len(ledger) == 1
+    assert ledger.pop(("a",))['id'] == "1"
+    assert ledger.pop(("a",)) is None
+
+
+def test_duplicate_request_then_two_relays(reconciler):
+    deposit = event("Deposit", 10)
+    reconciler.add(deposit)
+    reconciler.add(deposit)
+    assert reconciler.add(event("Wrap", 5, tx=2))['id'] == f"{deposit.tx_hash}:0"
+    assert reconciler.add(event("Wrap", 6, tx=3)) is None
+    assert reconciler.summary() == {'matched': {'wrap': 1, 'withdraw': 0}, 'unmatched_deposits': 0,
+                                    'over_relayed_wraps': 1, 'unmatched_unwraps': 0,
+                                    'over_relayed_withdrawals': 0}
+
+
+def test_relay_seen_before_request_is_matched(reconciler):
+    reconciler.add(event("Withdrawal", 3, tx=2))
+    assert reconciler.add(event("Unwrap", 4)) is not None
+    assert reconciler.summary()['matched'] == {'wrap': 0, 'withdraw': 1}
+
+
+def test_state_round_trips(reconciler, tmp_path):
+    reconciler.add(event("Deposit", 10), timestamp=1234)
+    reconciler.save()
+    reloaded = Reconciler(tmp_path / "reconcile_state.json")
+    [row] = reloaded.pending['wrap'].records()
+    assert (row['block'], row['timestamp']) == (10, 1234)
+    assert reloaded.add(event("Wrap", 11, tx=2))['id'] == row['id']
+
+
+def test_sync_retry_after_failed_page_does_not_double_count(reconciler, chain):
+    page = reconcile.LOG_PAGE_SIZE
+    chain.events = [event("Deposit", 5), event("Deposit", page + 5, tx=2),
+                    event("Deposit", 2 * page + 5, tx=3)]
+    chain.fail_from = 2 * page
+    with pytest.raises(ConnectionError):
+        reconciler.sync("source", chain, to_block=3 * page - 1, from_block=0)
+    assert reconciler.last_block['source'] == 2 * page - 1
+    assert len(reconciler.pending['wrap']) == 2
+
+    chain.fail_from = None
+    reconciler.sync("source", chain, to_block=3 * page - 1)
+    assert len(reconciler.pending['wrap']) == 3
+    assert reconciler.last_block['source'] == 3 * page - 1
+
+
+def test_ages_come_from_block_timestamps(reconciler, chain):
+    chain.events = [event("Deposit", 7), event("Deposit", 8, tx=2), event("Wrap", 9, tx=3)]
+    reconciler.sync("source", chain, to_block=10, from_block=0)
+    assert chain.blocks_read == []
+
+    lookup = lambda chain_name, block: chain.get_block(block)['timestamp']
+    [row] = reconciler.report({'source': 10}, lookup)['unmatched_deposits']
+    # Only the outstanding deposit's block is read, and only once
+    reconciler.report({'source': 10}, lookup)
+    assert chain.blocks_read == [8]
+    assert row['timestamp'] == 1_700_000_000 + 12 * 8
+    assert row['age_blocks'] == 2
+    assert row['age_seconds'] == pytest.approx(time.time() - row['timestamp'], abs=5)
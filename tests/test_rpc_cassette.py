@@ -0,0 +1,47 @@
+import pytest
+
+import rpc_cassette
+from rpc_cassette import Cassette
+
+
+def record(path, responses, amounts):
+    cassette = Cassette(path, "record")
+    assert cassette.value("amounts", lambda: amounts) == amounts
+    for block in responses:
+        cassette.record("source", "eth_blockNumber", [], {'result': block}, 0.01)
+    cassette.close()
+
+
+def test_replay_returns_recorded_values_and_responses(tmp_path):
+    path = tmp_path / "run.cassette"
+    record(path, ["0x1", "0x2"], [17, 400])
+
+    cassette = Cassette(path, "replay")
+    assert cassette.value("amounts", lambda: pytest.fail("replay must not pick new values")) == [17, 400]
+    assert [cassette.replay("source", "eth_blockNumber", [])['result'] for _ in range(3)] == ["0x1", "0x2", "0x2"]
+    with pytest.raises(LookupError):
+        cassette.replay("destination", "eth_blockNumber", [])
+
+
+def test_recording_again_replaces_the_old_cassette(tmp_path):
+    path = tmp_path / "run.cassette"
+    record(path, ["0x1"], [1])
+    record(path, ["0x9"], [2])
+
+    cassette = Cassette(path, "replay")
+    assert cassette.value("amounts", None) == [2]
+    assert cassette.replay("source", "eth_blockNumber", [])['result'] == "0x9"
+
+
+def test_provider_records_then_replays_offline(tmp_path):
+    class Live:
+        def make_request(self, method, params):
+            return {'result': f"{method}:{params[0]}"}
+
+    path = tmp_path / "run.cassette"
+    recording = Cassette(path, "record")
+    assert rpc_cassette.CassetteProvider(recording, "source", Live()).make_request("eth_getCode", ["0xab"])
+    recording.close()
+
+    provider = rpc_cassette.CassetteProvider(Cassette(path, "replay"), "source")
+    assert provider.make_request("eth_getCode", ["0xab"]) == {'result': "eth_getCode:0xab"}
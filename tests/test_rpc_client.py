@@ -0,0 +1,154 @@
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import rpc_client
+from rpc_client import Endpoint, RateLimited, RateLimitedProvider, classify_error
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rpc_client.time, "monotonic", clock)
+    return clock
+
+
+def http_error(status):
+    return requests.HTTPError(response=SimpleNamespace(status_code=status, headers={}))
+
+
+def test_bucket_refills_at_rate_up_to_burst(clock):
+    endpoint = Endpoint(rate=10.0, burst=5)
+    for _ in range(5):
+        endpoint.acquire()
+    assert endpoint.tokens == 0
+
+    clock.now += 0.2
+    endpoint._refill(clock.now)
+    assert endpoint.tokens == pytest.approx(2.0)
+
+    clock.now += 60
+    endpoint._refill(clock.now)
+    assert endpoint.tokens == 5
+
+
+def test_throttle_halves_limit_and_rate(clock):
+    endpoint = Endpoint(rate=8.0, max_concurrency=8)
+    endpoint.acquire()
+    endpoint.release(0.1, throttled=True, retry_after=3)
+
+    assert endpoint.limit == 4
+    assert endpoint.rate == 4
+    assert endpoint.tokens <= 0
+    assert endpoint.paused_until == clock.now + 3
+
+
+def test_rate_never_drops_below_floor(clock):
+    endpoint = Endpoint(rate=1.0)
+    for _ in range(10):
+        endpoint.in_flight += 1
+        endpoint.release(0.1, throttled=True)
+    assert endpoint.rate == rpc_client.MIN_RATE
+    assert endpoint.limit == 1
+
+
+def test_fast_successes_recover_additively(clock):
+    endpoint = Endpoint(rate=10.0, max_concurrency=4)
+    endpoint.in_flight += 1
+    endpoint.release(0.1, throttled=True)
+    limit, rate = endpoint.limit, endpoint.rate
+
+    endpoint.in_flight += 1
+    endpoint.release(0.1)
+    assert endpoint.limit == limit + 1 / limit
+    assert endpoint.rate == pytest.approx(rate + rpc_client.RATE_RECOVERY * 10.0)
+
+    for _ in range(1000):
+        endpoint.in_flight += 1
+        endpoint.release(0.1)
+    assert endpoint.limit == 4
+    assert endpoint.rate == 10.0
+
+
+def test_slow_responses_trim_limit_only(clock):
+    endpoint = Endpoint(rate=10.0, max_concurrency=10, target_latency=1.0)
+    endpoint.in_flight += 1
+    endpoint.release(5.0)
+    assert endpoint.limit == 9
+    assert endpoint.rate == 10.0
+
+
+@pytest.mark.parametrize("err, kind", [
+    (RateLimited("too many requests"), 'throttled'),
+    (http_error(429), 'throttled'),
+    (http_error(502), 'transient'),
+    (http_error(503), 'transient'),
+    (http_error(504), 'transient'),
+    (http_error(500), None),
+    (http_error(400), None),
+    (requests.HTTPError(), None),
+    (requests.ConnectionError(), 'transient'),
+    (requests.Timeout(), 'transient'),
+    (ValueError(), None),
+])
+def test_classify_error(err, kind):
+    assert classify_error(err) == kind
+
+
+def test_check_throttled():
+    rpc_client.check_throttled({'result': '0x1'})
+    rpc_client.check_throttled({'error': {'code': -32000, 'message': 'execution reverted'}})
+    with pytest.raises(RateLimited):
+        rpc_client.check_throttled({'error': {'code': -32005, 'message': 'limit exceeded'}})
+    with pytest.raises(RateLimited):
+        rpc_client.check_throttled({'error': {'code': -32000, 'message': 'Too Many Requests'}})
+
+
+class FakeProvider:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def make_request(self, method, params):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(rpc_client.time, "sleep", lambda seconds: None)
+
+
+def test_reads_retry_transient_errors(no_sleep):
+    provider = FakeProvider([http_error(503), requests.ConnectionError(), {'result': '0x1'}])
+    endpoint = Endpoint(rate=1000.0)
+    assert RateLimitedProvider(provider, endpoint).make_request("eth_blockNumber", []) == {'result': '0x1'}
+    assert provider.calls == 3
+    assert endpoint.rate == 1000.0  # Transient errors are not throttling
+    assert endpoint.in_flight == 0
+
+
+def test_reads_raise_other_http_errors(no_sleep):
+    provider = FakeProvider([http_error(500)])
+    with pytest.raises(requests.HTTPError):
+        RateLimitedProvider(provider, Endpoint(rate=1000.0)).make_request("eth_blockNumber", [])
+    assert provider.calls == 1
+
+
+def test_sends_are_not_retried(no_sleep):
+    provider = FakeProvider([http_error(502), {'result': '0x1'}])
+    with pytest.raises(requests.HTTPError):
+        RateLimitedProvider(provider, Endpoint(rate=1000.0)).make_request("eth_sendRawTransaction", ["0x"])
+    assert provider.calls == 1
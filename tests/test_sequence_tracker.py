@@ -0,0 +1,344 @@
+from types import SimpleNamespace
+
+import pytest
+
+import bridge
+import sequence_tracker
+from bridge import BridgeEvent, new_relay_events
+from sequence_tracker import SequenceTracker, DEAD_LETTER_AFTER, RELAY_RETRY_DELAY
+
+CHAIN = "source"
+ADDRESS = "0x00000000000000000000000000000000000000B1"
+TOKEN = "0x00000000000000000000000000000000000000A1"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def tracker(tmp_path, clock):
+    tracker = SequenceTracker(tmp_path / "sequence_state.json")
+    tracker.clock = clock
+    return tracker
+
+
+def deposit(nonce, block, token=TOKEN):
+    return BridgeEvent("Deposit", token, TOKEN, 1, block, "0x" + "00" * 32, 0, nonce)
+
+
+class FakeContract:
+    address = ADDRESS
+
+
+class FakeRegistry:
+    def __init__(self, wrapped=()):
+        self.wrapped = set(wrapped)
+
+    def wrapped_tokens(self, token):
+        return token if token in self.wrapped else bridge.constants.ADDRESS_ZERO
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    """Events on the fake chain, served to new_relay_events by block range; records every fetch"""
+    events, fetches = [], []
+
+    def iter_events(chain, from_block, to_block, names=None, contract=None, **kwargs):
+        fetches.append((from_block, to_block))
+        return iter([e for e in events if from_block <= e.block <= to_block])
+
+    monkeypatch.setattr(bridge, "iter_events", iter_events)
+    return events, fetches
+
+
+def test_fresh_sequence_keeps_unrelayed_first_nonce(tracker):
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 2, 11)
+    tracker.add(CHAIN, ADDRESS, 3, 12)
+    assert tracker.is_new(CHAIN, ADDRESS, 1)
+    assert not tracker.is_new(CHAIN, ADDRESS, 2)
+    assert tracker.gap(CHAIN, ADDRESS) == (10, 12)
+
+
+def test_adds_before_start_do_not_hide_lower_nonces(tracker):
+    tracker.add(CHAIN, ADDRESS, 2, 11)
+    tracker.add(CHAIN, ADDRESS, 3, 12)
+    assert tracker.is_new(CHAIN, ADDRESS, 1)
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    assert tracker.is_new(CHAIN, ADDRESS, 1)
+    tracker.add(CHAIN, ADDRESS, 1, 10)
+    assert tracker.side(CHAIN, ADDRESS)['contiguous'] == 3
+    assert tracker.gap(CHAIN, ADDRESS) is None
+
+
+def test_contiguous_prefix_advances_and_persists(tracker, tmp_path):
+    tracker.start(CHAIN, ADDRESS, 5, 100)
+    for nonce, block in ((5, 100), (7, 102), (6, 101)):
+        tracker.add(CHAIN, ADDRESS, nonce, block)
+    tracker.save()
+
+    reloaded = SequenceTracker(tmp_path / "sequence_state.json")
+    side = reloaded.side(CHAIN, ADDRESS)
+    assert (side['contiguous'], side['contiguous_block'], side['pending']) == (7, 102, {})
+    assert not reloaded.is_new(CHAIN, ADDRESS, 7)
+    assert reloaded.is_new(CHAIN, ADDRESS, 8)
+
+
+def test_new_contract_address_resets_state(tracker):
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 1, 10)
+    assert tracker.is_new(CHAIN, "0x00000000000000000000000000000000000000C1", 1)
+
+
+def test_gap_covers_every_missing_nonce(tracker):
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 3, 30)
+    tracker.add(CHAIN, ADDRESS, 5, 50)
+    assert tracker.gap(CHAIN, ADDRESS) == (10, 50)
+    assert tracker.gap(CHAIN, ADDRESS, first_new=(6, 60)) == (10, 60)
+
+
+def test_failed_relay_backs_off_exponentially(tracker, clock):
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    assert not tracker.fail(CHAIN, ADDRESS, 1, 10)
+    assert tracker.backing_off(CHAIN, ADDRESS, 1)
+    clock.now += RELAY_RETRY_DELAY
+    assert not tracker.backing_off(CHAIN, ADDRESS, 1)
+
+    assert not tracker.fail(CHAIN, ADDRESS, 1, 10)
+    clock.now += RELAY_RETRY_DELAY
+    assert tracker.backing_off(CHAIN, ADDRESS, 1)
+    clock.now += RELAY_RETRY_DELAY
+    assert not tracker.backing_off(CHAIN, ADDRESS, 1)
+    assert tracker.is_new(CHAIN, ADDRESS, 1)
+
+
+def test_short_outage_does_not_dead_letter(tracker, clock):
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    for _ in range(100):
+        assert not tracker.fail(CHAIN, ADDRESS, 1, 10)
+        clock.now += 5
+    assert tracker.dead_letters(CHAIN, ADDRESS) == {}
+
+
+def test_failing_nonce_is_dead_lettered_and_unpins_sequence(tracker, clock):
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    for nonce in range(2, 50):
+        tracker.add(CHAIN, ADDRESS, nonce, 10 + nonce)
+    assert not tracker.fail(CHAIN, ADDRESS, 1, 10)
+    clock.now += DEAD_LETTER_AFTER - 1
+    assert not tracker.fail(CHAIN, ADDRESS, 1, 10)
+    assert tracker.is_new(CHAIN, ADDRESS, 1)
+    clock.now += 1
+    assert tracker.fail(CHAIN, ADDRESS, 1, 10)
+
+    side = tracker.side(CHAIN, ADDRESS)
+    assert (side['contiguous'], side['pending'], side['attempts']) == (49, {}, {})
+    assert tracker.dead_letters(CHAIN, ADDRESS) == {1: 10}
+    assert tracker.gap(CHAIN, ADDRESS) is None
+
+
+def test_deferred_nonce_is_settled_until_relayed(tracker):
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    tracker.defer(CHAIN, ADDRESS, 1, 10, TOKEN)
+    assert not tracker.is_new(CHAIN, ADDRESS, 1)
+    assert tracker.deferred(CHAIN, ADDRESS) == {1: (10, TOKEN)}
+    tracker.add(CHAIN, ADDRESS, 1, 10)
+    assert tracker.deferred(CHAIN, ADDRESS) == {}
+
+
+def test_missing_only_counts_holes_the_scan_covered(tracker):
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 4, 40)
+    tracker.add(CHAIN, ADDRESS, 8, 80)
+    assert tracker.missing(CHAIN, ADDRESS, {}, to_block=50) == [2, 3]
+    assert tracker.missing(CHAIN, ADDRESS, {6: 60}, to_block=100) == [2, 3, 5, 7]
+    assert tracker.missing(CHAIN, ADDRESS, {}, to_block=20) == []
+
+
+def test_new_relay_events_starts_at_lowest_nonce_of_first_window(tracker, chain):
+    events, _ = chain
+    events += [deposit(1, 10), deposit(2, 11), deposit(3, 12)]
+    found = new_relay_events(CHAIN, FakeContract(), tracker, 0, 20)
+    assert [e.sequence for e in found] == [1, 2, 3]
+
+    # Only the later ones relay; the first is offered again on the next scan
+    tracker.add(CHAIN, ADDRESS, 2, 11)
+    tracker.add(CHAIN, ADDRESS, 3, 12)
+    assert [e.sequence for e in new_relay_events(CHAIN, FakeContract(), tracker, 0, 20)] == [1]
+
+
+def test_new_relay_events_fetches_gap_behind_window(tracker, chain):
+    events, fetches = chain
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 1, 10)
+    events += [deposit(1, 10), deposit(2, 500), deposit(3, 1000)]
+    found = new_relay_events(CHAIN, FakeContract(), tracker, 990, 1010)
+    assert [e.sequence for e in found] == [2, 3]
+    assert fetches == [(990, 1010), (10, 989)]
+
+
+def test_gap_fetch_is_capped(tracker, chain):
+    events, fetches = chain
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 1, 10)
+    events += [deposit(2, 20), deposit(3, 50_000)]
+    found = new_relay_events(CHAIN, FakeContract(), tracker, 49_990, 50_010)
+    assert [e.sequence for e in found] == [2, 3]
+    assert fetches[1] == (10, 10 + bridge.MAX_GAP_BLOCKS - 1)
+
+
+def test_stuck_nonce_stops_widening_rescans(tracker, chain, clock):
+    events, fetches = chain
+    events += [deposit(1, 10)]
+    [event] = new_relay_events(CHAIN, FakeContract(), tracker, 0, 20)
+    tracker.fail(CHAIN, ADDRESS, event.sequence, event.block)
+    events += [deposit(n, 10 + 10 * n) for n in range(2, 200)]
+    head = 10 + 10 * 199
+
+    # Nonce 1 keeps failing (found through the gap fetch) while everything after it relays
+    for _ in range(3):
+        clock.now += DEAD_LETTER_AFTER / 2
+        for event in new_relay_events(CHAIN, FakeContract(), tracker, head - 50, head):
+            if event.sequence == 1:
+                tracker.fail(CHAIN, ADDRESS, event.sequence, event.block)
+            else:
+                tracker.add(CHAIN, ADDRESS, event.sequence, event.block)
+
+    side = tracker.side(CHAIN, ADDRESS)
+    assert side['contiguous'] == 199 and side['pending'] == {}
+    assert tracker.dead_letters(CHAIN, ADDRESS) == {1: 10}
+    fetches.clear()
+    assert new_relay_events(CHAIN, FakeContract(), tracker, head - 50, head) == []
+    assert fetches == [(head - 50, head)]
+
+
+def test_nonce_that_never_appears_is_dead_lettered(tracker, chain, clock):
+    events, _ = chain
+    tracker.start(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 1, 10)
+    tracker.add(CHAIN, ADDRESS, 3, 30)
+    for _ in range(3):
+        assert new_relay_events(CHAIN, FakeContract(), tracker, 100, 150) == []
+        assert tracker.dead_letters(CHAIN, ADDRESS) == {}
+    clock.now += DEAD_LETTER_AFTER
+    assert new_relay_events(CHAIN, FakeContract(), tracker, 100, 150) == []
+    assert tracker.dead_letters(CHAIN, ADDRESS) == {2: None}
+    assert tracker.gap(CHAIN, ADDRESS) is None
+
+
+def test_deferred_deposit_returns_once_token_is_created(tracker, chain):
+    events, _ = chain
+    events += [deposit(1, 10)]
+    registry = FakeRegistry()
+    [event] = new_relay_events(CHAIN, FakeContract(), tracker, 0, 20, registry)
+    assert bridge.waiting_on_registry(CHAIN, event.token, registry)
+    tracker.defer(CHAIN, ADDRESS, event.sequence, event.block, event.token)
+
+    assert new_relay_events(CHAIN, FakeContract(), tracker, 0, 20, registry) == []
+    registry.wrapped.add(TOKEN)
+    assert [e.sequence for e in new_relay_events(CHAIN, FakeContract(), tracker, 0, 20, registry)] == [1]
+
+
+@pytest.fixture
+def scanner(tmp_path, chain, monkeypatch):
+    """scan_blocks('source') over the fake chain, with the relay handler and receipt check stubbed"""
+    events, _ = chain
+    contract = FakeContract()
+    contract.w3 = SimpleNamespace(eth=SimpleNamespace(block_number=20))
+    monkeypatch.setattr(bridge, "get_bridge_contract", lambda chain, path: contract)
+    monkeypatch.setattr(bridge, "sync_token_registry", lambda path: None)
+    calls = {'handler': [], 'outcome': []}
+    results = {'handler': None, 'outcome': None}
+
+    def handler(event, contract_info_path, registry, on_sent=None):
+        calls['handler'].append(event.sequence)
+        on_sent({'tx_hash': "0x01", 'raw': "0x02", 'sender': ADDRESS, 'nonce': 0})
+        return results['handler']
+
+    def relay_outcome(chain, relay):
+        calls['outcome'].append(relay['tx_hash'])
+        return results['outcome']
+
+    monkeypatch.setattr(bridge, "handle_deposit_event", handler)
+    monkeypatch.setattr(bridge, "relay_outcome", relay_outcome)
+    events += [deposit(1, 10)]
+    path = tmp_path / "contract_info.json"
+    return (lambda: bridge.scan_blocks(CHAIN, path)), calls, results, tmp_path / "sequence_state.json"
+
+
+def test_unconfirmed_relay_is_checked_not_resent(scanner):
+    scan, calls, results, state_path = scanner
+    assert scan() == 1
+    assert SequenceTracker(state_path).sent(CHAIN, ADDRESS, 1)['tx_hash'] == "0x01"
+
+    # Still pending: the recorded transaction is checked again, nothing new is sent
+    scan()
+    assert calls == {'handler': [1], 'outcome': ["0x01"]}
+
+    results['outcome'] = True
+    scan()
+    tracker = SequenceTracker(state_path)
+    assert not tracker.is_new(CHAIN, ADDRESS, 1)
+    assert tracker.sent(CHAIN, ADDRESS, 1) is None
+    assert calls['handler'] == [1]
+
+
+def test_reverted_relay_is_resent_after_backoff(scanner, clock, monkeypatch):
+    scan, calls, results, state_path = scanner
+    # scan_blocks makes its own trackers, which read the time through time.time
+    monkeypatch.setattr(sequence_tracker.time, "time", clock)
+    results['handler'] = False
+    scan()
+    scan()
+    assert calls['handler'] == [1]
+    assert SequenceTracker(state_path).sent(CHAIN, ADDRESS, 1) is None
+
+    clock.now += RELAY_RETRY_DELAY
+    scan()
+    assert calls['handler'] == [1, 1]
+
+
+class FakeRelayChain:
+    """The chain a relay was sent to: receipts by hash, the sender's mined nonce, broadcasts"""
+
+    def __init__(self, receipts=None, mined_nonce=0):
+        self.receipts = receipts or {}
+        self.mined_nonce = mined_nonce
+        self.broadcasts = []
+        self.eth = SimpleNamespace(get_transaction_receipt=self.get_transaction_receipt,
+                                   get_transaction_count=lambda address, block: self.mined_nonce,
+                                   send_raw_transaction=self.broadcasts.append)
+
+    def get_transaction_receipt(self, tx_hash):
+        if tx_hash not in self.receipts:
+            raise bridge.TransactionNotFound(tx_hash)
+        return self.receipts[tx_hash]
+
+
+RELAY = {'tx_hash': "0x01", 'raw': "0x02", 'sender': ADDRESS, 'nonce': 5}
+
+
+@pytest.mark.parametrize("receipts, mined_nonce, outcome, broadcasts", [
+    ({"0x01": {'status': 1}}, 6, True, []),
+    ({"0x01": {'status': 0}}, 6, False, []),
+    ({}, 5, None, ["0x02"]),   # Pending or dropped: the same transaction is broadcast again
+    ({}, 6, False, []),        # Its account nonce went to another transaction
+])
+def test_relay_outcome(monkeypatch, receipts, mined_nonce, outcome, broadcasts):
+    w3 = FakeRelayChain(receipts, mined_nonce)
+    monkeypatch.setattr(bridge, "connect_to", lambda chain: w3)
+    assert bridge.relay_outcome(CHAIN, RELAY) is outcome
+    assert w3.broadcasts == broadcasts
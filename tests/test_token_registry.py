@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+from web3 import constants
+
+from token_registry import LOG_PAGE_SIZE, TokenRegistry, deployment_block
+
+BRIDGE = "0x00000000000000000000000000000000000000B1"
+TOKEN = "0x00000000000000000000000000000000000000A1"
+WRAPPED = "0x00000000000000000000000000000000000000A2"
+
+
+class FakeEvent:
+    def __init__(self, logs):
+        self.logs = logs
+        self.calls = []
+
+    def get_logs(self, from_block, to_block):
+        self.calls.append((from_block, to_block))
+        return [log for block, log in self.logs if from_block <= block <= to_block]
+
+
+class FakeBridge:
+    """Bridge contract stand-in deployed at 'deployed_at'; its code is empty before that block"""
+
+    def __init__(self, head, deployed_at, registrations=(), creations=()):
+        self.address = BRIDGE
+        self.deployed_at = deployed_at
+        self.code_reads = 0
+        self.events = SimpleNamespace(Registration=FakeEvent(list(registrations)),
+                                      Creation=FakeEvent(list(creations)))
+        self.w3 = SimpleNamespace(eth=SimpleNamespace(block_number=head, get_code=self.get_code))
+
+    def get_code(self, address, block_identifier):
+        self.code_reads += 1
+        return b"\x60" if block_identifier >= self.deployed_at else b""
+
+
+def registration(block, token=TOKEN):
+    return block, {'event': 'Registration', 'args': {'token': token}}
+
+
+def creation(block, underlying=TOKEN, wrapped=WRAPPED):
+    return block, {'event': 'Creation', 'args': {'underlying_token': underlying, 'wrapped_token': wrapped}}
+
+
+def test_deployment_block_binary_search():
+    bridge = FakeBridge(head=1_000_000, deployed_at=123_456)
+    assert deployment_block(bridge.w3, BRIDGE, 1_000_000) == 123_456
+    assert bridge.code_reads <= 22
+
+
+def test_seeds_from_events_since_deployment(tmp_path):
+    registry = TokenRegistry(tmp_path / "token_registry.json")
+    bridge = FakeBridge(head=5000, deployed_at=4000, registrations=[registration(4100)], creations=[creation(4200)])
+    registry.sync('source', bridge)
+    registry.sync('destination', bridge)
+
+    assert registry.approved(TOKEN)
+    assert registry.wrapped_tokens(TOKEN) == WRAPPED
+    assert registry.underlying_tokens(WRAPPED) == TOKEN
+    assert bridge.events.Registration.calls == [(4000, 5000)]
+
+
+def test_given_deploy_block_skips_lookup_and_pages(tmp_path):
+    registry = TokenRegistry(tmp_path / "token_registry.json")
+    bridge = FakeBridge(head=2 * LOG_PAGE_SIZE, deployed_at=0, registrations=[registration(LOG_PAGE_SIZE + 5)])
+    registry.sync('source', bridge, from_block=1)
+
+    assert bridge.code_reads == 0
+    assert bridge.events.Registration.calls == [(1, LOG_PAGE_SIZE), (LOG_PAGE_SIZE + 1, 2 * LOG_PAGE_SIZE)]
+    assert registry.approved(TOKEN)
+
+
+def test_incremental_sync_after_reload(tmp_path):
+    path = tmp_path / "token_registry.json"
+    bridge = FakeBridge(head=100, deployed_at=10)
+    registry = TokenRegistry(path)
+    registry.sync('destination', bridge)
+    registry.save()
+    assert registry.wrapped_tokens(TOKEN) == constants.ADDRESS_ZERO
+
+    bridge.events.Creation.logs.append(creation(150))
+    bridge.w3.eth.block_number = 200
+    registry = TokenRegistry(path)
+    registry.sync('destination', bridge)
+    assert registry.wrapped_tokens(TOKEN) == WRAPPED
+    assert bridge.events.Creation.calls == [(10, 100), (101, 200)]
@@ -0,0 +1,141 @@
+from web3 import Web3, constants
+from pathlib import Path
+import json
+
+# Most public RPC endpoints refuse eth_getLogs over more than ~2048 blocks
+LOG_PAGE_SIZE = 2000
+
+
+class TokenRegistry:
+    """
+        Local mirror of the bridge's token registry
+
+        Answers approved(token), wrapped_tokens(token) and underlying_tokens(wrapped)
+        from memory, with the same return values as the contract getters.
+        The mirror is built from Source.Registration and Destination.Creation
+        events, read from each contract's deployment block on and then
+        incrementally, and persisted to disk between runs.
+    """
+
+    def __init__(self, path="token_registry.json"):
+        self.path = Path(path)
+        self.state = {
+            'source': {'address': None, 'last_block': None, 'approved': []},
+            'destination': {'address': None, 'last_block': None, 'wrapped_tokens': {}},
+        }
+        self._approved = set()
+        self._wrapped = {}     # underlying -> wrapped
+        self._underlying = {}  # wrapped -> underlying
+        self.load()
+
+    def load(self):
+        """Read the persisted registry, if there is one"""
+        if not self.path.is_file():
+            return
+        try:
+            with self.path.open('r') as f:
+                saved = json.load(f)
+        except (OSError, json.JSONDecodeError) as err:
+            print(f"Ignoring unreadable token registry {self.path}: {err}")
+            return
+        for chain in self.state:
+            self.state[chain].update(saved.get(chain, {}))
+        self._approved = set(self.state['source']['approved'])
+        self._wrapped = dict(self.state['destination']['wrapped_tokens'])
+        self._underlying = {w: u for u, w in self._wrapped.items()}
+
+    def save(self):
+        """Persist the registry to disk"""
+        self.state['source']['approved'] = sorted(self._approved)
+        self.state['destination']['wrapped_tokens'] = self._wrapped
+        tmp_path = self.path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump(self.state, f, indent=2)
+        tmp_path.replace(self.path)
+
+    def approved(self, token):
+        """Mirror of Source.approved(token)"""
+        return Web3.to_checksum_address(token) in self._approved
+
+    def wrapped_tokens(self, token):
+        """Mirror of Destination.wrapped_tokens(token)"""
+        return self._wrapped.get(Web3.to_checksum_address(token), constants.ADDRESS_ZERO)
+
+    def underlying_tokens(self, wrapped_token):
+        """Mirror of Destination.underlying_tokens(wrapped_token)"""
+        return self._underlying.get(Web3.to_checksum_address(wrapped_token), constants.ADDRESS_ZERO)
+
+    def add_registration(self, token):
+        self._approved.add(Web3.to_checksum_address(token))
+
+    def add_creation(self, underlying_token, wrapped_token):
+        underlying_token = Web3.to_checksum_address(underlying_token)
+        wrapped_token = Web3.to_checksum_address(wrapped_token)
+        self._wrapped[underlying_token] = wrapped_token
+        self._underlying[wrapped_token] = underlying_token
+
+    def apply_event(self, event):
+        """Update the registry from a decoded Registration or Creation event"""
+        args = event['args']
+        if event['event'] == 'Registration':
+            self.add_registration(args['token'])
+        elif event['event'] == 'Creation':
+            self.add_creation(args['underlying_token'], args['wrapped_token'])
+
+    def sync(self, chain, contract, to_block=None, from_block=None):
+        """
+            chain - (string) 'source' or 'destination'
+            contract - (contract object) the bridge contract on that chain
+            to_block - (int) last block to include, defaults to the chain head
+            from_block - (int) the contract's deployment block, if known; otherwise it is
+            looked up the first time this contract is seen
+
+            Bring one side of the registry up to date.  Nothing is re-read that
+            was already mirrored, so repeated calls only cost one eth_getLogs per
+            LOG_PAGE_SIZE blocks since the previous call.
+        """
+        side = self.state[chain]
+        if to_block is None:
+            to_block = contract.w3.eth.block_number
+
+        if side['address'] != contract.address:
+            # A fresh contract (or no saved state at all) means starting over from its deployment
+            self._reset(chain)
+            if from_block is None:
+                from_block = deployment_block(contract.w3, contract.address, to_block)
+            side['address'] = contract.address
+            side['last_block'] = from_block - 1
+
+        event = contract.events.Registration if chain == 'source' else contract.events.Creation
+        from_block = side['last_block'] + 1
+        while from_block <= to_block:
+            page_end = min(from_block + LOG_PAGE_SIZE - 1, to_block)
+            for evt in event.get_logs(from_block=from_block, to_block=page_end):
+                self.apply_event(evt)
+            side['last_block'] = page_end
+            from_block = page_end + 1
+
+    def _reset(self, chain):
+        self.state[chain]['last_block'] = None
+        if chain == 'source':
+            self._approved = set()
+        else:
+            self._wrapped, self._underlying = {}, {}
+
+
+def deployment_block(w3, address, to_block):
+    """
+        Binary search for the first block at which 'address' has code
+        Needs historical state (an archive node, or a local dev chain); pruned public
+        endpoints reject it, so record 'deploy_block' in contract_info.json for them.
+    """
+    if len(w3.eth.get_code(address, block_identifier=to_block)) == 0:
+        raise ValueError(f"No contract at {address} as of block {to_block}")
+    low, high = 0, to_block
+    while low < high:
+        mid = (low + high) // 2
+        if len(w3.eth.get_code(address, block_identifier=mid)) > 0:
+            high = mid
+        else:
+            low = mid + 1
+    return low